@@ -1,104 +1,61 @@
-from flask import Flask, request, jsonify, session
-from flask_sqlalchemy import SQLAlchemy
+from flask import Flask, Response, abort, make_response, request, jsonify, session, stream_with_context
 from flask_cors import CORS
-from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask_jwt_extended import JWTManager
+from flask_migrate import Migrate
+from werkzeug.middleware.proxy_fix import ProxyFix
+from config import Config
+from models import db, User, Reward
+from services import (UserService, TransactionService, RecipientService, RewardService, LoyaltyService,
+                      AnalyticsService)
+from cache import catalogue_etag, catalogue_state, profile_etag, profile_state
+from events import init_event_bridge, stream_user_events
+from auth import (Identity, admin_required, current_identity, current_user_id, identity_cache, issue_access_token,
+                  issue_tokens, login_required, refresh_identity, revoke_tokens)
+from batch import run_batch
+from passwords import HasherBusy, password_hasher
+from timeseries import BUCKETS
+from cli import register_commands
+from profiler import init_profiler
+from ratelimit import rate_limited
+from idempotency import idempotent
+from datetime import date, datetime, timedelta
+from functools import partial
+import csv
+import io
 import os
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-here'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///mukuru_loyalty.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL') or 'sqlite:///mukuru_loyalty.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['JWT_SECRET_KEY'] = Config.JWT_SECRET_KEY
+app.config['JWT_ACCESS_TOKEN_EXPIRES'] = Config.JWT_ACCESS_TOKEN_EXPIRES
+app.config['JWT_REFRESH_TOKEN_EXPIRES'] = Config.JWT_REFRESH_TOKEN_EXPIRES
 
-db = SQLAlchemy(app)
+db.init_app(app)
+Migrate(app, db, render_as_batch=True)  # batch mode lets SQLite alter columns
 CORS(app)
+JWTManager(app)
+init_event_bridge()
+register_commands(app)
+init_profiler(app)
+app.wsgi_app = ProxyFix(app.wsgi_app, x_for=Config.PROXY_FIX_HOPS, x_proto=Config.PROXY_FIX_HOPS)
 
-# Database Models
-class User(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
-    email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128))
-    balance = db.Column(db.Float, default=5000.0)
-    points = db.Column(db.Integer, default=0)
-    total_sent = db.Column(db.Float, default=0.0)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    
-    # Relationships
-    transactions = db.relationship('Transaction', backref='user', lazy=True)
-    redemptions = db.relationship('Redemption', backref='user', lazy=True)
-    
-    @property
-    def tier(self):
-        """Calculate user tier based on total amount sent"""
-        if self.total_sent >= 50000:
-            return 'Gold'
-        elif self.total_sent >= 20000:
-            return 'Silver'
-        return 'Bronze'
-    
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'email': self.email,
-            'balance': self.balance,
-            'points': self.points,
-            'total_sent': self.total_sent,
-            'tier': self.tier,
-            'created_at': self.created_at.isoformat()
-        }
-
-class Transaction(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    transaction_type = db.Column(db.String(20), nullable=False)  # 'send' or 'reward'
-    amount = db.Column(db.Float, nullable=False)
-    points_earned = db.Column(db.Integer, default=0)
-    recipient = db.Column(db.String(100))
-    status = db.Column(db.String(20), default='completed')
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'type': self.transaction_type,
-            'amount': self.amount,
-            'points': self.points_earned,
-            'recipient': self.recipient,
-            'status': self.status,
-            'date': self.created_at.isoformat()
-        }
-
-class Reward(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
-    description = db.Column(db.Text)
-    points_cost = db.Column(db.Integer, nullable=False)
-    category = db.Column(db.String(50), nullable=False)
-    image_url = db.Column(db.String(200))
-    is_available = db.Column(db.Boolean, default=True)
-    
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'description': self.description,
-            'pointsCost': self.points_cost,
-            'category': self.category,
-            'image': self.image_url,
-            'available': self.is_available
-        }
+def _not_modified(etag):
+    """Return a 304 response if the client already holds this representation"""
+    if etag in request.if_none_match:
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+    return None
 
-class Redemption(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    reward_id = db.Column(db.Integer, db.ForeignKey('reward.id'), nullable=False)
-    points_spent = db.Column(db.Integer, nullable=False)
-    status = db.Column(db.String(20), default='completed')
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    
-    reward = db.relationship('Reward', backref='redemptions')
+def _store_rehashed_password(user_id: int, old_hash: str, new_hash: str):
+    """Persist a login's upgraded password hash; runs on the hasher's background thread"""
+    with app.app_context():
+        try:
+            UserService.replace_password_hash(user_id, old_hash, new_hash)
+        except Exception:
+            app.logger.exception('Storing the upgraded password hash of user %s failed', user_id)
 
 # API Routes
 @app.route('/api/auth/login', methods=['POST'])
@@ -110,162 +67,266 @@ def login():
     
     user = User.query.filter_by(email=email).first()
     
-    if user and check_password_hash(user.password_hash, password):
+    # Unknown emails are verified against a dummy hash so both misses take equally long
+    try:
+        valid = password_hasher.verify(user.password_hash if user else None, password)
+    except HasherBusy:
+        response = jsonify({'success': False, 'message': 'Too many login attempts in progress, retry shortly'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '1'
+        return response
+    
+    if valid and user.is_active:
+        if password_hasher.needs_rehash(user.password_hash):
+            # Not waited for: the login answers now, the new hash is stored when it is ready
+            password_hasher.rehash_in_background(
+                password, partial(_store_rehashed_password, user.id, user.password_hash))
+        identity = Identity(user.id, user.tier, user.is_active, user.token_version, user.is_admin)
+        identity_cache.put(identity)
         session['user_id'] = user.id
+        session['ver'] = user.token_version
         return jsonify({
             'success': True,
-            'user': user.to_dict()
+            'user': user.to_dict(),
+            **issue_tokens(identity)
         })
     
     return jsonify({'success': False, 'message': 'Invalid credentials'}), 401
 
+@app.route('/api/auth/refresh', methods=['POST'])
+def refresh():
+    """Exchange a refresh token for a new access token"""
+    identity = refresh_identity()
+    if identity is None:
+        return jsonify({'error': 'Not authenticated'}), 401
+    return jsonify({'access_token': issue_access_token(identity)})
+
+@app.route('/api/auth/revoke', methods=['POST'])
+@login_required
+def revoke():
+    """Sign out everywhere: invalidate all tokens and sessions issued to the user"""
+    revoke_tokens(current_user_id())
+    session.clear()
+    return jsonify({'success': True})
+
 @app.route('/api/user/profile', methods=['GET'])
+@login_required
 def get_user_profile():
     """Get current user profile with transactions"""
-    if 'user_id' not in session:
-        return jsonify({'error': 'Not authenticated'}), 401
-    
-    user = User.query.get(session['user_id'])
-    if not user:
+    # Validator is computed before the body so a concurrent write can only make it older
+    state = profile_state(current_user_id())
+    etag = profile_etag(current_user_id(), state)
+    not_modified = _not_modified(etag)
+    if not_modified:
+        return not_modified
+    
+    profile = UserService.get_user_profile_data(current_user_id(), state)
+    if not profile:
         return jsonify({'error': 'User not found'}), 404
     
-    # Get recent transactions
-    transactions = Transaction.query.filter_by(user_id=user.id)\
-                                  .order_by(Transaction.created_at.desc())\
-                                  .limit(10).all()
-    
-    # Get redeemed rewards
-    redemptions = Redemption.query.filter_by(user_id=user.id).all()
-    redeemed_reward_ids = [r.reward_id for r in redemptions]
-    
-    return jsonify({
-        'user': user.to_dict(),
-        'transactions': [t.to_dict() for t in transactions],
-        'rewardsPurchased': redeemed_reward_ids
-    })
+    response = jsonify(profile)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@app.route('/api/user/events', methods=['GET'])
+@login_required
+def user_events():
+    """Stream live balance/points/tier updates as server-sent events"""
+    # The stream holds no DB session or request context while idle
+    return Response(stream_user_events(current_user_id()),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/api/send-money', methods=['POST'])
+@login_required
+@idempotent('send_money')
+@rate_limited('send_money')
 def send_money():
     """Process money transfer and award points"""
-    if 'user_id' not in session:
-        return jsonify({'error': 'Not authenticated'}), 401
-    
     data = request.get_json()
     amount = float(data.get('amount', 0))
     recipient = data.get('recipient', '')
     
-    user = User.query.get(session['user_id'])
-    
-    # Validate transaction
-    if amount <= 0:
-        return jsonify({'error': 'Invalid amount'}), 400
-    
-    if amount > user.balance:
-        return jsonify({'error': 'Insufficient balance'}), 400
-    
-    if not recipient:
-        return jsonify({'error': 'Recipient required'}), 400
-    
-    # Calculate points (1 point per R100)
-    points_earned = int(amount // 100)
-    
-    # Update user balance and points
-    user.balance -= amount
-    user.points += points_earned
-    user.total_sent += amount
-    
-    # Create transaction record
-    transaction = Transaction(
-        user_id=user.id,
-        transaction_type='send',
+    success, message, transaction = TransactionService.send_money(
+        user_id=current_user_id(),
         amount=amount,
-        points_earned=points_earned,
         recipient=recipient,
-        status='completed'
+        recipient_phone=data.get('recipient_phone'),
+        currency=data.get('currency')
     )
     
-    db.session.add(transaction)
-    db.session.commit()
+    if not success:
+        return jsonify({'error': message}), 400
     
+    if transaction.user.tier != current_identity().tier:
+        identity_cache.invalidate(transaction.user_id)  # limits follow tier upgrades
     return jsonify({
         'success': True,
         'transaction': transaction.to_dict(),
-        'user': user.to_dict(),
-        'points_earned': points_earned
+        'user': transaction.user.to_dict(),
+        'points_earned': transaction.points_earned
     })
 
 @app.route('/api/rewards', methods=['GET'])
 def get_rewards():
     """Get all available rewards"""
-    rewards = Reward.query.filter_by(is_available=True).all()
-    return jsonify([reward.to_dict() for reward in rewards])
+    category = request.args.get('category')
+    etag = catalogue_etag(catalogue_state(), category)
+    not_modified = _not_modified(etag)
+    if not_modified:
+        return not_modified
+    
+    response = jsonify(RewardService.get_available_rewards(category))
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'public, max-age=%d' % Config.REWARDS_CACHE_MAX_AGE
+    return response
+
+@app.route('/api/rewards/search', methods=['GET'])
+def search_rewards():
+    """Search rewards with category and price-band facets"""
+    max_points = request.args.get('max_points', type=int)
+    if request.args.get('affordable') == 'true':
+        if current_identity() is None:
+            return jsonify({'error': 'Not authenticated'}), 401
+        user = db.session.get(User, current_user_id())
+        if user is None:
+            return jsonify({'error': 'User not found'}), 404
+        max_points = user.points if max_points is None else min(max_points, user.points)
+    
+    return jsonify(RewardService.search_rewards(
+        request.args.get('q'),
+        request.args.get('category'),
+        request.args.get('min_points', type=int),
+        max_points,
+        max(1, request.args.get('page', 1, type=int)),
+        max(1, min(request.args.get('per_page', 20, type=int), 100))
+    ))
+
+@app.route('/api/leaderboard', methods=['GET'])
+def get_leaderboard():
+    """Get top users by points"""
+    return jsonify(LoyaltyService.get_leaderboard(min(request.args.get('limit', 10, type=int), 100)))
+
+@app.route('/api/batch', methods=['POST'])
+def batch():
+    """Run several read requests in one round trip, sharing one session and user load"""
+    sub_requests = (request.get_json(silent=True) or {}).get('requests')
+    if not isinstance(sub_requests, list) or not sub_requests:
+        return jsonify({'error': 'requests must be a non-empty list'}), 400
+    if len(sub_requests) > Config.BATCH_MAX_REQUESTS:
+        return jsonify({'error': 'At most %d requests per batch' % Config.BATCH_MAX_REQUESTS}), 400
+    
+    return jsonify({'responses': run_batch(sub_requests)})
 
 @app.route('/api/redeem-reward', methods=['POST'])
+@login_required
+@idempotent('redeem_reward')
+@rate_limited('redeem_reward')
 def redeem_reward():
     """Redeem a reward using points"""
-    if 'user_id' not in session:
-        return jsonify({'error': 'Not authenticated'}), 401
-    
     data = request.get_json()
-    reward_id = data.get('reward_id')
-    
-    user = User.query.get(session['user_id'])
-    reward = Reward.query.get(reward_id)
     
-    if not reward or not reward.is_available:
-        return jsonify({'error': 'Reward not available'}), 404
-    
-    if user.points < reward.points_cost:
-        return jsonify({'error': 'Insufficient points'}), 400
-    
-    # Process redemption
-    user.points -= reward.points_cost
-    
-    # Create redemption record
-    redemption = Redemption(
-        user_id=user.id,
-        reward_id=reward.id,
-        points_spent=reward.points_cost
-    )
-    
-    # Create transaction record for points deduction
-    transaction = Transaction(
-        user_id=user.id,
-        transaction_type='reward',
-        amount=0,
-        points_earned=-reward.points_cost,
-        status='completed'
-    )
+    success, message, redemption = RewardService.redeem_reward(current_user_id(), data.get('reward_id'))
     
-    db.session.add(redemption)
-    db.session.add(transaction)
-    db.session.commit()
+    if not success:
+        status_code = 404 if message.endswith('not found') or 'not available' in message else 400
+        return jsonify({'error': message}), status_code
     
     return jsonify({
         'success': True,
-        'user': user.to_dict(),
-        'reward': reward.to_dict()
+        'user': redemption.user.to_dict(),
+        'reward': redemption.reward.to_dict()
     })
 
 @app.route('/api/transactions', methods=['GET'])
+@login_required
 def get_transactions():
     """Get user transaction history"""
-    if 'user_id' not in session:
-        return jsonify({'error': 'Not authenticated'}), 401
-    
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
+    start_date = request.args.get('start_date', type=datetime.fromisoformat)
+    end_date = request.args.get('end_date', type=datetime.fromisoformat)
     
-    transactions = Transaction.query.filter_by(user_id=session['user_id'])\
-                                  .order_by(Transaction.created_at.desc())\
-                                  .paginate(page=page, per_page=per_page, error_out=False)
-    
-    return jsonify({
-        'transactions': [t.to_dict() for t in transactions.items],
-        'total': transactions.total,
-        'pages': transactions.pages,
-        'current_page': page
-    })
+    return jsonify(TransactionService.get_user_transactions(current_user_id(), page, per_page,
+                                                            request.args.get('type'), start_date, end_date))
+
+@app.route('/api/transactions/export', methods=['GET'])
+@login_required
+def export_transactions():
+    """Stream user transaction history as CSV"""
+    rows = TransactionService.export_user_transactions(
+        current_user_id(),
+        request.args.get('start_date', type=datetime.fromisoformat),
+        request.args.get('end_date', type=datetime.fromisoformat)
+    )
+    fields = ['id', 'date', 'type', 'amount', 'points', 'recipient', 'reference', 'status', 'description']
+    
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore')
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            if buffer.tell() > 8192:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    
+    return Response(stream_with_context(generate()), mimetype='text/csv',
+                    headers={'Content-Disposition': 'attachment; filename=transactions.csv'})
+
+@app.route('/api/recipients/suggest', methods=['GET'])
+@login_required
+def suggest_recipients():
+    """Autocomplete recipients the user has sent to, most frequent first"""
+    limit = min(request.args.get('limit', 5, type=int), 20)
+    return jsonify(RecipientService.suggest(current_user_id(), request.args.get('q', ''), limit))
+
+def _report_range():
+    """Parse the start/end query parameters of analytics endpoints (default: last 30 days)"""
+    end_day = request.args.get('end', type=date.fromisoformat) or date.today()
+    try:
+        start_day = request.args.get('start', type=date.fromisoformat) or end_day - timedelta(days=29)
+    except (OverflowError, ValueError):
+        abort(make_response(jsonify({'error': 'end is too early for the default 30-day range; pass start'}), 400))
+    return start_day, end_day
+
+@app.route('/api/user/activity', methods=['GET'])
+@login_required
+def user_activity():
+    """Points earned/spent and amount sent per day, week or month (default: last 30 days)"""
+    bucket = request.args.get('bucket', 'auto')
+    if bucket not in BUCKETS + ('auto',):
+        return jsonify({'error': 'bucket must be one of day, week, month, auto'}), 400
+    start_day, end_day = _report_range()
+    if start_day > end_day:
+        return jsonify({'error': 'start must not be after end'}), 400
+    
+    try:
+        return jsonify(AnalyticsService.get_user_activity(current_user_id(), start_day, end_day,
+                                                          None if bucket == 'auto' else bucket))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/analytics/points', methods=['GET'])
+@admin_required
+def analytics_points():
+    """Points issued versus redeemed per day"""
+    return jsonify(AnalyticsService.get_points_by_day(*_report_range()))
+
+@app.route('/api/analytics/redemptions', methods=['GET'])
+@admin_required
+def analytics_redemptions():
+    """Redemptions per reward category"""
+    return jsonify(AnalyticsService.get_redemptions_by_category(*_report_range()))
+
+@app.route('/api/analytics/transfers', methods=['GET'])
+@admin_required
+def analytics_transfers():
+    """Transfers per tier"""
+    return jsonify(AnalyticsService.get_transfers_by_tier(*_report_range()))
 
 # Initialize database and seed data
 def init_db():
@@ -0,0 +1,97 @@
+"""
+Transaction archiving for Mukuru Loyalty Program
+
+Closed months are moved from `transactions` into `transactions_archive` in
+chunks, keeping the live table (and its indexes) sized to recent activity.
+The archive boundary is stored as a JobCheckpoint (YYYYMM); reads only touch
+the archive when the requested range starts before it.
+
+This is a portable archive-table scheme; on PostgreSQL the same boundary can
+be mapped onto monthly partitions.
+"""
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from config import Config
+from models import db, Transaction, TransactionArchive, JobCheckpoint
+
+CHECKPOINT_NAME = 'archive_transactions'
+
+def boundary_from_checkpoint(checkpoint: Optional[JobCheckpoint]) -> Optional[datetime]:
+    """Decode the YYYYMM boundary stored in the archive checkpoint"""
+    if checkpoint is None or not checkpoint.position:
+        return None
+    return datetime(checkpoint.position // 100, checkpoint.position % 100, 1)
+
+def archive_boundary() -> Optional[datetime]:
+    """First instant not yet eligible for the archive, or None if nothing is archived"""
+    return boundary_from_checkpoint(db.session.get(JobCheckpoint, CHECKPOINT_NAME))
+
+def default_cutoff(now: datetime = None) -> datetime:
+    """Start of the oldest month kept live under TRANSACTION_ARCHIVE_AFTER_MONTHS"""
+    now = now or datetime.utcnow()
+    months = now.year * 12 + now.month - 1 - Config.TRANSACTION_ARCHIVE_AFTER_MONTHS
+    return datetime(months // 12, months % 12 + 1, 1)
+
+def _move_chunk(boundary: datetime, chunk_size: int) -> int:
+    live = Transaction.__table__
+    archived = TransactionArchive.__table__
+    ids = [row_id for (row_id,) in db.session.query(live.c.id)
+                                             .filter(live.c.created_at < boundary)
+                                             .order_by(live.c.id)
+                                             .limit(chunk_size)]
+    if not ids:
+        return 0
+
+    columns = [column.name for column in archived.columns]
+    db.session.execute(
+        db.insert(archived).from_select(columns,
+                                        db.select(*[live.c[name] for name in columns])
+                                          .where(live.c.id.in_(ids)))
+    )
+    db.session.execute(db.delete(live).where(live.c.id.in_(ids)))
+    db.session.commit()
+    return len(ids)
+
+def archive_transactions(before: datetime = None, chunk_size: int = 5000, dry_run: bool = False) -> Dict:
+    """Move transactions from months before `before` into the archive
+
+    The boundary is committed before any rows move, so readers consult the
+    archive while the job runs; each chunk is moved in its own transaction, so
+    an interrupted run is resumed by running it again.
+    """
+    requested = (before or default_cutoff()).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    current = archive_boundary()
+    boundary = max(requested, current) if current else requested
+
+    if dry_run:
+        pending = db.session.query(db.func.count(Transaction.id))\
+                            .filter(Transaction.created_at < boundary)\
+                            .scalar()
+        return {'dry_run': True, 'boundary': boundary.isoformat(), 'to_move': pending}
+
+    if boundary != current:
+        checkpoint = db.session.get(JobCheckpoint, CHECKPOINT_NAME) or JobCheckpoint(name=CHECKPOINT_NAME)
+        checkpoint.position = boundary.year * 100 + boundary.month
+        db.session.add(checkpoint)
+        db.session.commit()
+
+    started = time.perf_counter()
+    moved = chunks = 0
+    while True:
+        count = _move_chunk(boundary, chunk_size)
+        if not count:
+            break
+        moved += count
+        chunks += 1
+
+    elapsed = time.perf_counter() - started
+    return {
+        'dry_run': False,
+        'boundary': boundary.isoformat(),
+        'moved': moved,
+        'chunks': chunks,
+        'elapsed_seconds': round(elapsed, 3),
+        'rows_per_second': round(moved / elapsed) if elapsed else None
+    }
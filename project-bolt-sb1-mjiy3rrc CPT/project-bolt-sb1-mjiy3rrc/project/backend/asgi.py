@@ -0,0 +1,189 @@
+"""
+ASGI entry point for Mukuru Loyalty Program
+
+Serves the I/O-bound read endpoints (profile, live events, rewards,
+transactions, leaderboard) natively on asyncio with an async SQLAlchemy
+engine, so idle SSE clients and slow readers cost a coroutine rather than a
+worker thread. Every other route is handed to the existing Flask app, run in
+a thread pool, so writes and their cache/version bumps happen in the same
+process as the async reads.
+
+Run with `uvicorn asgi:application --workers N`.
+"""
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Optional, Tuple
+
+from a2wsgi import WSGIMiddleware
+from flask_jwt_extended import decode_token
+from flask_jwt_extended.exceptions import JWTExtendedException
+from itsdangerous import BadSignature
+from jwt import PyJWTError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+from app import app as flask_app
+from auth import identity_cache, valid_identity
+from async_services import AsyncUserService, AsyncTransactionService, AsyncRewardService, AsyncLoyaltyService
+from cache import catalogue_etag, catalogue_state_query, profile_etag, profile_state_query
+from config import Config
+from events import astream_user_events
+from models import db
+
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg', 'postgres': 'postgresql+asyncpg'}
+
+def async_database_url() -> str:
+    """The sync app's database URL (as resolved by Flask-SQLAlchemy) on an async driver"""
+    if Config.ASYNC_DATABASE_URL:
+        return Config.ASYNC_DATABASE_URL
+    with flask_app.app_context():
+        url = db.engine.url
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername)) \
+              .render_as_string(hide_password=False)
+
+def _credentials(request: Request) -> Optional[Tuple[int, int]]:
+    """(user id, token version) from a bearer access token or the Flask session cookie"""
+    authorization = request.headers.get('authorization', '')
+    if authorization.startswith('Bearer '):
+        try:
+            with flask_app.app_context():
+                claims = decode_token(authorization[len('Bearer '):])
+        except (PyJWTError, JWTExtendedException):
+            return None
+        if claims.get('type') != 'access':
+            return None
+        return int(claims['sub']), claims.get('ver', 0)
+
+    cookie = request.cookies.get(flask_app.config['SESSION_COOKIE_NAME'])
+    if not cookie:
+        return None
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    try:
+        data = serializer.loads(cookie, max_age=int(flask_app.permanent_session_lifetime.total_seconds()))
+    except BadSignature:
+        return None
+    if 'user_id' not in data:
+        return None
+    return data['user_id'], data.get('ver', 0)
+
+async def request_user_id(request: Request) -> Optional[int]:
+    """Authenticate like the Flask app, through the same per-worker identity cache"""
+    credentials = _credentials(request)
+    if credentials is None:
+        return None
+    user_id, token_version = credentials
+    identity = identity_cache.get(user_id)
+    if identity is None:  # only open a session on a cache miss
+        async with request.app.state.sessions() as session:
+            identity = await AsyncUserService.load_identity(session, user_id)
+    identity = valid_identity(identity, token_version)
+    return identity.user_id if identity else None
+
+def _unauthenticated() -> JSONResponse:
+    return JSONResponse({'error': 'Not authenticated'}, status_code=401)
+
+def _not_modified(request: Request, etag: str) -> Optional[Response]:
+    """Return a 304 response if the client already holds this representation"""
+    quoted = '"%s"' % etag
+    if_none_match = request.headers.get('if-none-match', '')
+    if quoted in if_none_match or if_none_match.strip() == '*':
+        return Response(status_code=304, headers={'ETag': quoted})
+    return None
+
+def _query_int(request: Request, name: str, default: int) -> int:
+    try:
+        return int(request.query_params.get(name, default))
+    except ValueError:
+        return default
+
+def _query_datetime(request: Request, name: str) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(request.query_params[name])
+    except (KeyError, ValueError):
+        return None
+
+async def user_profile(request: Request):
+    """Get current user profile with transactions"""
+    user_id = await request_user_id(request)
+    if user_id is None:
+        return _unauthenticated()
+
+    async with request.app.state.sessions() as session:
+        state = await session.scalar(profile_state_query(user_id))
+        etag = profile_etag(user_id, state)
+        not_modified = _not_modified(request, etag)
+        if not_modified:
+            return not_modified
+        profile = await AsyncUserService.get_user_profile_data(session, user_id, state)
+    if not profile:
+        return JSONResponse({'error': 'User not found'}, status_code=404)
+    return JSONResponse(profile, headers={'ETag': '"%s"' % etag, 'Cache-Control': 'private, no-cache'})
+
+async def user_events(request: Request):
+    """Stream live balance/points/tier updates as server-sent events"""
+    user_id = await request_user_id(request)
+    if user_id is None:
+        return _unauthenticated()
+    return StreamingResponse(astream_user_events(user_id), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+async def rewards(request: Request):
+    """Get all available rewards"""
+    category = request.query_params.get('category')
+    async with request.app.state.sessions() as session:
+        etag = catalogue_etag(tuple((await session.execute(catalogue_state_query())).one()), category)
+        not_modified = _not_modified(request, etag)
+        if not_modified:
+            return not_modified
+        body = await AsyncRewardService.get_available_rewards(session, category)
+    return JSONResponse(body, headers={'ETag': '"%s"' % etag,
+                                       'Cache-Control': 'public, max-age=%d' % Config.REWARDS_CACHE_MAX_AGE})
+
+async def transactions(request: Request):
+    """Get user transaction history"""
+    user_id = await request_user_id(request)
+    if user_id is None:
+        return _unauthenticated()
+
+    async with request.app.state.sessions() as session:
+        body = await AsyncTransactionService.get_user_transactions(
+            session, user_id,
+            _query_int(request, 'page', 1),
+            _query_int(request, 'per_page', 20),
+            request.query_params.get('type'),
+            _query_datetime(request, 'start_date'),
+            _query_datetime(request, 'end_date')
+        )
+    return JSONResponse(body)
+
+async def leaderboard(request: Request):
+    """Get top users by points"""
+    async with request.app.state.sessions() as session:
+        body = await AsyncLoyaltyService.get_leaderboard(session, min(_query_int(request, 'limit', 10), 100))
+    return JSONResponse(body)
+
+def create_application(database_url: str = None) -> Starlette:
+    """Build the ASGI app; `database_url` overrides the async engine URL"""
+    engine = create_async_engine(database_url or async_database_url())
+
+    @asynccontextmanager
+    async def lifespan(application):
+        yield
+        await engine.dispose()
+
+    application = Starlette(routes=[
+        Route('/api/user/profile', user_profile),
+        Route('/api/user/events', user_events),
+        Route('/api/rewards', rewards),
+        Route('/api/transactions', transactions),
+        Route('/api/leaderboard', leaderboard),
+        Mount('/', WSGIMiddleware(flask_app))
+    ], lifespan=lifespan)
+    application.state.engine = engine
+    application.state.sessions = async_sessionmaker(engine, expire_on_commit=False)
+    return application
+
+application = create_application()
@@ -0,0 +1,109 @@
+"""
+Async read services for the ASGI tier of Mukuru Loyalty Program
+
+Read-only counterparts of the service methods behind the profile, rewards,
+transactions and leaderboard endpoints, running on an AsyncSession. They
+share the models, statement builders, response shapes, per-user response cache
+and archive boundary with services.py so both tiers return identical
+payloads; writes stay on the sync services.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from archive import CHECKPOINT_NAME, boundary_from_checkpoint
+from auth import IDENTITY_COLUMNS, Identity, identity_cache
+from cache import profile_cache
+from models import User, JobCheckpoint
+from services import (available_rewards_statement, count_statement, history_statements, leaderboard_rows,
+                      leaderboard_statement, page_window, profile_payload, redeemed_reward_ids_statement,
+                      redemption_counts_statement, rewards_payload, transactions_page)
+
+async def archive_boundary(session: AsyncSession) -> Optional[datetime]:
+    """First instant not yet eligible for the archive, or None if nothing is archived"""
+    return boundary_from_checkpoint(await session.get(JobCheckpoint, CHECKPOINT_NAME))
+
+class AsyncUserService:
+    """Async user reads"""
+
+    @staticmethod
+    async def load_identity(session: AsyncSession, user_id: int) -> Optional[Identity]:
+        """Get a user's identity from the worker cache, reading its columns on a miss"""
+        identity = identity_cache.get(user_id)
+        if identity is None:
+            row = (await session.execute(select(*IDENTITY_COLUMNS).where(User.id == user_id))).first()
+            if row is None:
+                return None
+            identity = Identity(*row)
+            identity_cache.put(identity)
+        return identity
+
+    @staticmethod
+    async def get_user_profile_data(session: AsyncSession, user_id: int, state=None) -> Optional[Dict]:
+        """Get user profile with recent transactions, served from the shared per-user cache"""
+        version = profile_cache.cache_version(user_id, state)
+        profile = profile_cache.get(user_id, version)
+        if profile is not None:
+            return profile
+
+        user = await session.get(User, user_id)
+        if not user:
+            return None
+        transactions = await AsyncTransactionService.get_recent_transactions(session, user_id, 10)
+        redeemed_reward_ids = list(await session.scalars(redeemed_reward_ids_statement(user_id)))
+
+        profile = profile_payload(user, transactions, redeemed_reward_ids)
+        profile_cache.put(user_id, version, profile)
+        return profile
+
+class AsyncTransactionService:
+    """Async transaction history reads"""
+
+    @staticmethod
+    async def get_recent_transactions(session: AsyncSession, user_id: int, limit: int) -> List:
+        """Get a user's newest transactions, reaching into the archive only if live rows run out"""
+        transactions = []
+        for statement in history_statements(user_id, await archive_boundary(session)):
+            if len(transactions) >= limit:
+                break
+            transactions += await session.scalars(statement.limit(limit - len(transactions)))
+        return transactions
+
+    @staticmethod
+    async def get_user_transactions(session: AsyncSession, user_id: int, page: int = 1, per_page: int = 20,
+                                    transaction_type: str = None, start_date: datetime = None,
+                                    end_date: datetime = None) -> Dict:
+        """Get paginated user transactions across live and archived months"""
+        statements = history_statements(user_id, await archive_boundary(session), transaction_type,
+                                        start_date, end_date)
+        offset = max(page - 1, 0) * per_page
+        items = []
+        total = 0
+        for statement in statements:
+            count = await session.scalar(count_statement(statement))
+            window = page_window(offset, per_page, len(items), total, count)
+            if window:
+                items += await session.scalars(statement.offset(window[0]).limit(window[1]))
+            total += count
+
+        return transactions_page(items, total, page, per_page)
+
+class AsyncRewardService:
+    """Async catalogue reads"""
+
+    @staticmethod
+    async def get_available_rewards(session: AsyncSession, category: str = None) -> List[Dict]:
+        """Get all available rewards, optionally filtered by category"""
+        rewards = list(await session.scalars(available_rewards_statement(category)))
+        counts = dict((await session.execute(redemption_counts_statement([reward.id for reward in rewards]))).all())
+        return rewards_payload(rewards, counts)
+
+class AsyncLoyaltyService:
+    """Async loyalty reads"""
+
+    @staticmethod
+    async def get_leaderboard(session: AsyncSession, limit: int = 10) -> List[Dict]:
+        """Get top users by points for leaderboard"""
+        return leaderboard_rows(list(await session.scalars(leaderboard_statement(limit))))
@@ -0,0 +1,156 @@
+"""
+Token authentication for Mukuru Loyalty Program
+
+Clients authenticate with signed access/refresh tokens (Flask-JWT-Extended)
+carrying the user id and the user's token version. Each worker caches the
+identity fields routes need (id, tier, active flag, token version, admin flag) so
+authenticated reads don't load the `User` row per request. Revoking tokens
+bumps `User.token_version`; other workers stop accepting old tokens once
+their cached identity expires, i.e. within IDENTITY_CACHE_TTL seconds.
+
+The session cookie set at login is still accepted (the web app and the ASGI
+tier use it), checked against the same cached identity.
+"""
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Dict, NamedTuple, Optional
+
+from flask import jsonify, request, session
+from flask_jwt_extended import create_access_token, create_refresh_token, verify_jwt_in_request
+
+from config import Config
+from models import db, User
+
+# Per-request slot, copied into batched sub-requests along with the rest of the environ
+ENVIRON_KEY = 'mukuru.identity'
+
+class Identity(NamedTuple):
+    user_id: int
+    tier: str
+    is_active: bool
+    token_version: int
+    is_admin: bool = False
+
+class IdentityCache:
+    """LRU of identities, each trusted for `ttl` seconds after loading"""
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: 'OrderedDict[int, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[Identity]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] <= time.monotonic():
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[1]
+
+    def put(self, identity: Identity):
+        with self._lock:
+            self._entries[identity.user_id] = (time.monotonic() + self.ttl, identity)
+            self._entries.move_to_end(identity.user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        """Reload this user's identity on next use (tier change, revocation)"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+identity_cache = IdentityCache(Config.IDENTITY_CACHE_MAX_ENTRIES, Config.IDENTITY_CACHE_TTL)
+
+IDENTITY_COLUMNS = (User.id, User.tier, User.is_active, User.token_version, User.is_admin)
+
+def load_identity(user_id: int) -> Optional[Identity]:
+    """Get a user's identity from the worker cache, reading its columns on a miss"""
+    identity = identity_cache.get(user_id)
+    if identity is None:
+        row = db.session.execute(db.select(*IDENTITY_COLUMNS).where(User.id == user_id)).first()
+        if row is None:
+            return None
+        identity = Identity(*row)
+        identity_cache.put(identity)
+    return identity
+
+def valid_identity(identity: Optional[Identity], token_version: int) -> Optional[Identity]:
+    """The identity if it may still use credentials issued at `token_version`"""
+    if identity is None or not identity.is_active or identity.token_version != token_version:
+        return None
+    return identity
+
+def issue_access_token(identity: Identity) -> str:
+    """Create a short-lived access token"""
+    return create_access_token(identity=str(identity.user_id), additional_claims={'ver': identity.token_version})
+
+def issue_tokens(identity: Identity) -> Dict[str, str]:
+    """Create an access/refresh token pair"""
+    return {
+        'access_token': issue_access_token(identity),
+        'refresh_token': create_refresh_token(identity=str(identity.user_id),
+                                              additional_claims={'ver': identity.token_version})
+    }
+
+def _authenticate(refresh: bool = False) -> Optional[Identity]:
+    decoded = verify_jwt_in_request(optional=True, refresh=refresh)
+    if decoded:
+        claims = decoded[1]
+        return valid_identity(load_identity(int(claims['sub'])), claims.get('ver', 0))
+    if refresh or 'user_id' not in session:
+        return None
+    return valid_identity(load_identity(session['user_id']), session.get('ver', 0))
+
+def current_identity() -> Optional[Identity]:
+    """Identity of the authenticated caller, or None; resolved once per request
+
+    Expired or malformed tokens raise, so the client gets Flask-JWT-Extended's
+    401/422 response and knows to refresh.
+    """
+    if ENVIRON_KEY not in request.environ:
+        request.environ[ENVIRON_KEY] = _authenticate()
+    return request.environ[ENVIRON_KEY]
+
+def current_user_id() -> Optional[int]:
+    identity = current_identity()
+    return identity.user_id if identity else None
+
+def refresh_identity() -> Optional[Identity]:
+    """Identity behind a valid refresh token in the Authorization header"""
+    return _authenticate(refresh=True)
+
+def login_required(view):
+    """Reject unauthenticated requests with 401"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if current_identity() is None:
+            return jsonify({'error': 'Not authenticated'}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+def admin_required(view):
+    """Reject unauthenticated requests with 401 and non-admin users with 403"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        identity = current_identity()
+        if identity is None:
+            return jsonify({'error': 'Not authenticated'}), 401
+        if not identity.is_admin:
+            return jsonify({'error': 'Admin access required'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+def revoke_tokens(user_id: int) -> bool:
+    """Invalidate every token and session issued to a user so far"""
+    updated = User.query.filter_by(id=user_id)\
+                        .update({User.token_version: User.token_version + 1}, synchronize_session=False)
+    db.session.commit()
+    identity_cache.invalidate(user_id)
+    return bool(updated)
@@ -0,0 +1,90 @@
+"""
+Batched requests for Mukuru Loyalty Program
+
+The app fetches profile, transactions, rewards and the rest as one batch on
+launch. Sub-requests run in nested request contexts that share the batch's
+app context, so they use one SQLAlchemy session: a `User` (or any other
+row) loaded by one sub-request comes from the identity map in the next. They
+also inherit the batch's authenticated identity instead of re-authenticating.
+Only read-only endpoints are allowed.
+"""
+import io
+from typing import Dict, List
+
+from flask import current_app, request, session
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import PyJWTError
+from werkzeug.exceptions import HTTPException
+
+from auth import ENVIRON_KEY, current_identity
+from config import Config
+from models import db, User
+
+# Validators belong to the batch request, not to its sub-requests
+_BATCH_ONLY_HEADERS = ('HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE', 'HTTP_IDEMPOTENCY_KEY')
+
+def _sub_environ(path: str, query: str, headers: Dict) -> Dict:
+    """The batch request's WSGI environ, rewritten as a body-less GET"""
+    environ = {key: value for key, value in request.environ.items()
+               if key not in _BATCH_ONLY_HEADERS and key != 'CONTENT_TYPE'}
+    environ.update({'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query,
+                    'CONTENT_LENGTH': '0', 'wsgi.input': io.BytesIO()})
+    for name, value in headers.items():
+        environ['HTTP_' + name.upper().replace('-', '_')] = str(value)
+    if any(name.lower() == 'authorization' for name in headers):
+        environ.pop(ENVIRON_KEY, None)  # the sub-request brings its own credentials
+    return environ
+
+def _error(sub_request_id, status: int, message: str) -> Dict:
+    return {'id': sub_request_id, 'status': status, 'body': {'error': message}}
+
+def _run(sub_request: Dict) -> Dict:
+    sub_request_id = sub_request.get('id')
+    method = str(sub_request.get('method', 'GET')).upper()
+    url = sub_request.get('path')
+    headers = sub_request.get('headers') or {}
+    if not isinstance(url, str) or not url.startswith('/') or not isinstance(headers, dict):
+        return _error(sub_request_id, 400, 'Each request needs a path starting with /')
+    if method != 'GET':
+        return _error(sub_request_id, 405, 'Only GET requests can be batched')
+
+    path, _, query = url.partition('?')
+    try:
+        endpoint, view_args = current_app.url_map.bind_to_environ(request.environ).match(path, method='GET')
+    except HTTPException as e:
+        return _error(sub_request_id, e.code, e.description)
+    if endpoint not in Config.BATCH_ENDPOINTS:
+        return _error(sub_request_id, 400, f'{path} cannot be batched')
+
+    context = current_app.request_context(_sub_environ(path, query, headers))
+    context.session = session._get_current_object()  # already opened and verified
+    context.push()
+    try:
+        response = current_app.make_response(current_app.view_functions[endpoint](**view_args))
+    except HTTPException as e:
+        response = e.get_response()
+    except (JWTExtendedException, PyJWTError) as e:
+        # The sub-request's own expired or malformed token; answer as Flask-JWT-Extended would (401/422)
+        response = current_app.make_response(current_app.handle_user_exception(e))
+    except Exception:
+        current_app.logger.exception('Batched request to %s failed', path)
+        db.session.rollback()
+        return _error(sub_request_id, 500, 'Internal server error')
+    finally:
+        context.pop()
+
+    result = {'id': sub_request_id, 'status': response.status_code,
+              'body': response.get_json(silent=True) if response.status_code != 304 else None}
+    if 'ETag' in response.headers:
+        result['headers'] = {'ETag': response.headers['ETag']}
+    return result
+
+def run_batch(sub_requests: List[Dict]) -> List[Dict]:
+    """Run read-only sub-requests in order, returning one result per sub-request"""
+    # The identity map holds instances weakly; keeping the user referenced for the
+    # whole batch is what lets every sub-request's User.query.get() skip the database
+    identity = current_identity()
+    user = db.session.get(User, identity.user_id) if identity else None
+    results = [_run(sub_request if isinstance(sub_request, dict) else {}) for sub_request in sub_requests]
+    del user
+    return results
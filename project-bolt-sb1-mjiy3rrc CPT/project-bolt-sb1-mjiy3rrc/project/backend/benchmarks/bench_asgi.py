@@ -0,0 +1,129 @@
+"""
+Benchmark idle live-event connections: threaded WSGI vs the ASGI tier
+
+Starts each server in its own process, opens N concurrent
+`/api/user/events` streams, reports the server's threads and resident
+memory while they idle, then the server CPU time spent answering N
+concurrent profile reads on top of them (wall time is dominated by the
+single-process client). Linux only (reads /proc); needs httpx from
+requirements-dev.txt. Run from the backend directory:
+`python benchmarks/bench_asgi.py --connections 500`
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+SERVERS = [
+    ('threaded WSGI', ['-m', 'flask', '--app', 'app', 'run', '--with-threads', '--port']),
+    ('ASGI (uvicorn)', ['-m', 'uvicorn', 'asgi:application', '--log-level', 'warning', '--port']),
+]
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def process_cpu(pid: int) -> float:
+    """User plus system CPU seconds used by a process"""
+    with open(f'/proc/{pid}/stat') as stat:
+        fields = stat.read().rpartition(')')[2].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+def process_status(pid: int):
+    """(threads, resident MiB) of a process"""
+    fields = {}
+    with open(f'/proc/{pid}/status') as status:
+        for line in status:
+            key, _, value = line.partition(':')
+            fields[key] = value.split()
+    return int(fields['Threads'][0]), int(fields['VmRSS'][0]) / 1024
+
+async def wait_until_listening(client):
+    import httpx
+
+    for _ in range(200):
+        try:
+            await client.get('/api/leaderboard')
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.05)
+    raise RuntimeError("server did not start")
+
+async def measure(pid: int, port: int, cookies):
+    import httpx
+
+    limits = httpx.Limits(max_connections=None)
+    async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{port}', limits=limits, timeout=60) as client:
+        await wait_until_listening(client)
+        opened = asyncio.Event()
+        release = asyncio.Event()
+        ready = 0
+
+        async def hold(cookie):
+            nonlocal ready
+            async with client.stream('GET', '/api/user/events', cookies=cookie):
+                ready += 1
+                if ready == len(cookies):
+                    opened.set()
+                await release.wait()
+
+        started = time.perf_counter()
+        holders = [asyncio.create_task(hold(cookie)) for cookie in cookies]
+        await opened.wait()
+        open_seconds = time.perf_counter() - started
+        threads, rss = process_status(pid)
+
+        cpu = process_cpu(pid)
+        responses = await asyncio.gather(*[client.get('/api/user/profile', cookies=cookie) for cookie in cookies])
+        read_cpu = process_cpu(pid) - cpu
+        assert all(response.status_code == 200 for response in responses)
+
+        release.set()
+        await asyncio.gather(*holders)
+    return open_seconds, threads, rss, read_cpu
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--connections', type=int, default=200)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+    os.environ['SSE_HEARTBEAT_SECONDS'] = '300'
+    from app import app as flask_app
+    from models import db, User
+
+    with flask_app.app_context():
+        db.create_all()
+        db.session.execute(db.insert(User), [{'name': f'User {i}', 'email': f'user{i}@example.com'}
+                                            for i in range(args.connections)])
+        db.session.commit()
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    cookie_name = flask_app.config['SESSION_COOKIE_NAME']
+    cookies = [{cookie_name: serializer.dumps({'user_id': user_id})} for user_id in range(1, args.connections + 1)]
+
+    print(f"{args.connections} concurrent clients\n")
+    print(f"{'server':<16}{'open s':>10}{'threads':>10}{'RSS MiB':>10}{'read CPU s':>12}")
+    for label, command in SERVERS:
+        port = free_port()
+        server = subprocess.Popen([sys.executable, *command, str(port)], cwd=BACKEND,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            open_seconds, threads, rss, read_cpu = asyncio.run(measure(server.pid, port, cookies))
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"{label:<16}{open_seconds:>10.2f}{threads:>10}{rss:>10.1f}{read_cpu:>12.2f}")
+
+    os.remove(path)
+
+if __name__ == '__main__':
+    main()
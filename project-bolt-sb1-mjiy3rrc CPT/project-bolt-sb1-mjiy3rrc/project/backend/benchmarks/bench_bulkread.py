@@ -0,0 +1,123 @@
+"""
+Benchmark bulk reads of transactions: ORM objects vs compact records vs columnar chunks
+
+Each path totals amount per user over the whole table; peak memory is
+measured with tracemalloc. Run from the backend directory:
+`python benchmarks/bench_bulkread.py --transactions 500000`
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def seed(db, users: int, transactions: int):
+    from models import User, Transaction
+
+    now = datetime.utcnow()
+    db.session.execute(db.insert(User), [
+        {'name': f'User {i}', 'email': f'user{i}@example.com', 'balance': 5000.0, 'points': 0,
+         'total_sent': 0.0, 'tier': 'Bronze', 'is_active': True, 'created_at': now, 'updated_at': now}
+        for i in range(users)])
+    batch = []
+    for i in range(transactions):
+        batch.append({'user_id': i % users + 1, 'transaction_type': 'send', 'amount': float(100 + i % 900),
+                      'points_earned': 1 + i % 9, 'reference': f'BENCH{i:010d}', 'status': 'completed',
+                      'created_at': now})
+        if len(batch) == 50000:
+            db.session.execute(db.insert(Transaction), batch)
+            batch = []
+    if batch:
+        db.session.execute(db.insert(Transaction), batch)
+    db.session.commit()
+
+def orm_all(chunk_size):
+    from models import Transaction
+
+    totals = defaultdict(float)
+    for transaction in Transaction.query.all():
+        totals[transaction.user_id] += transaction.amount
+    return totals
+
+def orm_yield_per(chunk_size):
+    from models import Transaction
+
+    totals = defaultdict(float)
+    for transaction in Transaction.query.yield_per(chunk_size):
+        totals[transaction.user_id] += transaction.amount
+    return totals
+
+def records(chunk_size):
+    from bulkread import iter_transactions
+
+    totals = defaultdict(float)
+    for transaction in iter_transactions(columns=('id', 'user_id', 'amount'), chunk_size=chunk_size):
+        totals[transaction.user_id] += transaction.amount
+    return totals
+
+def columnar(chunk_size):
+    from bulkread import iter_columns
+    from models import Transaction
+
+    totals = defaultdict(float)
+    for chunk in iter_columns(Transaction, ('id', 'user_id', 'amount'), chunk_size=chunk_size):
+        for user_id, amount in zip(chunk['user_id'], chunk['amount']):
+            totals[user_id] += amount
+    return totals
+
+def columnar_numpy(chunk_size):
+    import numpy
+    from bulkread import iter_columns
+    from models import Transaction
+
+    totals = numpy.zeros(0)
+    for chunk in iter_columns(Transaction, ('id', 'user_id', 'amount'), chunk_size=chunk_size, use_numpy=True):
+        sums = numpy.bincount(chunk['user_id'], weights=chunk['amount'], minlength=len(totals))
+        if len(sums) > len(totals):
+            totals = numpy.pad(totals, (0, len(sums) - len(totals)))
+        totals += sums
+    return totals
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--transactions', type=int, default=200000)
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+    from app import app
+    from bulkread import numpy
+    from models import db
+
+    paths = [('ORM .all()', orm_all), ('ORM yield_per', orm_yield_per),
+             ('slotted records', records), ('columnar (array)', columnar)]
+    if numpy is not None:
+        paths.append(('columnar (numpy)', columnar_numpy))
+
+    with app.app_context():
+        db.create_all()
+        seed(db, args.users, args.transactions)
+        print(f"{args.transactions} transactions, {args.users} users, chunk size {args.chunk_size}\n")
+        print(f"{'path':<20}{'seconds':>10}{'peak MiB':>12}")
+        for label, run in paths:
+            db.session.expunge_all()
+            tracemalloc.start()
+            started = time.perf_counter()
+            run(args.chunk_size)
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            db.session.rollback()
+            print(f"{label:<20}{elapsed:>10.2f}{peak / 2 ** 20:>12.1f}")
+
+    os.remove(path)
+
+if __name__ == '__main__':
+    main()
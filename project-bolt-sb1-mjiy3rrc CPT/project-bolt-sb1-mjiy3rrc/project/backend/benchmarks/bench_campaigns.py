@@ -0,0 +1,73 @@
+"""
+Benchmark campaign matching against a large active rule set
+
+Run from the backend directory: `python benchmarks/bench_campaigns.py --rules 500`
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from campaigns import CampaignIndex
+from models import Campaign
+
+PREFIXES = ['263', '27', '260', '265', '258', '267', '266', '268', '254', '255', '256', '234', '44', '1']
+TIERS = ['Bronze', 'Silver', 'Gold']
+
+def make_rules(count: int, now: datetime):
+    rng = random.Random(42)
+    rules = []
+    for rule_id in range(1, count + 1):
+        start = now + timedelta(hours=rng.randint(-72, 24))
+        low = rng.choice([None, 100, 500, 1000])
+        rules.append(Campaign(
+            id=rule_id,
+            name=f'Campaign {rule_id}',
+            multiplier=rng.choice([1.0, 1.5, 2.0]),
+            bonus_points=rng.choice([0, 0, 5, 10]),
+            tiers=rng.choice([None, 'Gold', 'Silver,Gold', 'Bronze']),
+            recipient_prefix=rng.choice([None, None] + PREFIXES),
+            min_amount=low,
+            max_amount=low * 20 if low else None,
+            starts_at=start,
+            ends_at=start + timedelta(hours=rng.randint(1, 96))
+        ))
+    return rules
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rules', type=int, default=500)
+    parser.add_argument('--iterations', type=int, default=200000)
+    args = parser.parse_args()
+
+    now = datetime.utcnow()
+    rules = make_rules(args.rules, now)
+
+    started = time.perf_counter()
+    index = CampaignIndex(rules)
+    compile_ms = (time.perf_counter() - started) * 1000
+
+    rng = random.Random(7)
+    transfers = [(rng.choice(TIERS), rng.uniform(50, 20000), '+' + rng.choice(PREFIXES) + '771234567')
+                 for _ in range(1000)]
+
+    matched = 0
+    started = time.perf_counter()
+    for i in range(args.iterations):
+        tier, amount, phone = transfers[i % len(transfers)]
+        if index.match(tier, amount, phone, now).campaign_ids:
+            matched += 1
+    elapsed = time.perf_counter() - started
+
+    print(f"rules:            {args.rules} ({index.size} index entries)")
+    print(f"compile:          {compile_ms:.2f} ms")
+    print(f"matches:          {args.iterations} ({matched} with a campaign)")
+    print(f"per match:        {elapsed / args.iterations * 1e6:.2f} us")
+    print(f"matches / second: {args.iterations / elapsed:,.0f}")
+
+if __name__ == '__main__':
+    main()
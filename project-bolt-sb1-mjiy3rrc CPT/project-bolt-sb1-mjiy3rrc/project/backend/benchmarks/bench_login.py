@@ -0,0 +1,107 @@
+"""
+Benchmark login throughput per process: hashing inline vs on the bounded pool
+
+Concurrent clients log in for a fixed time while one client keeps reading the
+leaderboard; the read latency shows how much login hashing starves the rest
+of the process. Run from the backend directory:
+`python benchmarks/bench_login.py --clients 64 --seconds 10`
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def seed(db, users: int, password_hash: str):
+    from datetime import datetime
+    from models import User
+
+    now = datetime.utcnow()
+    db.session.execute(db.insert(User), [
+        {'name': f'User {i}', 'email': f'user{i}@example.com', 'password_hash': password_hash,
+         'balance': 5000.0, 'points': 0, 'total_sent': 0.0, 'tier': 'Bronze', 'is_active': True,
+         'token_version': 0, 'created_at': now, 'updated_at': now}
+        for i in range(users)])
+    db.session.commit()
+
+def run(app, clients: int, users: int, seconds: float):
+    deadline = time.perf_counter() + seconds
+    counts = {'ok': 0, 'busy': 0, 'failed': 0}
+    latencies = []
+    lock = threading.Lock()
+
+    def login(index):
+        client = app.test_client()
+        while time.perf_counter() < deadline:
+            status = client.post('/api/auth/login', json={'email': f'user{index % users}@example.com',
+                                                          'password': 'secret'}).status_code
+            key = 'ok' if status == 200 else 'busy' if status == 503 else 'failed'
+            with lock:
+                counts[key] += 1
+
+    def read():
+        client = app.test_client()
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            client.get('/api/leaderboard')
+            latencies.append((time.perf_counter() - started) * 1000)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=login, args=(i,)) for i in range(clients)] + [threading.Thread(target=read)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'logins_per_second': counts['ok'] / elapsed,
+        'busy': counts['busy'],
+        'failed': counts['failed'],
+        'read_p50_ms': statistics.median(latencies) if latencies else 0.0,
+        'read_p99_ms': latencies[int(len(latencies) * 0.99)] if latencies else 0.0
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=64)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+    import passwords
+    from app import app
+    from models import db
+
+    class InlineHasher(passwords.PasswordHasher):
+        """Hash on the request thread with no bound, as before the pool"""
+
+        def _run(self, function, *args):
+            return function(*args)
+
+    pooled = passwords.password_hasher
+    with app.app_context():
+        db.create_all()
+        seed(db, args.users, pooled.hash('secret'))
+
+    print(f"{args.clients} login clients, {pooled.method}, {pooled.workers} pool workers\n")
+    print(f"{'hashing':<10}{'logins/s':>10}{'503s':>8}{'failed':>8}{'read p50 ms':>13}{'read p99 ms':>13}")
+    for label, hasher in (('inline', InlineHasher(pooled.method, 1, 0)), ('pool', pooled)):
+        passwords.password_hasher = hasher
+        sys.modules['app'].password_hasher = hasher
+        result = run(app, args.clients, args.users, args.seconds)
+        print(f"{label:<10}{result['logins_per_second']:>10.1f}{result['busy']:>8}{result['failed']:>8}"
+              f"{result['read_p50_ms']:>13.1f}{result['read_p99_ms']:>13.1f}")
+
+    os.remove(path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+ORM-free bulk reads for Mukuru Loyalty Program batch jobs
+
+Batch jobs that walk every user, transaction or redemption should not build
+ORM instances: each one carries an identity-map entry, instance state and a
+per-instance __dict__. These helpers page through a table by primary key
+with Core selects and hand back either compact __slots__ records or columnar
+chunks backed by `array.array` (NumPy arrays when installed and requested).
+Paging by id keeps every statement short, so no long-lived cursor or
+transaction is held open between chunks.
+"""
+from array import array
+from typing import Dict, Iterator, List, Sequence
+
+import sqlalchemy as sa
+
+from models import db, User, Transaction, Redemption
+
+try:
+    import numpy
+except ImportError:  # optional; columnar chunks fall back to array.array
+    numpy = None
+
+USER_COLUMNS = ('id', 'tier', 'points', 'balance', 'total_sent', 'is_active', 'created_at')
+TRANSACTION_COLUMNS = ('id', 'user_id', 'transaction_type', 'amount', 'points_earned', 'status', 'created_at')
+REDEMPTION_COLUMNS = ('id', 'user_id', 'reward_id', 'points_spent', 'status', 'created_at')
+
+_record_types: Dict[tuple, type] = {}
+
+def record_type(table_name: str, columns: Sequence[str]) -> type:
+    """Get a slotted, tuple-constructed record class for a column list"""
+    key = (table_name, tuple(columns))
+    cls = _record_types.get(key)
+    if cls is None:
+        def __init__(self, row):
+            for name, value in zip(columns, row):
+                setattr(self, name, value)
+
+        def __repr__(self):
+            fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in columns)
+            return f'{cls.__name__}({fields})'
+
+        name = ''.join(part.title() for part in table_name.split('_')) + 'Record'
+        cls = _record_types[key] = type(name, (), {'__slots__': tuple(columns),
+                                                   '__init__': __init__,
+                                                   '__repr__': __repr__})
+    return cls
+
+def _typecode(column) -> str:
+    if isinstance(column.type, sa.Boolean):
+        return 'b'
+    if isinstance(column.type, sa.Integer):
+        return 'q'
+    if isinstance(column.type, sa.Float):
+        return 'd'
+    return ''
+
+def iter_row_chunks(model, columns: Sequence[str], where=None, chunk_size: int = 10000) -> Iterator[List[tuple]]:
+    """Yield lists of plain row tuples, paging through the table by id"""
+    table = model.__table__
+    select = sa.select(*[table.c[name] for name in columns])
+    if where is not None:
+        select = select.where(where)
+    id_position = list(columns).index('id')
+    last_id = 0
+    while True:
+        rows = db.session.execute(select.where(table.c.id > last_id)
+                                        .order_by(table.c.id)
+                                        .limit(chunk_size)).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][id_position]
+        if len(rows) < chunk_size:
+            return
+
+def iter_records(model, columns: Sequence[str], where=None, chunk_size: int = 10000) -> Iterator:
+    """Stream rows as compact __slots__ records; `columns` must include 'id'"""
+    cls = record_type(model.__tablename__, columns)
+    for rows in iter_row_chunks(model, columns, where, chunk_size):
+        yield from map(cls, rows)
+
+def iter_columns(model, columns: Sequence[str], where=None, chunk_size: int = 10000,
+                 use_numpy: bool = False) -> Iterator[Dict[str, Sequence]]:
+    """Stream column-oriented chunks: {column name: values} per chunk
+
+    Numeric and boolean columns become `array.array` (or NumPy arrays with
+    `use_numpy`); other columns, and numeric chunks containing NULLs, stay
+    lists.
+    """
+    if use_numpy and numpy is None:
+        raise RuntimeError("use_numpy requires numpy to be installed")
+    table = model.__table__
+    codes = [_typecode(table.c[name]) for name in columns]
+    for rows in iter_row_chunks(model, columns, where, chunk_size):
+        chunk = {}
+        for position, (name, code) in enumerate(zip(columns, codes)):
+            values = [row[position] for row in rows]
+            if code:
+                try:
+                    values = numpy.array(values, dtype=code) if use_numpy and None not in values \
+                        else array(code, values)
+                except TypeError:
+                    pass  # NULLs present
+            chunk[name] = values
+        yield chunk
+
+def iter_users(where=None, columns: Sequence[str] = USER_COLUMNS, chunk_size: int = 10000) -> Iterator:
+    """Stream users as compact records"""
+    return iter_records(User, columns, where, chunk_size)
+
+def iter_transactions(where=None, columns: Sequence[str] = TRANSACTION_COLUMNS, chunk_size: int = 10000) -> Iterator:
+    """Stream live transactions as compact records"""
+    return iter_records(Transaction, columns, where, chunk_size)
+
+def iter_redemptions(where=None, columns: Sequence[str] = REDEMPTION_COLUMNS, chunk_size: int = 10000) -> Iterator:
+    """Stream redemptions as compact records"""
+    return iter_records(Redemption, columns, where, chunk_size)
@@ -0,0 +1,170 @@
+"""
+In-process response caching for Mukuru Loyalty Program
+"""
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from config import Config
+from models import db, User, Reward
+
+class UserVersions:
+    """Per-user data versions, bumped by every write path touching a user
+
+    Versions come from one counter shared by all users and only the most
+    recently bumped `max_entries` users are kept. Users without an entry
+    report the highest version dropped so far, so an eviction can cause
+    misses but never brings back a version an older response was cached at.
+    """
+
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self._versions: 'OrderedDict[int, int]' = OrderedDict()
+        self._counter = 0
+        self._floor = 0
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> int:
+        """Get the current data version for a user"""
+        return self._versions.get(user_id, self._floor)
+
+    def bump(self, user_id: int) -> int:
+        """Invalidate everything cached for a user and return the new version"""
+        with self._lock:
+            self._counter += 1
+            self._versions[user_id] = self._counter
+            self._versions.move_to_end(user_id)
+            while len(self._versions) > self.max_entries:
+                self._floor = max(self._floor, self._versions.popitem(last=False)[1])
+            return self._counter
+
+    def clear(self):
+        """Forget all versions"""
+        with self._lock:
+            self._versions.clear()
+            self._floor = self._counter
+
+class UserResponseCache:
+    """LRU cache of per-user responses, valid while the user's version is unchanged
+
+    Entries also carry a TTL so time-dependent fields (e.g. monthly points) and
+    writes made by other worker processes are picked up within a bounded window.
+    """
+
+    def __init__(self, versions: UserVersions, max_entries: int = 10000, ttl: float = 30.0):
+        self.versions = versions
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: 'OrderedDict[int, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, user_id: int, builder: Callable[[int], Optional[Any]], state: Any = None) -> Optional[Any]:
+        """Return the cached response for a user, building it on a miss
+
+        `state` is the user's shared row state (e.g. `profile_state`); passing
+        it makes writes from other workers miss the cache immediately.
+        Responses are shared between requests and must be treated as read-only.
+        `None` results (e.g. unknown user) are never cached.
+        """
+        version = self.cache_version(user_id, state)
+        value = self.get(user_id, version)
+        if value is not None:
+            return value
+
+        # Build outside the lock; a write racing with the build bumps the version,
+        # so the entry stored below is simply never served.
+        value = builder(user_id)
+        if value is not None:
+            self.put(user_id, version, value)
+        return value
+
+    def cache_version(self, user_id: int, state: Any = None) -> tuple:
+        """Key an entry must have been stored under to be served"""
+        return self.versions.get(user_id), state
+
+    def get(self, user_id: int, version: tuple) -> Optional[Any]:
+        """Return the cached response if it is still valid for `version`"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] == version and entry[1] > time.monotonic():
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+            return None
+
+    def put(self, user_id: int, version: tuple, value: Any):
+        """Store a response built from data at `version` (read before building)"""
+        with self._lock:
+            self._entries[user_id] = (version, time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id: int):
+        """Drop the cached response for a single user"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        """Drop all entries and reset counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict:
+        """Get hit/miss counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+user_versions = UserVersions(Config.USER_VERSIONS_MAX_ENTRIES)
+profile_cache = UserResponseCache(user_versions, Config.RESPONSE_CACHE_MAX_ENTRIES, Config.RESPONSE_CACHE_TTL)
+dashboard_cache = UserResponseCache(user_versions, Config.RESPONSE_CACHE_MAX_ENTRIES, Config.RESPONSE_CACHE_TTL)
+
+def _stamp(value) -> str:
+    if isinstance(value, datetime):
+        return value.strftime('%Y%m%d%H%M%S%f')
+    return str(value or 0)
+
+def catalogue_state_query():
+    """Aggregates that move on any reward change (including stock), as seen by every worker
+
+    Redemptions alone leave it unchanged, so catalogue redemption counts are
+    refreshed with the next reward change rather than on every redemption.
+    """
+    return db.select(db.select(db.func.count(Reward.id)).scalar_subquery(),
+                     db.select(db.func.max(Reward.updated_at)).scalar_subquery())
+
+def catalogue_state() -> tuple:
+    """Current catalogue state; cached catalogue data built at another state is stale"""
+    return tuple(db.session.execute(catalogue_state_query()).one())
+
+def catalogue_etag(state: tuple, category: str = None) -> str:
+    """Strong ETag for the rewards catalogue at `state`"""
+    count, updated_at = state
+    return f"rw-{count}-{_stamp(updated_at)}-{zlib.crc32((category or '').encode('utf-8')):08x}"
+
+def profile_state_query(user_id: int):
+    """The user's `updated_at`, moved by every write to the user row"""
+    return db.select(User.updated_at).where(User.id == user_id)
+
+def profile_state(user_id: int) -> Optional[datetime]:
+    return db.session.execute(profile_state_query(user_id)).scalar()
+
+def profile_etag(user_id: int, state: Optional[datetime]) -> str:
+    """Strong ETag for a user's profile at `state` (see `profile_state`)"""
+    return f"pf-{user_id}-{_stamp(state)}"
@@ -0,0 +1,136 @@
+"""
+Bonus points campaign engine for Mukuru Loyalty Program
+
+Active campaign rules are compiled into an immutable in-memory index keyed by
+tier and recipient dialling prefix, so matching a transfer in send_money is a
+handful of dict lookups plus time/amount checks on the few rules in those
+buckets. A reload builds a new index and swaps the reference, so concurrent
+requests always see either the old or the new rule set, never a mix.
+"""
+import math
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Iterable, List, NamedTuple, Tuple
+
+from config import Config
+from phones import phone_digits
+
+ANY = '*'
+
+class CampaignMatch(NamedTuple):
+    multiplier: float
+    bonus_points: int
+    campaign_ids: Tuple[int, ...]
+
+NO_MATCH = CampaignMatch(1.0, 0, ())
+
+class CompiledRule:
+    """The fields of a campaign needed at match time"""
+    __slots__ = ('id', 'multiplier', 'bonus_points', 'starts_at', 'ends_at', 'min_amount', 'max_amount')
+
+    def __init__(self, campaign):
+        self.id = campaign.id
+        self.multiplier = campaign.multiplier or 1.0
+        self.bonus_points = campaign.bonus_points or 0
+        self.starts_at = campaign.starts_at
+        self.ends_at = campaign.ends_at
+        self.min_amount = campaign.min_amount if campaign.min_amount is not None else -math.inf
+        self.max_amount = campaign.max_amount if campaign.max_amount is not None else math.inf
+
+class CampaignIndex:
+    """Immutable lookup structure over a set of campaign rules"""
+
+    def __init__(self, campaigns: Iterable):
+        buckets = defaultdict(list)
+        lengths = set()
+        for campaign in campaigns:
+            rule = CompiledRule(campaign)
+            prefix = phone_digits(campaign.recipient_prefix)
+            if prefix:
+                lengths.add(len(prefix))
+            tiers = [tier.strip() for tier in (campaign.tiers or '').split(',') if tier.strip()] or [ANY]
+            for tier in tiers:
+                buckets[(tier, prefix)].append(rule)
+        # Sorted by start time so a scan can stop at the first rule not yet started
+        self._buckets = {key: tuple(sorted(rules, key=lambda rule: rule.starts_at))
+                         for key, rules in buckets.items()}
+        self._prefix_lengths = tuple(sorted(lengths))
+        self.size = sum(len(rules) for rules in self._buckets.values())
+
+    def _candidate_keys(self, tier: str, digits: str) -> List[tuple]:
+        keys = [(tier, ''), (ANY, '')]
+        for length in self._prefix_lengths:
+            if length > len(digits):
+                break
+            keys.append((tier, digits[:length]))
+            keys.append((ANY, digits[:length]))
+        return keys
+
+    def match(self, tier: str, amount: float, recipient_phone: str = None, now: datetime = None) -> CampaignMatch:
+        """Combine every rule applying to a transfer
+
+        Overlapping campaigns do not compound: the highest multiplier wins,
+        while fixed bonus points add up.
+        """
+        if not self._buckets:
+            return NO_MATCH
+        now = now or datetime.utcnow()
+        multiplier, bonus, ids = 1.0, 0, []
+        for key in self._candidate_keys(tier, phone_digits(recipient_phone)):
+            for rule in self._buckets.get(key, ()):
+                if rule.starts_at > now:
+                    break
+                if now < rule.ends_at and rule.min_amount <= amount <= rule.max_amount:
+                    multiplier = max(multiplier, rule.multiplier)
+                    bonus += rule.bonus_points
+                    ids.append(rule.id)
+        return CampaignMatch(multiplier, bonus, tuple(ids)) if ids else NO_MATCH
+
+class CampaignEngine:
+    """Holds the current index and rebuilds it from the campaigns table when stale"""
+
+    def __init__(self, reload_seconds: float = 30.0):
+        self.reload_seconds = reload_seconds
+        self._index = CampaignIndex(())
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def _stale(self) -> bool:
+        loaded_at = self._loaded_at
+        return loaded_at is None or time.monotonic() - loaded_at > self.reload_seconds
+
+    def _load(self):
+        from models import Campaign
+
+        campaigns = Campaign.query.filter(Campaign.is_active.is_(True),
+                                          Campaign.ends_at > datetime.utcnow())\
+                                  .all()
+        self._index = CampaignIndex(campaigns)
+        self._loaded_at = time.monotonic()
+
+    def reload(self) -> CampaignIndex:
+        """Compile active, unfinished campaigns and swap them in"""
+        with self._lock:
+            self._load()
+            return self._index
+
+    def invalidate(self):
+        """Force a reload before the next match"""
+        self._loaded_at = None
+
+    def index(self) -> CampaignIndex:
+        """Get the current index, reloading it if older than reload_seconds"""
+        if self._stale():
+            with self._lock:
+                # Requests that queued behind another reload use its result
+                if self._stale():
+                    self._load()
+        return self._index
+
+    def match(self, tier: str, amount: float, recipient_phone: str = None, now: datetime = None) -> CampaignMatch:
+        """Match a transfer against the current rule set"""
+        return self.index().match(tier, amount, recipient_phone, now)
+
+campaign_engine = CampaignEngine(Config.CAMPAIGN_RELOAD_SECONDS)
@@ -0,0 +1,137 @@
+"""
+Command line batch jobs for Mukuru Loyalty Program
+
+Run with `flask --app app <command>`.
+"""
+import json
+
+import click
+
+def register_commands(app):
+    """Attach batch job commands to the Flask CLI"""
+    
+    @app.cli.command('retier')
+    @click.option('--chunk-size', default=10000, show_default=True, help='Users per id-range chunk')
+    @click.option('--dry-run', is_flag=True, help='Only report tier transitions')
+    @click.option('--restart', is_flag=True, help='Ignore any saved checkpoint')
+    def retier_command(chunk_size, dry_run, restart):
+        """Recompute stored tiers after a threshold change"""
+        from retier import retier_users
+        
+        click.echo(json.dumps(retier_users(chunk_size, dry_run, restart), indent=2))
+    
+    @app.cli.command('purge-idempotency-keys')
+    @click.option('--chunk-size', default=10000, show_default=True)
+    def purge_idempotency_keys_command(chunk_size):
+        """Delete idempotency records older than IDEMPOTENCY_KEY_TTL_HOURS"""
+        from idempotency import purge_expired_keys
+        
+        click.echo(f"Deleted {purge_expired_keys(chunk_size)} expired idempotency keys")
+    
+    @app.cli.command('import-users')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), help='Defaults to the file extension')
+    @click.option('--batch-size', default=5000, show_default=True, help='Rows per executemany')
+    @click.option('--transaction-size', default=50000, show_default=True, help='Records per commit')
+    @click.option('--reject-file', help='Defaults to PATH.rejects.ndjson')
+    @click.option('--restart', is_flag=True, help='Ignore any saved checkpoint')
+    def import_users_command(path, fmt, batch_size, transaction_size, reject_file, restart):
+        """Bulk import users from a CSV or NDJSON file"""
+        from importer import UserImporter
+        
+        importer = UserImporter(path, fmt, batch_size, transaction_size, reject_file)
+        click.echo(json.dumps(importer.run(restart), indent=2))
+    
+    @app.cli.command('archive-transactions')
+    @click.option('--before', type=click.DateTime(formats=['%Y-%m']),
+                  help='Archive months before this one (default: TRANSACTION_ARCHIVE_AFTER_MONTHS ago)')
+    @click.option('--chunk-size', default=5000, show_default=True)
+    @click.option('--dry-run', is_flag=True, help='Only count rows that would move')
+    def archive_transactions_command(before, chunk_size, dry_run):
+        """Move transactions from closed months into the archive table"""
+        from archive import archive_transactions
+        
+        click.echo(json.dumps(archive_transactions(before, chunk_size, dry_run), indent=2))
+    
+    @app.cli.command('refresh-rollups')
+    @click.option('--chunk-size', default=50000, show_default=True, help='Source ids per committed chunk')
+    def refresh_rollups_command(chunk_size):
+        """Fold new transactions and redemptions into the daily rollups"""
+        from rollups import refresh_rollups
+        
+        click.echo(json.dumps(refresh_rollups(chunk_size), indent=2))
+    
+    @app.cli.command('reprocess-rollups')
+    @click.option('--start', type=click.DateTime(formats=['%Y-%m-%d']), required=True)
+    @click.option('--end', type=click.DateTime(formats=['%Y-%m-%d']), required=True)
+    def reprocess_rollups_command(start, end):
+        """Rebuild daily rollups for a date range from source data"""
+        from rollups import reprocess_days
+        
+        click.echo(json.dumps(reprocess_days(start.date(), end.date()), indent=2))
+    
+    @app.cli.command('expire-points')
+    @click.option('--chunk-size', default=10000, show_default=True, help='Lots per committed chunk')
+    def expire_points_command(chunk_size):
+        """Expire points lots older than POINTS_EXPIRY_MONTHS"""
+        from expiry import expire_points
+        
+        click.echo(json.dumps(expire_points(chunk_size=chunk_size), indent=2))
+    
+    @app.cli.command('publish-fx-rates')
+    @click.argument('rates', nargs=-1, required=True)
+    def publish_fx_rates_command(rates):
+        """Publish a new FX rate version, e.g. USD=18.25 GBP=23.10 (rands per unit)"""
+        from fx import fx_rates
+        
+        parsed = {}
+        for pair in rates:
+            currency, _, rate = pair.partition('=')
+            try:
+                parsed[currency.strip().upper()] = float(rate)
+            except ValueError:
+                raise click.BadParameter(f"expected CURRENCY=RATE, got {pair!r}")
+        click.echo(f"Published FX rate version {fx_rates.publish(parsed)}")
+    
+    @app.cli.command('rebuild-recipient-index')
+    @click.option('--chunk-size', default=1000, show_default=True, help='Users per committed chunk')
+    def rebuild_recipient_index_command(chunk_size):
+        """Rebuild frequent-recipient autocomplete data from transfer history"""
+        from recipients import rebuild_recipient_index
+        
+        click.echo(json.dumps(rebuild_recipient_index(chunk_size), indent=2))
+    
+    @app.cli.command('rebuild-activity')
+    @click.option('--chunk-size', default=1000, show_default=True, help='Users per committed chunk')
+    def rebuild_activity_command(chunk_size):
+        """Rebuild per-user daily activity (chart data) from transaction history"""
+        from timeseries import rebuild_activity
+        
+        click.echo(json.dumps(rebuild_activity(chunk_size), indent=2))
+    
+    @app.cli.command('set-admin')
+    @click.argument('email')
+    @click.option('--revoke', is_flag=True, help='Remove admin access instead of granting it')
+    def set_admin_command(email, revoke):
+        """Grant or remove access to the program-wide analytics endpoints"""
+        from auth import identity_cache
+        from models import db, User
+        
+        user = User.query.filter_by(email=email).first()
+        if user is None:
+            raise click.BadParameter(f"no user with email {email!r}")
+        user.is_admin = not revoke
+        db.session.commit()
+        identity_cache.invalidate(user.id)
+        click.echo(f"{user.email} is {'an admin' if user.is_admin else 'not an admin'}")
+    
+    @app.cli.command('merge-profiles')
+    @click.option('--route', help='Endpoint name, e.g. send_money (default: all)')
+    @click.option('--format', 'fmt', type=click.Choice(['folded', 'pstats']), default='folded', show_default=True)
+    @click.option('--output', required=True, type=click.Path(dir_okay=False),
+                  help='Merged file; feed .folded output to flamegraph.pl or speedscope')
+    def merge_profiles_command(route, fmt, output):
+        """Merge sampled request profiles into one flame-graph input"""
+        from profiler import merge_profiles, profile_files
+        
+        click.echo(json.dumps(merge_profiles(profile_files(route, '.' + fmt), output, fmt), indent=2))
@@ -13,10 +13,22 @@ class Config:
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-string'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
+    IDENTITY_CACHE_TTL = int(os.environ.get('IDENTITY_CACHE_TTL') or 30)  # seconds; revocations reach every worker within this
+    IDENTITY_CACHE_MAX_ENTRIES = int(os.environ.get('IDENTITY_CACHE_MAX_ENTRIES') or 100000)
+
+    # Password hashing (passwords.py); stored hashes with another method or cost are re-hashed after login
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'pbkdf2:sha256:600000'
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS') or os.cpu_count() or 2)
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING') or 32)  # queued beyond the workers
+    PASSWORD_HASH_WAIT_SECONDS = float(os.environ.get('PASSWORD_HASH_WAIT_SECONDS') or 1)  # then 503
     
     # Loyalty Program Settings
     POINTS_PER_RAND = 1  # 1 point per R100
     POINTS_THRESHOLD = 100
+    POINTS_EXPIRY_MONTHS = int(os.environ.get('POINTS_EXPIRY_MONTHS') or 24)
+    BASE_CURRENCY = 'ZAR'  # balances, points and tiers are accounted in rands
+    FX_RELOAD_SECONDS = int(os.environ.get('FX_RELOAD_SECONDS') or 60)  # picks up rates published elsewhere
+    CAMPAIGN_RELOAD_SECONDS = int(os.environ.get('CAMPAIGN_RELOAD_SECONDS') or 30)  # picks up rule edits from other workers
     
     # Tier Thresholds
     SILVER_THRESHOLD = 20000
@@ -24,7 +36,88 @@ class Config:
     
     # Redis Configuration (for caching and background tasks)
     REDIS_URL = os.environ.get('REDIS_URL') or 'redis://localhost:6379/0'
-    
+
+    # Per-user response cache (profile/dashboard)
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES') or 10000)
+    RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL') or 30)  # seconds
+    USER_VERSIONS_MAX_ENTRIES = int(os.environ.get('USER_VERSIONS_MAX_ENTRIES') or 100000)
+    REWARDS_CACHE_MAX_AGE = int(os.environ.get('REWARDS_CACHE_MAX_AGE') or 60)  # seconds
+    REWARD_PRICE_BANDS = [0, 500, 1000, 2500, 5000]  # points; facet band lower bounds
+
+    # Live update events (SSE)
+    SSE_HEARTBEAT_SECONDS = int(os.environ.get('SSE_HEARTBEAT_SECONDS') or 15)
+    SSE_RETRY_MS = 5000
+    SSE_MAX_PENDING_EVENTS = 16
+    EVENTS_REDIS_ENABLED = os.environ.get('EVENTS_REDIS_ENABLED', 'false').lower() in ['true', 'on', '1']
+    EVENTS_REDIS_CHANNEL = os.environ.get('EVENTS_REDIS_CHANNEL') or 'mukuru:user-events'
+    EVENTS_REDIS_RETRY_SECONDS = 0.5  # first resubscribe delay, doubled per failure
+    EVENTS_REDIS_MAX_RETRY_SECONDS = 30
+
+    # Rate limiting: (burst, requests per minute) token buckets
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() in ['true', 'on', '1']
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND') or 'local'  # 'local' or 'redis'
+    # Reverse proxies in front of the app whose X-Forwarded-For/-Proto are trusted (1 behind nginx);
+    # per-IP limits need it, or every client shares the proxy's address
+    PROXY_FIX_HOPS = int(os.environ.get('PROXY_FIX_HOPS') or 0)
+    RATE_LIMITS = {
+        'send_money': {
+            'per_ip': (30, 120),
+            'per_user': {'Bronze': (5, 10), 'Silver': (10, 20), 'Gold': (20, 40)}
+        },
+        'redeem_reward': {
+            'per_ip': (30, 120),
+            'per_user': {'Bronze': (5, 10), 'Silver': (5, 10), 'Gold': (10, 20)}
+        }
+    }
+
+    # Idempotency keys for money-moving endpoints
+    IDEMPOTENCY_KEY_TTL_HOURS = 24
+    IDEMPOTENCY_CACHE_MAX_ENTRIES = 10000
+    IDEMPOTENCY_LOCK_TIMEOUT = 30  # seconds before a pending key is considered abandoned
+    IDEMPOTENCY_WAIT_SECONDS = 10  # how long a duplicate waits for the first request
+
+    # Transactions older than this many whole months are moved to the archive table
+    TRANSACTION_ARCHIVE_AFTER_MONTHS = int(os.environ.get('TRANSACTION_ARCHIVE_AFTER_MONTHS') or 12)
+
+    # Analytics rollups skip rows newer than this so concurrent inserts can commit first
+    ROLLUP_SETTLE_SECONDS = 60
+
+    # Per-user activity charts (GET /api/user/activity); 'auto' picks the finest bucket within the limit
+    ACTIVITY_MAX_BUCKETS = 400
+
+    # Velocity limits on send_money (sliding windows, amounts in rands)
+    VELOCITY_ENABLED = os.environ.get('VELOCITY_ENABLED', 'true').lower() in ['true', 'on', '1']
+    VELOCITY_BACKEND = os.environ.get('VELOCITY_BACKEND') or 'local'  # 'local' or 'redis'
+    VELOCITY_BUCKETS = 60  # buckets per window
+    VELOCITY_MAX_WINDOWS = 100000  # local store drops its least recently used windows beyond this many
+    VELOCITY_LIMITS = {
+        'per_user': [
+            {'window': 3600, 'max_count': 20, 'max_amount': 50000},
+            {'window': 86400, 'max_count': 50, 'max_amount': 150000}
+        ],
+        'per_recipient': [
+            {'window': 86400, 'max_count': 10, 'max_amount': 50000}
+        ]
+    }
+
+    # Batched reads (POST /api/batch); Flask endpoint names that may be batched
+    BATCH_MAX_REQUESTS = 10
+    BATCH_ENDPOINTS = ['get_user_profile', 'get_transactions', 'get_rewards', 'search_rewards',
+                       'get_leaderboard', 'suggest_recipients', 'user_activity']
+
+    # ASGI read tier (asgi.py); defaults to DATABASE_URL on the matching async driver
+    ASYNC_DATABASE_URL = os.environ.get('ASYNC_DATABASE_URL')
+
+    # Opt-in request profiling; no hooks are installed unless enabled
+    PROFILE_ENABLED = os.environ.get('PROFILE_ENABLED', 'false').lower() in ['true', 'on', '1']
+    PROFILE_MODE = os.environ.get('PROFILE_MODE') or 'sampler'  # 'sampler' (collapsed stacks) or 'cprofile' (pstats)
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE') or 0.01)  # fraction of requests
+    PROFILE_ROUTES = [r for r in (os.environ.get('PROFILE_ROUTES') or '').split(',') if r]  # endpoints always profiled
+    PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN')  # X-Profile-Token value that forces profiling
+    PROFILE_DIR = os.environ.get('PROFILE_DIR') or 'profiles'
+    PROFILE_MAX_FILES = int(os.environ.get('PROFILE_MAX_FILES') or 200)  # per route, oldest removed first
+    PROFILE_SAMPLE_INTERVAL_MS = 5
+
     # Email Configuration
     MAIL_SERVER = os.environ.get('MAIL_SERVER')
     MAIL_PORT = int(os.environ.get('MAIL_PORT') or 587)
@@ -0,0 +1,232 @@
+"""
+Live user update events for Mukuru Loyalty Program
+
+Write paths publish a small delta event per user; the SSE endpoint streams them
+to connected dashboards so the frontend no longer has to poll the profile.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Dict, Iterator, Optional, Set
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class Subscription:
+    """A single connected client waiting for events for one user"""
+
+    __slots__ = ('user_id', '_events', '_ready')
+
+    def __init__(self, user_id: int, max_pending: int):
+        self.user_id = user_id
+        # Events are snapshots, so a slow client only needs the newest few
+        self._events = deque(maxlen=max_pending)
+        self._ready = threading.Event()
+
+    def put(self, event: Dict):
+        self._events.append(event)
+        self._ready.set()
+
+    def get(self, timeout: float) -> Optional[Dict]:
+        """Wait up to `timeout` seconds for the next event"""
+        if not self._events:
+            self._ready.wait(timeout)
+        self._ready.clear()
+        try:
+            return self._events.popleft()
+        except IndexError:
+            return None
+
+class AsyncSubscription(Subscription):
+    """A subscription awaited from an asyncio event loop
+
+    Events may be published from worker threads or the Redis bridge thread,
+    so the loop is woken through call_soon_threadsafe.
+    """
+
+    __slots__ = ('_loop', '_async_ready')
+
+    def __init__(self, user_id: int, max_pending: int):
+        super().__init__(user_id, max_pending)
+        self._loop = asyncio.get_running_loop()
+        self._async_ready = asyncio.Event()
+
+    def put(self, event: Dict):
+        self._events.append(event)
+        try:
+            self._loop.call_soon_threadsafe(self._async_ready.set)
+        except RuntimeError:
+            pass  # loop already closed; the client is gone
+
+    async def aget(self, timeout: float) -> Optional[Dict]:
+        """Wait up to `timeout` seconds for the next event without blocking the loop"""
+        if not self._events:
+            try:
+                await asyncio.wait_for(self._async_ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        self._async_ready.clear()
+        try:
+            return self._events.popleft()
+        except IndexError:
+            return None
+
+class EventBroker:
+    """In-process pub/sub fanning out per-user events to subscriptions"""
+
+    def __init__(self, max_pending: int = 16):
+        self.max_pending = max_pending
+        self.bridge = None
+        self._subscriptions: Dict[int, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id: int, subscription_class: type = Subscription) -> Subscription:
+        """Register a new subscription for a user's events"""
+        subscription = subscription_class(user_id, self.max_pending)
+        with self._lock:
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Remove a subscription once its client disconnects"""
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def publish(self, user_id: int, event: Dict):
+        """Publish an event, through the shared channel when one is configured"""
+        if self.bridge is not None:
+            try:
+                self.bridge.publish(user_id, event)
+                return
+            except Exception:
+                logger.exception("Event bridge publish failed, delivering locally")
+        self.deliver(user_id, event)
+
+    def deliver(self, user_id: int, event: Dict):
+        """Fan an event out to this process's subscriptions"""
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            subscription.put(event)
+
+    def subscriber_count(self) -> int:
+        """Get the number of connected subscriptions"""
+        with self._lock:
+            return sum(len(subs) for subs in self._subscriptions.values())
+
+class RedisEventBridge:
+    """Relays events between worker processes over a Redis pub/sub channel
+
+    Every process (including the publisher) receives events from the channel
+    and delivers them to its own subscriptions. If the connection drops, the
+    listener logs it and resubscribes with backoff; events published while it
+    is disconnected do not reach this process's clients.
+    """
+
+    def __init__(self, broker: EventBroker, url: str, channel: str):
+        import redis
+
+        self.broker = broker
+        self.channel = channel
+        self._redis = redis.Redis.from_url(url)
+        self._pubsub = self._subscribe()
+        self._thread = threading.Thread(target=self._listen, name='event-bridge', daemon=True)
+        self._thread.start()
+
+    def publish(self, user_id: int, event: Dict):
+        self._redis.publish(self.channel, json.dumps({'user_id': user_id, 'event': event}))
+
+    def _subscribe(self):
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self.channel)
+        return pubsub
+
+    def _listen(self):
+        delay = 0.0
+        while True:
+            try:
+                if self._pubsub is None:
+                    self._pubsub = self._subscribe()
+                    logger.info("Event bridge resubscribed to %s", self.channel)
+                for message in self._pubsub.listen():
+                    delay = 0.0
+                    self._deliver(message)
+            except Exception:
+                logger.exception("Event bridge lost its Redis subscription, retrying")
+            self._close()
+            delay = min(max(delay * 2, Config.EVENTS_REDIS_RETRY_SECONDS), Config.EVENTS_REDIS_MAX_RETRY_SECONDS)
+            time.sleep(delay)
+
+    def _deliver(self, message: Dict):
+        try:
+            payload = json.loads(message['data'])
+            self.broker.deliver(payload['user_id'], payload['event'])
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Dropping malformed event bridge message")
+
+    def _close(self):
+        pubsub, self._pubsub = self._pubsub, None
+        if pubsub is not None:
+            try:
+                pubsub.close()
+            except Exception:
+                pass
+
+def user_delta_event(user, transaction=None) -> Dict:
+    """Build the delta event sent to a user's dashboards after a write"""
+    return {
+        'balance': user.balance,
+        'points': user.points,
+        'tier': user.tier,
+        'transaction': transaction.to_dict() if transaction is not None else None
+    }
+
+def format_sse(data: Dict, event: str = 'user.updated') -> str:
+    """Encode an event in text/event-stream format"""
+    return 'event: %s\ndata: %s\n\n' % (event, json.dumps(data, separators=(',', ':')))
+
+def stream_user_events(user_id: int, heartbeat: float = None) -> Iterator[str]:
+    """Yield SSE frames for a user until the client disconnects"""
+    heartbeat = heartbeat or Config.SSE_HEARTBEAT_SECONDS
+    subscription = event_broker.subscribe(user_id)
+    try:
+        yield 'retry: %d\n\n' % (Config.SSE_RETRY_MS,)
+        while True:
+            event = subscription.get(heartbeat)
+            if event is None:
+                # Comment frame keeps proxies from closing idle connections
+                yield ': keep-alive\n\n'
+            else:
+                yield format_sse(event)
+    finally:
+        event_broker.unsubscribe(subscription)
+
+async def astream_user_events(user_id: int, heartbeat: float = None) -> AsyncIterator[str]:
+    """Async variant of stream_user_events for the ASGI tier"""
+    heartbeat = heartbeat or Config.SSE_HEARTBEAT_SECONDS
+    subscription = event_broker.subscribe(user_id, AsyncSubscription)
+    try:
+        yield 'retry: %d\n\n' % (Config.SSE_RETRY_MS,)
+        while True:
+            event = await subscription.aget(heartbeat)
+            if event is None:
+                yield ': keep-alive\n\n'
+            else:
+                yield format_sse(event)
+    finally:
+        event_broker.unsubscribe(subscription)
+
+event_broker = EventBroker(Config.SSE_MAX_PENDING_EVENTS)
+
+def init_event_bridge():
+    """Attach the Redis channel when multi-worker event fan-out is enabled"""
+    if Config.EVENTS_REDIS_ENABLED and event_broker.bridge is None:
+        event_broker.bridge = RedisEventBridge(event_broker, Config.REDIS_URL, Config.EVENTS_REDIS_CHANNEL)
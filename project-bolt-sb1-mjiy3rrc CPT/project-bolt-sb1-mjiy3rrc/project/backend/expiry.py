@@ -0,0 +1,122 @@
+"""
+Points expiry for Mukuru Loyalty Program
+
+Earned points are tracked as lots (see PointsLot) that redemptions spend
+oldest first. The nightly job walks lots past their expiry date through the
+expires_at index in id-ordered chunks; each chunk zeroes the lots, debits the
+owners and writes one 'expiry' transaction per user (and its daily activity)
+with set-based statements in a single commit.
+
+Locks are taken in the same order as redemptions take them (the user row,
+then that user's lots), so a sweep never deadlocks with a redemption; users
+locked by an in-flight write are skipped and picked up by the next run.
+"""
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict
+
+from models import db, User, Transaction, PointsLot
+from cache import user_versions
+from timeseries import add_daily_activity
+
+def _expire_chunk(now: datetime, after_id: int, chunk_size: int):
+    """Expire up to `chunk_size` due lots with ids above `after_id`
+
+    Returns (last lot id scanned, or None when no due lots remain; lots expired; points by user).
+    """
+    candidates = db.session.query(PointsLot.id, PointsLot.user_id)\
+                           .filter(PointsLot.expires_at <= now,
+                                   PointsLot.points_remaining > 0,
+                                   PointsLot.id > after_id)\
+                           .order_by(PointsLot.id)\
+                           .limit(chunk_size)\
+                           .all()
+    if not candidates:
+        return None, 0, {}
+
+    owners = db.session.scalars(db.select(User.id)
+                                  .where(User.id.in_({user_id for _, user_id in candidates}))
+                                  .order_by(User.id)
+                                  .with_for_update(skip_locked=True)).all()
+    due = db.session.query(PointsLot.id, PointsLot.user_id, PointsLot.points_remaining)\
+                    .filter(PointsLot.id.in_([lot_id for lot_id, _ in candidates]),
+                            PointsLot.user_id.in_(owners),
+                            PointsLot.points_remaining > 0)\
+                    .order_by(PointsLot.id)\
+                    .with_for_update()\
+                    .all()
+    if not due:
+        db.session.rollback()
+        return candidates[-1][0], 0, {}
+
+    expired = defaultdict(int)
+    for _, user_id, remaining in due:
+        expired[user_id] += remaining
+
+    lots = PointsLot.__table__
+    db.session.execute(
+        db.update(lots)
+          .where(lots.c.id.in_([lot_id for lot_id, _, _ in due]))
+          .values(points_expired=lots.c.points_expired + lots.c.points_remaining, points_remaining=0)
+    )
+
+    users = User.__table__
+    debit = db.bindparam('debit')
+    db.session.execute(
+        db.update(users)
+          .where(users.c.id == db.bindparam('user_id'))
+          .values(points=db.case((users.c.points > debit, users.c.points - debit), else_=0),
+                  updated_at=now),
+        [{'user_id': user_id, 'debit': points} for user_id, points in expired.items()]
+    )
+
+    db.session.execute(db.insert(Transaction), [{
+        'user_id': user_id,
+        'transaction_type': 'expiry',
+        'amount': 0,
+        'points_earned': -points,
+        'reference': f"EXP{uuid.uuid4().hex[:12].upper()}",
+        'status': 'completed',
+        'description': f"{points} points expired",
+        'created_at': now,
+        'completed_at': now
+    } for user_id, points in expired.items()])
+    add_daily_activity(now.date(), {user_id: {'points_expired': points} for user_id, points in expired.items()})
+
+    db.session.commit()
+    return candidates[-1][0], len(due), expired
+
+def expire_points(now: datetime = None, chunk_size: int = 10000) -> Dict:
+    """Expire every lot whose expires_at has passed, one committed chunk at a time
+
+    Each chunk commits on its own and only touches lots that still hold
+    points, so an interrupted run is finished by running it again.
+    """
+    now = now or datetime.utcnow()
+    started = time.perf_counter()
+    last_id, lots, points, chunks = 0, 0, 0, 0
+    users = set()
+
+    while True:
+        last_id, count, expired = _expire_chunk(now, last_id, chunk_size)
+        if last_id is None:
+            break
+        for user_id in expired:
+            user_versions.bump(user_id)
+        lots += count
+        points += sum(expired.values())
+        users.update(expired)
+        chunks += 1
+
+    elapsed = time.perf_counter() - started
+    return {
+        'as_of': now.isoformat(),
+        'lots_expired': lots,
+        'points_expired': points,
+        'users_affected': len(users),
+        'chunks': chunks,
+        'elapsed_seconds': round(elapsed, 3),
+        'lots_per_second': round(lots / elapsed) if elapsed else None
+    }
@@ -0,0 +1,87 @@
+"""
+FX rate snapshots for Mukuru Loyalty Program
+
+Rates are published to the fx_rates table as immutable numbered versions.
+Each worker holds the latest version as a frozen in-memory snapshot, so
+converting a send amount never touches the database; a reload builds a new
+snapshot and swaps the reference, and transactions record the version they
+were converted with.
+"""
+import threading
+import time
+from types import MappingProxyType
+from typing import Dict, Optional, Tuple
+
+from config import Config
+
+class RateSnapshot:
+    """Immutable set of rates to the base currency"""
+
+    def __init__(self, version: int, rates: Dict[str, float]):
+        rates = {currency.upper(): rate for currency, rate in rates.items()}
+        rates[Config.BASE_CURRENCY] = 1.0
+        self.version = version
+        self.rates = MappingProxyType(rates)
+
+    def convert(self, amount: float, currency: str) -> Optional[Tuple[float, float]]:
+        """Convert to the base currency; returns (base amount, rate) or None if unsupported"""
+        rate = self.rates.get((currency or Config.BASE_CURRENCY).upper())
+        if rate is None:
+            return None
+        return round(amount * rate, 2), rate
+
+class FxRates:
+    """Holds the current snapshot and reloads it from fx_rates when stale"""
+
+    def __init__(self, reload_seconds: float = 60.0):
+        self.reload_seconds = reload_seconds
+        self._snapshot = RateSnapshot(0, {})
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def _stale(self) -> bool:
+        loaded_at = self._loaded_at
+        return loaded_at is None or time.monotonic() - loaded_at > self.reload_seconds
+
+    def _load(self):
+        from models import db, FxRate
+
+        version = db.session.query(db.func.max(FxRate.version)).scalar() or 0
+        rows = FxRate.query.filter_by(version=version).all() if version else []
+        self._snapshot = RateSnapshot(version, {row.currency: row.rate for row in rows})
+        self._loaded_at = time.monotonic()
+
+    def reload(self) -> RateSnapshot:
+        """Load the newest published version and swap it in"""
+        with self._lock:
+            self._load()
+            return self._snapshot
+
+    def invalidate(self):
+        """Force a reload before the next conversion"""
+        self._loaded_at = None
+
+    def snapshot(self) -> RateSnapshot:
+        """Get the current snapshot, reloading it if older than reload_seconds"""
+        if self._stale():
+            with self._lock:
+                # Requests that queued behind another reload use its result
+                if self._stale():
+                    self._load()
+        return self._snapshot
+
+    def publish(self, rates: Dict[str, float]) -> int:
+        """Store `rates` as a new version and make it current in this worker"""
+        from models import db, FxRate
+
+        if any(rate <= 0 for rate in rates.values()):
+            raise ValueError("FX rates must be positive")
+        version = (db.session.query(db.func.max(FxRate.version)).scalar() or 0) + 1
+        db.session.add_all(FxRate(version=version, currency=currency.upper(), rate=rate)
+                           for currency, rate in rates.items())
+        # The unique (version, currency) constraint rejects a concurrent publish of the same version
+        db.session.commit()
+        self.reload()
+        return version
+
+fx_rates = FxRates(Config.FX_RELOAD_SECONDS)
@@ -0,0 +1,268 @@
+"""
+Idempotency-Key support for Mukuru Loyalty Program
+
+Retried money-moving requests carrying the same Idempotency-Key get the stored
+response of the first attempt instead of re-running the business logic.
+Outcomes live in the indexed idempotency_keys table, fronted by an in-memory
+LRU; concurrent duplicates wait for the first request to finish. A claim is
+marked applied in the same transaction as the money movement, so a stale
+claim is only ever reclaimed if nothing was committed under it.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import wraps
+from typing import Optional, Tuple
+
+from flask import current_app, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+
+from auth import current_user_id
+from config import Config
+from models import db, IdempotencyRecord
+
+# Only outcomes that a retry would legitimately repeat are stored; rate limits,
+# conflicts and server errors leave the key free for another attempt
+_RETRYABLE_STATUS = {409, 429}
+
+class IdempotencyCache:
+    """LRU of completed outcomes plus in-process in-flight tracking"""
+
+    def __init__(self, max_entries: int = 10000, ttl_hours: float = 24):
+        self.max_entries = max_entries
+        self.ttl_hours = ttl_hours
+        self._entries: 'OrderedDict[tuple, tuple]' = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def get(self, cache_key: tuple) -> Optional[tuple]:
+        """Get (request_hash, status_code, body, created_at) for a completed request whose key has not expired"""
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                return None
+            if entry[3] < datetime.utcnow() - timedelta(hours=self.ttl_hours):
+                del self._entries[cache_key]
+                return None
+            self._entries.move_to_end(cache_key)
+            return entry
+
+    def put(self, cache_key: tuple, outcome: tuple):
+        with self._lock:
+            self._entries[cache_key] = outcome
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def begin(self, cache_key: tuple) -> Tuple[bool, threading.Event]:
+        """Mark a key in flight; returns (owner, event to wait on if not owner)"""
+        with self._lock:
+            event = self._inflight.get(cache_key)
+            if event is not None:
+                return False, event
+            event = self._inflight[cache_key] = threading.Event()
+            return True, event
+
+    def finish(self, cache_key: tuple):
+        with self._lock:
+            event = self._inflight.pop(cache_key, None)
+        if event is not None:
+            event.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+idempotency_cache = IdempotencyCache(Config.IDEMPOTENCY_CACHE_MAX_ENTRIES, Config.IDEMPOTENCY_KEY_TTL_HOURS)
+
+def _replay(outcome: tuple, request_hash: str):
+    stored_hash, status_code, body, _ = outcome
+    if stored_hash != request_hash:
+        return jsonify({'error': 'Idempotency-Key was already used with a different request'}), 422
+    response = current_app.response_class(body, status=status_code, mimetype='application/json')
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+def _load_completed(user_id: int, route: str, key: str) -> Optional[IdempotencyRecord]:
+    cutoff = datetime.utcnow() - timedelta(hours=Config.IDEMPOTENCY_KEY_TTL_HOURS)
+    return IdempotencyRecord.query.filter(IdempotencyRecord.user_id == user_id,
+                                          IdempotencyRecord.route == route,
+                                          IdempotencyRecord.key == key,
+                                          IdempotencyRecord.created_at >= cutoff)\
+                                  .first()
+
+def _stale(record: IdempotencyRecord) -> bool:
+    return record.created_at < datetime.utcnow() - timedelta(seconds=Config.IDEMPOTENCY_LOCK_TIMEOUT)
+
+def _claim(user_id: int, route: str, key: str, request_hash: str) -> Tuple[bool, Optional[IdempotencyRecord]]:
+    """Insert a pending record; returns (claimed, our record or the one already holding the key)"""
+    record = IdempotencyRecord(user_id=user_id, route=route, key=key, request_hash=request_hash)
+    db.session.add(record)
+    try:
+        db.session.commit()
+        return True, record
+    except IntegrityError:
+        db.session.rollback()
+
+    existing = IdempotencyRecord.query.filter_by(user_id=user_id, route=route, key=key).first()
+    if existing is None:
+        # The holder gave the key up between our insert and this read
+        return _claim(user_id, route, key, request_hash)
+    expired_before = datetime.utcnow() - timedelta(hours=Config.IDEMPOTENCY_KEY_TTL_HOURS)
+    if existing.created_at < expired_before:
+        reclaim = IdempotencyRecord.query.filter_by(id=existing.id)
+    elif existing.status == 'pending' and _stale(existing):
+        # Nothing was committed under this claim (see _execute), and deleting it
+        # makes a holder that is merely slow fail its commit instead of applying late
+        reclaim = IdempotencyRecord.query.filter_by(id=existing.id, status='pending')
+    else:
+        return False, existing
+    reclaim.delete(synchronize_session=False)
+    db.session.commit()
+    db.session.expunge(existing)  # its identity is about to be taken by our new record
+    return _claim(user_id, route, key, request_hash)
+
+def _wait_for_other_worker(user_id: int, route: str, key: str) -> Optional[IdempotencyRecord]:
+    deadline = time.monotonic() + Config.IDEMPOTENCY_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        db.session.expire_all()
+        record = IdempotencyRecord.query.filter_by(user_id=user_id, route=route, key=key).first()
+        if record is None or record.status == 'completed':
+            return record
+    return None
+
+def _in_progress():
+    return jsonify({'error': 'A request with this Idempotency-Key is in progress'}), 409
+
+def idempotent(route: str):
+    """Serve retries of a request carrying an Idempotency-Key from its stored outcome"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get('Idempotency-Key')
+            user_id = current_user_id()
+            if not key or user_id is None:
+                return view(*args, **kwargs)
+            if len(key) > 100:
+                return jsonify({'error': 'Idempotency-Key must be at most 100 characters'}), 400
+
+            cache_key = (user_id, route, key)
+            request_hash = hashlib.sha256(request.get_data()).hexdigest()
+
+            outcome = idempotency_cache.get(cache_key)
+            if outcome is not None:
+                return _replay(outcome, request_hash)
+
+            owner, finished = idempotency_cache.begin(cache_key)
+            if not owner:
+                # Same key in flight in this worker: wait for it rather than racing
+                finished.wait(Config.IDEMPOTENCY_WAIT_SECONDS)
+                outcome = idempotency_cache.get(cache_key)
+                if outcome is not None:
+                    return _replay(outcome, request_hash)
+                return _in_progress()
+
+            try:
+                record = _load_completed(user_id, route, key)
+                if record is None or record.status != 'completed':
+                    claimed, record = _claim(user_id, route, key, request_hash)
+                    if claimed:
+                        return _execute(view, args, kwargs, record, cache_key, request_hash)
+                    if record.status == 'applied' and _stale(record):
+                        # The holder died between committing and storing its response
+                        return jsonify({'error': 'A request with this Idempotency-Key was applied, '
+                                                 'but its response was not recorded'}), 409
+                    if record.status != 'completed':
+                        # Pending, or applied with its response still being stored
+                        record = _wait_for_other_worker(user_id, route, key)
+                        if record is None:
+                            return _in_progress()
+
+                outcome = (record.request_hash, record.status_code, record.response_body, record.created_at)
+                idempotency_cache.put(cache_key, outcome)
+                return _replay(outcome, request_hash)
+            finally:
+                idempotency_cache.finish(cache_key)
+        return wrapper
+    return decorator
+
+class _ApplyClaim:
+    """Flips the claim to 'applied' inside the first transaction the view commits
+
+    The money movement and the marker commit together, so a claim that is
+    still 'pending' has moved nothing and may be reclaimed. If the claim was
+    reclaimed meanwhile, the view's commit fails instead of applying twice.
+    """
+
+    def __init__(self, record_id: int):
+        self.record_id = record_id
+        self.applied = False
+        self.lost = False
+
+    def __call__(self, session):
+        if self.applied:
+            return
+        result = session.execute(db.update(IdempotencyRecord)
+                                   .where(IdempotencyRecord.id == self.record_id,
+                                          IdempotencyRecord.status == 'pending')
+                                   .values(status='applied'))
+        if result.rowcount != 1:
+            self.lost = True
+            raise RuntimeError('Idempotency-Key claim was reclaimed before commit')
+        self.applied = True
+
+def _execute(view, args, kwargs, record: IdempotencyRecord, cache_key: tuple, request_hash: str):
+    record_id, created_at = record.id, record.created_at
+    claimed = IdempotencyRecord.query.filter_by(id=record_id)
+    session = db.session()
+    apply_claim = _ApplyClaim(record_id)
+    event.listen(session, 'before_commit', apply_claim)
+    try:
+        response = current_app.make_response(view(*args, **kwargs))
+    except Exception:
+        db.session.rollback()
+        if apply_claim.lost:
+            return _in_progress()
+        if not apply_claim.applied:
+            claimed.delete()
+            db.session.commit()
+        raise
+    finally:
+        event.remove(session, 'before_commit', apply_claim)
+
+    if apply_claim.lost:
+        return _in_progress()
+    if not apply_claim.applied and (response.status_code >= 500 or response.status_code in _RETRYABLE_STATUS):
+        claimed.delete()
+        db.session.commit()
+        return response
+
+    # Once applied, even an error response is stored: a retry must not run the view again
+    body = response.get_data(as_text=True)
+    claimed.update({'status': 'completed',
+                    'status_code': response.status_code,
+                    'response_body': body,
+                    'completed_at': datetime.utcnow()})
+    db.session.commit()
+    idempotency_cache.put(cache_key, (request_hash, response.status_code, body, created_at))
+    return response
+
+def purge_expired_keys(chunk_size: int = 10000) -> int:
+    """Delete stored outcomes older than the key TTL, in chunks"""
+    cutoff = datetime.utcnow() - timedelta(hours=Config.IDEMPOTENCY_KEY_TTL_HOURS)
+    deleted = 0
+    while True:
+        ids = db.session.query(IdempotencyRecord.id)\
+                        .filter(IdempotencyRecord.created_at < cutoff)\
+                        .limit(chunk_size)\
+                        .subquery()
+        count = IdempotencyRecord.query.filter(IdempotencyRecord.id.in_(db.select(ids.c.id)))\
+                                       .delete(synchronize_session=False)
+        db.session.commit()
+        deleted += count
+        if count < chunk_size:
+            return deleted
@@ -0,0 +1,182 @@
+"""
+Streaming bulk user onboarding for Mukuru Loyalty Program
+
+Reads partner customer files (CSV or NDJSON) record by record, validates them,
+dedupes against users.email with batched lookups and inserts with executemany.
+Progress is checkpointed with each commit so an interrupted import resumes
+where it stopped; memory use is bounded by the transaction size.
+"""
+import csv
+import hashlib
+import json
+import os
+import re
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from models import db, User, JobCheckpoint
+
+EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+PHONE_RE = re.compile(r'^\+?\d{9,15}$')
+
+# Stay under SQLite's bound-parameter limit for the IN (...) lookups
+LOOKUP_CHUNK = 900
+
+def iter_records(path: str, fmt: str = None) -> Iterator[Dict]:
+    """Stream raw records from a CSV or NDJSON file"""
+    fmt = fmt or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+    with open(path, newline='', encoding='utf-8') as handle:
+        if fmt == 'csv':
+            yield from csv.DictReader(handle)
+        else:
+            for line in handle:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = {'_raw': line}
+                yield record if isinstance(record, dict) else {'_raw': line}
+
+def validate_record(record: Dict) -> Tuple[Optional[Dict], Optional[str]]:
+    """Normalise a raw record into a users row, or return the rejection reason"""
+    if '_raw' in record:
+        return None, 'malformed record'
+
+    name = (record.get('name') or '').strip()
+    email = (record.get('email') or '').strip().lower()
+    phone = re.sub(r'[\s\-()]', '', record.get('phone') or '')
+
+    if not name:
+        return None, 'missing name'
+    if len(name) > 100:
+        return None, 'name too long'
+    if not EMAIL_RE.match(email) or len(email) > 120:
+        return None, 'invalid email'
+    if phone and not PHONE_RE.match(phone):
+        return None, 'invalid phone'
+
+    row = {'name': name, 'email': email, 'phone': phone or None}
+    if record.get('balance') not in (None, ''):
+        try:
+            row['balance'] = float(record['balance'])
+        except (TypeError, ValueError):
+            return None, 'invalid balance'
+    return row, None
+
+def _existing_emails(emails: List[str]) -> set:
+    """Which of these (lower-cased) emails already belong to a user, whatever the stored case"""
+    found = set()
+    email = db.func.lower(User.email)
+    for start in range(0, len(emails), LOOKUP_CHUNK):
+        chunk = emails[start:start + LOOKUP_CHUNK]
+        found.update(existing for (existing,) in db.session.query(email).filter(email.in_(chunk)))
+    return found
+
+def checkpoint_name(path: str) -> str:
+    """Checkpoint key for an input file"""
+    return 'import:' + hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:16]
+
+class UserImporter:
+    """Imports one input file in batches of `batch_size` within `transaction_size` commits"""
+
+    def __init__(self, path: str, fmt: str = None, batch_size: int = 5000,
+                 transaction_size: int = 50000, reject_path: str = None):
+        self.path = path
+        self.fmt = fmt
+        self.batch_size = batch_size
+        self.transaction_size = max(transaction_size, batch_size)
+        self.reject_path = reject_path or path + '.rejects.ndjson'
+        self.stats = {'processed': 0, 'inserted': 0, 'duplicates': 0, 'rejected': 0}
+        self._batch: List[Tuple[int, Dict, Dict]] = []
+        self._pending_rejects: List[Dict] = []
+        self._uncommitted = 0
+
+    def run(self, restart: bool = False) -> Dict:
+        """Import the file, resuming from the last committed record unless `restart`"""
+        name = checkpoint_name(self.path)
+        self.checkpoint = db.session.get(JobCheckpoint, name) or JobCheckpoint(name=name, position=0)
+        if restart:
+            self.checkpoint.position = 0
+            if os.path.exists(self.reject_path):
+                os.remove(self.reject_path)
+        resumed_from = self.checkpoint.position
+        started = time.perf_counter()
+
+        position = 0
+        for position, record in enumerate(iter_records(self.path, self.fmt), 1):
+            if position <= resumed_from:
+                continue  # committed by an earlier run
+            self.stats['processed'] += 1
+            row, reason = validate_record(record)
+            if reason:
+                self._reject(position, record, reason)
+            else:
+                self._batch.append((position, row, record))
+            self._uncommitted += 1
+
+            if len(self._batch) >= self.batch_size:
+                self._flush_batch()
+            if self._uncommitted >= self.transaction_size:
+                self._commit(position)
+
+        self._flush_batch()
+        self._commit(max(position, resumed_from))
+
+        # A completed import needs no resume point
+        db.session.delete(self.checkpoint)
+        db.session.commit()
+
+        elapsed = time.perf_counter() - started
+        return dict(self.stats,
+                    resumed_from_record=resumed_from,
+                    reject_file=self.reject_path if self.stats['rejected'] else None,
+                    elapsed_seconds=round(elapsed, 3),
+                    records_per_second=round(self.stats['processed'] / elapsed) if elapsed else None)
+
+    def _reject(self, position: int, record: Dict, reason: str):
+        self.stats['rejected'] += 1
+        self._pending_rejects.append({'record': position, 'reason': reason, 'data': record})
+
+    def _flush_batch(self):
+        if not self._batch:
+            return
+        existing = _existing_emails([row['email'] for _, row, _ in self._batch])
+        rows = []
+        for position, row, record in self._batch:
+            if row['email'] in existing:
+                self.stats['duplicates'] += 1
+                self._reject(position, record, 'duplicate email')
+                continue
+            existing.add(row['email'])  # later duplicates within the same file
+            rows.append(row)
+
+        if rows:
+            now = datetime.utcnow()
+            for row in rows:
+                row.setdefault('balance', 5000.0)
+                row.update(points=0, total_sent=0.0, tier='Bronze', is_active=True,
+                           created_at=now, updated_at=now)
+            db.session.execute(db.insert(User), rows)
+            self.stats['inserted'] += len(rows)
+        self._batch = []
+
+    def _commit(self, position: int):
+        """Write pending rejects, then commit inserted rows together with the resume point
+
+        Rejects go out first so a crash in between can at worst repeat them on
+        resume, never lose them.
+        """
+        if self._pending_rejects:
+            with open(self.reject_path, 'a', encoding='utf-8') as handle:
+                for reject in self._pending_rejects:
+                    handle.write(json.dumps(reject) + '\n')
+                handle.flush()
+                os.fsync(handle.fileno())
+            self._pending_rejects = []
+        self.checkpoint.position = position
+        db.session.add(self.checkpoint)
+        db.session.commit()
+        self._uncommitted = 0
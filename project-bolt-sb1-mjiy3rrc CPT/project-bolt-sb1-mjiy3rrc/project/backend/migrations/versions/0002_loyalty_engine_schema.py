@@ -0,0 +1,272 @@
+"""Tables and columns added by the loyalty engine work (caching through password hashing)
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 09:05:00
+
+Databases built by create_all() part-way through that work already have some
+of these tables and columns, so every step is skipped when its table, column
+or index exists. Stamp such databases at 0001 and upgrade as usual.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+# Tier thresholds when users.tier was introduced (Config.SILVER_THRESHOLD / GOLD_THRESHOLD);
+# run `flask retier` afterwards if they have been changed since
+SILVER_THRESHOLD = 20000
+GOLD_THRESHOLD = 50000
+
+
+def _inspector():
+    return sa.inspect(op.get_bind())
+
+
+def _has_table(name):
+    return _inspector().has_table(name)
+
+
+def _columns(table):
+    return {column['name']: column for column in _inspector().get_columns(table)}
+
+
+def _indexes(table):
+    return {index['name'] for index in _inspector().get_indexes(table)}
+
+
+def _create_table(name, *elements):
+    if not _has_table(name):
+        op.create_table(name, *elements)
+
+
+def _create_indexes(table, *indexes):
+    existing = _indexes(table)
+    missing = [(name, columns) for name, columns in indexes if name not in existing]
+    if missing:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            for name, columns in missing:
+                batch_op.create_index(name, columns, unique=False)
+
+
+def upgrade():
+    _create_table('campaigns',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('multiplier', sa.Float(), nullable=False),
+        sa.Column('bonus_points', sa.Integer(), nullable=False),
+        sa.Column('tiers', sa.String(length=50), nullable=True),
+        sa.Column('recipient_prefix', sa.String(length=10), nullable=True),
+        sa.Column('min_amount', sa.Float(), nullable=True),
+        sa.Column('max_amount', sa.Float(), nullable=True),
+        sa.Column('starts_at', sa.DateTime(), nullable=False),
+        sa.Column('ends_at', sa.DateTime(), nullable=False),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    _create_indexes('campaigns', ('ix_campaigns_ends_at', ['ends_at']))
+
+    _create_table('daily_category_redemption_rollups',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('category', sa.String(length=50), nullable=False),
+        sa.Column('redemptions', sa.Integer(), nullable=False),
+        sa.Column('points_spent', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'category')
+    )
+    _create_table('daily_points_rollups',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('points_issued', sa.Integer(), nullable=False),
+        sa.Column('points_redeemed', sa.Integer(), nullable=False),
+        sa.Column('transactions', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('day')
+    )
+    _create_table('daily_tier_transfer_rollups',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('tier', sa.String(length=20), nullable=False),
+        sa.Column('transfers', sa.Integer(), nullable=False),
+        sa.Column('amount', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'tier')
+    )
+
+    _create_table('fx_rates',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('currency', sa.String(length=3), nullable=False),
+        sa.Column('rate', sa.Float(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('version', 'currency', name='uq_fx_rates_version_currency')
+    )
+    _create_indexes('fx_rates', ('ix_fx_rates_version', ['version']))
+
+    _create_table('job_checkpoints',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+    _create_table('frequent_recipients',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('recipient_key', sa.String(length=120), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('name_lower', sa.String(length=100), nullable=False),
+        sa.Column('phone', sa.String(length=20), nullable=True),
+        sa.Column('phone_digits', sa.String(length=20), nullable=True),
+        sa.Column('transfer_count', sa.Integer(), nullable=False),
+        sa.Column('total_sent', sa.Float(), nullable=False),
+        sa.Column('last_sent_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'recipient_key', name='uq_frequent_recipients_user_key')
+    )
+    _create_indexes('frequent_recipients',
+                    ('ix_frequent_recipients_user_name', ['user_id', 'name_lower']),
+                    ('ix_frequent_recipients_user_phone', ['user_id', 'phone_digits']))
+
+    _create_table('idempotency_keys',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('route', sa.String(length=50), nullable=False),
+        sa.Column('key', sa.String(length=100), nullable=False),
+        sa.Column('request_hash', sa.String(length=64), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('status_code', sa.Integer(), nullable=True),
+        sa.Column('response_body', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'route', 'key', name='uq_idempotency_user_route_key')
+    )
+    _create_indexes('idempotency_keys', ('ix_idempotency_keys_created_at', ['created_at']))
+
+    _create_table('points_lots',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('source_reference', sa.String(length=50), nullable=True),
+        sa.Column('points_earned', sa.Integer(), nullable=False),
+        sa.Column('points_remaining', sa.Integer(), nullable=False),
+        sa.Column('points_expired', sa.Integer(), nullable=False),
+        sa.Column('earned_at', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    _create_indexes('points_lots',
+                    ('ix_points_lots_expires_at', ['expires_at']),
+                    ('ix_points_lots_user_earned', ['user_id', 'earned_at']))
+
+    _create_table('transactions_archive',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('transaction_type', sa.String(length=20), nullable=False),
+        sa.Column('amount', sa.Float(), nullable=False),
+        sa.Column('points_earned', sa.Integer(), nullable=True),
+        sa.Column('recipient', sa.String(length=100), nullable=True),
+        sa.Column('recipient_phone', sa.String(length=20), nullable=True),
+        sa.Column('currency', sa.String(length=3), nullable=True),
+        sa.Column('source_amount', sa.Float(), nullable=True),
+        sa.Column('fx_rate', sa.Float(), nullable=True),
+        sa.Column('fx_version', sa.Integer(), nullable=True),
+        sa.Column('reference', sa.String(length=50), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('reference')
+    )
+    _create_indexes('transactions_archive', ('ix_transactions_archive_user_created', ['user_id', 'created_at']))
+
+    _create_table('user_daily_activity',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('points_earned', sa.Integer(), nullable=False),
+        sa.Column('points_spent', sa.Integer(), nullable=False),
+        sa.Column('points_expired', sa.Integer(), nullable=False),
+        sa.Column('amount_sent', sa.Float(), nullable=False),
+        sa.Column('transfers', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('user_id', 'day')
+    )
+
+    columns = _columns('transactions')
+    missing = [column for column in (sa.Column('currency', sa.String(length=3), nullable=True),
+                                     sa.Column('source_amount', sa.Float(), nullable=True),
+                                     sa.Column('fx_rate', sa.Float(), nullable=True),
+                                     sa.Column('fx_version', sa.Integer(), nullable=True))
+               if column.name not in columns]
+    if missing:
+        with op.batch_alter_table('transactions', schema=None) as batch_op:
+            for column in missing:
+                batch_op.add_column(column)
+    _create_indexes('transactions',
+                    ('ix_transactions_created_at', ['created_at']),
+                    ('ix_transactions_user_created', ['user_id', 'created_at']))
+
+    columns = _columns('users')
+    widen = (getattr(columns['password_hash']['type'], 'length', None) or 255) < 255
+    if 'tier' not in columns or 'token_version' not in columns or widen:
+        # Existing rows get the server defaults; tier is backfilled from total_sent below
+        with op.batch_alter_table('users', schema=None) as batch_op:
+            if 'tier' not in columns:
+                batch_op.add_column(sa.Column('tier', sa.String(length=20), nullable=False, server_default='Bronze'))
+            if 'token_version' not in columns:
+                batch_op.add_column(sa.Column('token_version', sa.Integer(), nullable=False, server_default='0'))
+            if widen:
+                # scrypt and future PASSWORD_HASH_METHOD hashes exceed 128 characters
+                batch_op.alter_column('password_hash',
+                       existing_type=sa.VARCHAR(length=128),
+                       type_=sa.String(length=255),
+                       existing_nullable=True)
+        if 'tier' not in columns:
+            users = sa.table('users', sa.column('tier', sa.String), sa.column('total_sent', sa.Float))
+            op.execute(users.update().values(tier=sa.case(
+                (sa.func.coalesce(users.c.total_sent, 0) >= GOLD_THRESHOLD, 'Gold'),
+                (sa.func.coalesce(users.c.total_sent, 0) >= SILVER_THRESHOLD, 'Silver'),
+                else_='Bronze')))
+    _create_indexes('users',
+                    ('ix_users_tier', ['tier']),
+                    ('ix_users_total_sent', ['total_sent']))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index('ix_users_total_sent')
+        batch_op.drop_index('ix_users_tier')
+        batch_op.alter_column('password_hash',
+               existing_type=sa.String(length=255),
+               type_=sa.VARCHAR(length=128),
+               existing_nullable=True)
+        batch_op.drop_column('token_version')
+        batch_op.drop_column('tier')
+
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.drop_index('ix_transactions_user_created')
+        batch_op.drop_index('ix_transactions_created_at')
+        batch_op.drop_column('fx_version')
+        batch_op.drop_column('fx_rate')
+        batch_op.drop_column('source_amount')
+        batch_op.drop_column('currency')
+
+    op.drop_table('user_daily_activity')
+    op.drop_table('transactions_archive')
+    op.drop_table('points_lots')
+    op.drop_table('idempotency_keys')
+    op.drop_table('frequent_recipients')
+    op.drop_table('job_checkpoints')
+    op.drop_table('fx_rates')
+    op.drop_table('daily_tier_transfer_rollups')
+    op.drop_table('daily_points_rollups')
+    op.drop_table('daily_category_redemption_rollups')
+    op.drop_table('campaigns')
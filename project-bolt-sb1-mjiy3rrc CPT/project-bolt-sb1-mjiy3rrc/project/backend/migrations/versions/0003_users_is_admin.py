@@ -0,0 +1,27 @@
+"""Admin flag for the program-wide analytics endpoints
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 10:20:00
+
+Grant access with `flask --app app set-admin EMAIL`.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('is_admin', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('is_admin')
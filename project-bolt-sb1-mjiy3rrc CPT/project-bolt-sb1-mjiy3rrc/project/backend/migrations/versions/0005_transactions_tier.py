@@ -0,0 +1,46 @@
+"""Sender tier on transactions, so tier reports don't follow later upgrades
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 16:30:00
+
+Existing transfers are backfilled from user_tier_history: the tier reached by
+the last change before the transfer, else the tier left by the first change
+after it, else the user's current tier.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def _backfill(table):
+    op.execute(f"""
+        UPDATE {table} SET tier = COALESCE(
+            (SELECT h.new_tier FROM user_tier_history h
+              WHERE h.user_id = {table}.user_id AND h.created_at < {table}.created_at
+              ORDER BY h.created_at DESC, h.id DESC LIMIT 1),
+            (SELECT h.old_tier FROM user_tier_history h
+              WHERE h.user_id = {table}.user_id AND h.created_at >= {table}.created_at
+              ORDER BY h.created_at, h.id LIMIT 1),
+            (SELECT u.tier FROM users u WHERE u.id = {table}.user_id))
+        WHERE transaction_type = 'send'
+    """)
+
+
+def upgrade():
+    for table in ('transactions', 'transactions_archive'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('tier', sa.String(length=20), nullable=True))
+        _backfill(table)
+
+
+def downgrade():
+    for table in ('transactions_archive', 'transactions'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('tier')
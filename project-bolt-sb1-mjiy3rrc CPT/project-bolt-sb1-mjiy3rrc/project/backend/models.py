@@ -3,9 +3,22 @@ Database models for Mukuru Loyalty Program
 """
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import validates
+from config import Config
 
 db = SQLAlchemy()
 
+TIERS = ('Bronze', 'Silver', 'Gold')
+
+def tier_for(total_sent: float) -> str:
+    """Calculate tier for a total amount sent using the configured thresholds"""
+    if total_sent >= Config.GOLD_THRESHOLD:
+        return 'Gold'
+    elif total_sent >= Config.SILVER_THRESHOLD:
+        return 'Silver'
+    return 'Bronze'
+
 class User(db.Model):
     """User model for customer accounts"""
     __tablename__ = 'users'
@@ -14,11 +27,14 @@ class User(db.Model):
     name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     phone = db.Column(db.String(20))
-    password_hash = db.Column(db.String(128))
+    password_hash = db.Column(db.String(255))  # scrypt hashes exceed 128 characters
     balance = db.Column(db.Float, default=5000.0)
     points = db.Column(db.Integer, default=0)
-    total_sent = db.Column(db.Float, default=0.0)
+    total_sent = db.Column(db.Float, default=0.0, index=True)
+    tier = db.Column(db.String(20), default='Bronze', nullable=False, index=True)  # kept in sync with total_sent
     is_active = db.Column(db.Boolean, default=True)
+    token_version = db.Column(db.Integer, default=0, nullable=False)  # bumped to revoke issued tokens
+    is_admin = db.Column(db.Boolean, default=False, nullable=False, server_default=db.false())  # may read program-wide analytics
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -26,14 +42,29 @@ class User(db.Model):
     transactions = db.relationship('Transaction', backref='user', lazy=True, cascade='all, delete-orphan')
     redemptions = db.relationship('Redemption', backref='user', lazy=True, cascade='all, delete-orphan')
     
-    @property
-    def tier(self):
-        """Calculate user tier based on total amount sent"""
-        if self.total_sent >= 50000:
-            return 'Gold'
-        elif self.total_sent >= 20000:
-            return 'Silver'
-        return 'Bronze'
+    def __init__(self, **kwargs):
+        super(User, self).__init__(**kwargs)
+        if not self.tier:
+            self.tier = tier_for(self.total_sent or 0)
+    
+    @validates('total_sent')
+    def _sync_tier(self, key, total_sent):
+        """Keep the stored tier in step with ORM writes to total_sent"""
+        self.tier = tier_for(total_sent or 0)
+        return total_sent
+    
+    @hybrid_property
+    def computed_tier(self):
+        """Tier implied by total amount sent under the current thresholds"""
+        return tier_for(self.total_sent or 0)
+    
+    @computed_tier.expression
+    def computed_tier(cls):
+        return db.case(
+            (cls.total_sent >= Config.GOLD_THRESHOLD, 'Gold'),
+            (cls.total_sent >= Config.SILVER_THRESHOLD, 'Silver'),
+            else_='Bronze'
+        )
     
     @property
     def tier_progress(self):
@@ -41,7 +72,7 @@ class User(db.Model):
         if self.tier == 'Gold':
             return 100
         
-        next_threshold = 20000 if self.tier == 'Bronze' else 50000
+        next_threshold = Config.SILVER_THRESHOLD if self.tier == 'Bronze' else Config.GOLD_THRESHOLD
         return min((self.total_sent / next_threshold) * 100, 100)
     
     def can_send(self, amount):
@@ -69,21 +100,32 @@ class User(db.Model):
             'updated_at': self.updated_at.isoformat()
         }
 
+# Case-insensitive email lookups (bulk import dedupe)
+db.Index('ix_users_email_lower', db.func.lower(User.email))
+
 class Transaction(db.Model):
     """Transaction model for money transfers and point activities"""
     __tablename__ = 'transactions'
+    __table_args__ = (
+        db.Index('ix_transactions_user_created', 'user_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    transaction_type = db.Column(db.String(20), nullable=False)  # 'send', 'reward', 'bonus'
-    amount = db.Column(db.Float, nullable=False)
+    transaction_type = db.Column(db.String(20), nullable=False)  # 'send', 'reward', 'bonus', 'expiry'
+    amount = db.Column(db.Float, nullable=False)  # in Config.BASE_CURRENCY
     points_earned = db.Column(db.Integer, default=0)
     recipient = db.Column(db.String(100))
     recipient_phone = db.Column(db.String(20))
+    currency = db.Column(db.String(3), default=Config.BASE_CURRENCY)  # currency the sender paid in
+    source_amount = db.Column(db.Float)  # amount in that currency
+    fx_rate = db.Column(db.Float)  # base currency units per unit of `currency`
+    fx_version = db.Column(db.Integer)  # FxRate snapshot version used for the conversion
+    tier = db.Column(db.String(20))  # sender's tier when a transfer was priced, for reporting
     reference = db.Column(db.String(50), unique=True)
     status = db.Column(db.String(20), default='pending')  # 'pending', 'completed', 'failed'
     description = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     completed_at = db.Column(db.DateTime)
     
     def __init__(self, **kwargs):
@@ -110,6 +152,10 @@ class Transaction(db.Model):
             'points': self.points_earned,
             'recipient': self.recipient,
             'recipient_phone': self.recipient_phone,
+            'currency': self.currency,
+            'source_amount': self.source_amount,
+            'fx_rate': self.fx_rate,
+            'fx_version': self.fx_version,
             'reference': self.reference,
             'status': self.status,
             'description': self.description,
@@ -117,6 +163,76 @@ class Transaction(db.Model):
             'completed_at': self.completed_at.isoformat() if self.completed_at else None
         }
 
+class TransactionArchive(db.Model):
+    """Transactions from closed months, moved out of the live table by the archive job"""
+    __tablename__ = 'transactions_archive'
+    __table_args__ = (
+        db.Index('ix_transactions_archive_user_created', 'user_id', 'created_at'),
+    )
+    
+    # Same columns as Transaction; ids are preserved when rows are moved
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    transaction_type = db.Column(db.String(20), nullable=False)
+    amount = db.Column(db.Float, nullable=False)
+    points_earned = db.Column(db.Integer, default=0)
+    recipient = db.Column(db.String(100))
+    recipient_phone = db.Column(db.String(20))
+    currency = db.Column(db.String(3))
+    source_amount = db.Column(db.Float)
+    fx_rate = db.Column(db.Float)
+    fx_version = db.Column(db.Integer)
+    tier = db.Column(db.String(20))
+    reference = db.Column(db.String(50), unique=True)
+    status = db.Column(db.String(20))
+    description = db.Column(db.Text)
+    created_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime)
+    
+    to_dict = Transaction.to_dict
+
+class FrequentRecipient(db.Model):
+    """Per-user recipient summary, maintained by send_money for autocomplete"""
+    __tablename__ = 'frequent_recipients'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'recipient_key', name='uq_frequent_recipients_user_key'),
+        db.Index('ix_frequent_recipients_user_name', 'user_id', 'name_lower'),
+        db.Index('ix_frequent_recipients_user_phone', 'user_id', 'phone_digits'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    recipient_key = db.Column(db.String(120), nullable=False)  # velocity.recipient_key
+    name = db.Column(db.String(100), nullable=False)  # most recently used spelling
+    name_lower = db.Column(db.String(100), nullable=False)
+    phone = db.Column(db.String(20))
+    phone_digits = db.Column(db.String(20))
+    transfer_count = db.Column(db.Integer, nullable=False, default=0)
+    total_sent = db.Column(db.Float, nullable=False, default=0.0)
+    last_sent_at = db.Column(db.DateTime, nullable=False)
+    
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'phone': self.phone,
+            'transfer_count': self.transfer_count,
+            'total_sent': self.total_sent,
+            'last_sent': self.last_sent_at.isoformat()
+        }
+
+class FxRate(db.Model):
+    """One currency's rate within a published, immutable rate version"""
+    __tablename__ = 'fx_rates'
+    __table_args__ = (
+        db.UniqueConstraint('version', 'currency', name='uq_fx_rates_version_currency'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, index=True)
+    currency = db.Column(db.String(3), nullable=False)
+    rate = db.Column(db.Float, nullable=False)  # base currency units per unit of `currency`
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class Reward(db.Model):
     """Reward model for loyalty program rewards"""
     __tablename__ = 'rewards'
@@ -155,8 +271,12 @@ class Reward(db.Model):
                 self.is_in_stock and 
                 user.points >= self.points_cost)
     
-    def to_dict(self):
-        """Convert reward to dictionary for JSON response"""
+    def to_dict(self, redemption_count: int = None):
+        """Convert reward to dictionary for JSON response
+
+        Pass `redemption_count` when serialising many rewards to avoid loading
+        each reward's redemptions.
+        """
         return {
             'id': self.id,
             'name': self.name,
@@ -169,7 +289,7 @@ class Reward(db.Model):
             'stockQuantity': self.stock_quantity,
             'termsConditions': self.terms_conditions,
             'expiryDays': self.expiry_days,
-            'redemptionCount': self.redemption_count,
+            'redemptionCount': self.redemption_count if redemption_count is None else redemption_count,
             'created_at': self.created_at.isoformat()
         }
 
@@ -225,6 +345,81 @@ class Redemption(db.Model):
             'is_expired': self.is_expired
         }
 
+class Campaign(db.Model):
+    """Time-boxed bonus points rule applied to matching transfers"""
+    __tablename__ = 'campaigns'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    multiplier = db.Column(db.Float, nullable=False, default=1.0)
+    bonus_points = db.Column(db.Integer, nullable=False, default=0)
+    tiers = db.Column(db.String(50))  # comma separated, empty for every tier
+    recipient_prefix = db.Column(db.String(10))  # recipient phone dialling prefix (corridor)
+    min_amount = db.Column(db.Float)
+    max_amount = db.Column(db.Float)
+    starts_at = db.Column(db.DateTime, nullable=False)
+    ends_at = db.Column(db.DateTime, nullable=False, index=True)
+    is_active = db.Column(db.Boolean, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'multiplier': self.multiplier,
+            'bonus_points': self.bonus_points,
+            'tiers': self.tiers.split(',') if self.tiers else [],
+            'recipient_prefix': self.recipient_prefix,
+            'min_amount': self.min_amount,
+            'max_amount': self.max_amount,
+            'starts_at': self.starts_at.isoformat(),
+            'ends_at': self.ends_at.isoformat(),
+            'is_active': self.is_active
+        }
+
+def add_months(moment: datetime, months: int) -> datetime:
+    """Shift a datetime by whole calendar months, clamping to the month's last day"""
+    index = moment.year * 12 + moment.month - 1 + months
+    year, month = divmod(index, 12)
+    month += 1
+    days_in_month = (datetime(year + month // 12, month % 12 + 1, 1) - datetime(year, month, 1)).days
+    return moment.replace(year=year, month=month, day=min(moment.day, days_in_month))
+
+class PointsLot(db.Model):
+    """A batch of earned points, spent FIFO by redemptions and expired by the expiry job"""
+    __tablename__ = 'points_lots'
+    __table_args__ = (
+        db.Index('ix_points_lots_user_earned', 'user_id', 'earned_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    source_reference = db.Column(db.String(50))  # reference of the earning transaction
+    points_earned = db.Column(db.Integer, nullable=False)
+    points_remaining = db.Column(db.Integer, nullable=False)
+    points_expired = db.Column(db.Integer, nullable=False, default=0)
+    earned_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    
+    def __init__(self, **kwargs):
+        super(PointsLot, self).__init__(**kwargs)
+        if self.points_remaining is None:
+            self.points_remaining = self.points_earned
+        if not self.earned_at:
+            self.earned_at = datetime.utcnow()
+        if not self.expires_at:
+            self.expires_at = add_months(self.earned_at, Config.POINTS_EXPIRY_MONTHS)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'points_earned': self.points_earned,
+            'points_remaining': self.points_remaining,
+            'earned_at': self.earned_at.isoformat(),
+            'expires_at': self.expires_at.isoformat()
+        }
+
 class UserTierHistory(db.Model):
     """Track user tier progression history"""
     __tablename__ = 'user_tier_history'
@@ -245,4 +440,93 @@ class UserTierHistory(db.Model):
             'new_tier': self.new_tier,
             'total_sent_at_change': self.total_sent_at_change,
             'created_at': self.created_at.isoformat()
-        }
\ No newline at end of file
+        }
+
+class JobCheckpoint(db.Model):
+    """Resume position for chunked batch jobs"""
+    __tablename__ = 'job_checkpoints'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class IdempotencyRecord(db.Model):
+    """Stored outcome of a money-moving request, keyed by the client's Idempotency-Key"""
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'route', 'key', name='uq_idempotency_user_route_key'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    route = db.Column(db.String(50), nullable=False)
+    key = db.Column(db.String(100), nullable=False)
+    request_hash = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(20), default='pending')  # 'pending', 'applied' (committed with the view), 'completed'
+    status_code = db.Column(db.Integer)
+    response_body = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    completed_at = db.Column(db.DateTime)
+
+class DailyPointsRollup(db.Model):
+    """Points issued and redeemed per day, maintained by the rollup job"""
+    __tablename__ = 'daily_points_rollups'
+    
+    day = db.Column(db.Date, primary_key=True)
+    points_issued = db.Column(db.Integer, nullable=False, default=0)
+    points_redeemed = db.Column(db.Integer, nullable=False, default=0)
+    transactions = db.Column(db.Integer, nullable=False, default=0)
+    
+    def to_dict(self):
+        return {
+            'day': self.day.isoformat(),
+            'points_issued': self.points_issued,
+            'points_redeemed': self.points_redeemed,
+            'transactions': self.transactions
+        }
+
+class DailyCategoryRedemptionRollup(db.Model):
+    """Redemptions per reward category per day, maintained by the rollup job"""
+    __tablename__ = 'daily_category_redemption_rollups'
+    
+    day = db.Column(db.Date, primary_key=True)
+    category = db.Column(db.String(50), primary_key=True)
+    redemptions = db.Column(db.Integer, nullable=False, default=0)
+    points_spent = db.Column(db.Integer, nullable=False, default=0)
+    
+    def to_dict(self):
+        return {
+            'day': self.day.isoformat(),
+            'category': self.category,
+            'redemptions': self.redemptions,
+            'points_spent': self.points_spent
+        }
+
+class DailyTierTransferRollup(db.Model):
+    """Money transfers per user tier per day, maintained by the rollup job"""
+    __tablename__ = 'daily_tier_transfer_rollups'
+    
+    day = db.Column(db.Date, primary_key=True)
+    tier = db.Column(db.String(20), primary_key=True)
+    transfers = db.Column(db.Integer, nullable=False, default=0)
+    amount = db.Column(db.Float, nullable=False, default=0.0)
+    
+    def to_dict(self):
+        return {
+            'day': self.day.isoformat(),
+            'tier': self.tier,
+            'transfers': self.transfers,
+            'amount': self.amount
+        }
+
+class UserDailyActivity(db.Model):
+    """Per-user points and transfer totals per day, maintained by the write paths for charts"""
+    __tablename__ = 'user_daily_activity'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    points_earned = db.Column(db.Integer, nullable=False, default=0)
+    points_spent = db.Column(db.Integer, nullable=False, default=0)
+    points_expired = db.Column(db.Integer, nullable=False, default=0)
+    amount_sent = db.Column(db.Float, nullable=False, default=0.0)
+    transfers = db.Column(db.Integer, nullable=False, default=0)
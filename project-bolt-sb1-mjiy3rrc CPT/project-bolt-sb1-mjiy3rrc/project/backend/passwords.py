@@ -0,0 +1,122 @@
+"""
+Password hashing for Mukuru Loyalty Program
+
+Hash verification is CPU-bound and deliberately slow. Logins hand it to a
+small per-process pool of native threads (hashlib's PBKDF2/scrypt release
+the GIL, so the pool really runs in parallel while request threads keep
+serving reads). Under gevent's monkey-patching a ThreadPoolExecutor would
+only start greenlets, so gevent's native-thread executor is used instead and
+the waiting greenlet yields to the others. At most PASSWORD_HASH_WORKERS
+hashes run at once and at most PASSWORD_HASH_MAX_PENDING wait; beyond that
+logins fail fast with HasherBusy instead of queueing without bound.
+
+Unknown emails are checked against a dummy hash of the current method, so a
+miss takes as long as a wrong password. Hashes made with an older method or
+cost are re-hashed in the background after a successful login, which does
+not wait for them.
+"""
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Tuple
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from config import Config
+
+class HasherBusy(Exception):
+    """Too many password hashes are queued; the caller should retry later"""
+
+def _native_executor(workers: int):
+    """A pool of OS threads, even when gevent has monkey-patched threading"""
+    try:
+        from gevent.monkey import is_module_patched
+    except ImportError:
+        is_module_patched = None
+    if is_module_patched and is_module_patched('threading'):
+        from gevent.threadpool import ThreadPoolExecutor as GeventThreadPoolExecutor
+        return GeventThreadPoolExecutor(max_workers=workers)
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+
+class PasswordHasher:
+    """Bounded pool for password hashing and verification"""
+
+    def __init__(self, method: str, workers: int, max_pending: int, wait_seconds: float = 1.0):
+        self.method = method
+        self.workers = workers
+        self.wait_seconds = wait_seconds
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._dummy_hash = None
+        self._prefix = None
+
+    def _submit(self, function, *args):
+        # Made on first use, i.e. in the worker process after any monkey-patching
+        # (gunicorn --preload imports the app before gevent patches the worker)
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = _native_executor(self.workers)
+        return self._executor.submit(function, *args)
+
+    def _run(self, function, *args):
+        if not self._slots.acquire(timeout=self.wait_seconds):
+            raise HasherBusy()
+        try:
+            return self._submit(function, *args).result()
+        finally:
+            self._slots.release()
+
+    def _current(self) -> Tuple[str, str]:
+        """(dummy hash, 'method:params' prefix) for the configured method, made on first use"""
+        if self._dummy_hash is None:
+            dummy = generate_password_hash(secrets.token_urlsafe(16), self.method)
+            self._prefix = dummy.split('$', 1)[0]
+            self._dummy_hash = dummy
+        return self._dummy_hash, self._prefix
+
+    def hash(self, password: str) -> str:
+        """Hash a password with the current method and cost"""
+        return self._run(generate_password_hash, password, self.method)
+
+    def needs_rehash(self, stored_hash: str) -> bool:
+        """Whether a stored hash uses a different method or cost than the current one"""
+        return stored_hash.split('$', 1)[0] != self._current()[1]
+
+    def verify(self, stored_hash: Optional[str], password: str) -> bool:
+        """Check a password
+
+        A missing `stored_hash` (unknown user, or no password set) is checked
+        against the dummy hash and never matches.
+        """
+        valid = self._run(check_password_hash, stored_hash or self._current()[0], password or '')
+        return bool(valid and stored_hash)
+
+    def rehash_in_background(self, password: str, store: Callable[[str], None]) -> Optional[threading.Thread]:
+        """Hash a password with the current method without waiting, then call `store(new_hash)`
+
+        `store` runs on a background thread (a greenlet under gevent) once the
+        pool has produced the hash. Returns that thread, or None when the pool
+        is full; the upgrade is then retried at the next login.
+        """
+        if not self._slots.acquire(blocking=False):
+            return None
+        try:
+            future = self._submit(generate_password_hash, password, self.method)
+        except BaseException:
+            self._slots.release()
+            raise
+        thread = threading.Thread(target=self._store_rehash, args=(future, store), daemon=True)
+        thread.start()
+        return thread
+
+    def _store_rehash(self, future, store: Callable[[str], None]):
+        try:
+            new_hash = future.result()
+        finally:
+            self._slots.release()
+        store(new_hash)
+
+password_hasher = PasswordHasher(Config.PASSWORD_HASH_METHOD, Config.PASSWORD_HASH_WORKERS,
+                                 Config.PASSWORD_HASH_MAX_PENDING, Config.PASSWORD_HASH_WAIT_SECONDS)
@@ -0,0 +1,9 @@
+"""
+Phone number helpers shared by recipients, campaigns and services
+"""
+from typing import Optional
+
+def phone_digits(phone: Optional[str]) -> str:
+    """Normalise a phone number to international digits without a leading 00"""
+    digits = ''.join(ch for ch in phone or '' if ch.isdigit())
+    return digits[2:] if digits.startswith('00') else digits
@@ -0,0 +1,211 @@
+"""
+Opt-in sampled request profiling for Mukuru Loyalty Program
+
+When Config.PROFILE_ENABLED is set, a fraction of requests (plus any for
+PROFILE_ROUTES or carrying a matching X-Profile-Token header) are profiled
+and written per endpoint under PROFILE_DIR:
+
+- 'sampler' mode: one background thread samples the stacks of profiled
+  request threads every PROFILE_SAMPLE_INTERVAL_MS and writes collapsed
+  stacks (`.folded`), ready for flamegraph.pl / speedscope.
+- 'cprofile' mode: deterministic cProfile per request, written as `.pstats`.
+
+Both profilers work per OS thread, so at most one request per thread is
+profiled at a time; others arriving meanwhile are not profiled. Under
+gevent, where request greenlets share one thread, stack sampling cannot tell
+them apart, so requests are profiled with cProfile whatever the mode; the
+profile also counts greenlets that ran while the profiled one was waiting.
+
+With profiling disabled no request hooks are registered at all.
+"""
+import cProfile
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from itertools import count
+from typing import Dict, Iterable, List, Optional
+
+from flask import g, request
+
+from config import Config
+
+try:
+    from gevent.monkey import get_original, is_module_patched
+except ImportError:  # optional; only used to see through gevent's monkey-patching
+    get_original = is_module_patched = None
+
+_sequence = count()
+
+# sys._current_frames() and cProfile are keyed by OS thread, not greenlet
+_os_thread_id = get_original('_thread', 'get_ident') if get_original else threading.get_ident
+_profiled_threads = set()
+_profiled_threads_lock = threading.Lock()
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def collapse_stack(frame) -> str:
+    """Render a frame's stack root-first in collapsed-stack format"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+class StackSampler:
+    """Background thread sampling the stacks of registered threads"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._active: Dict[int, Counter] = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self, thread_id: int):
+        with self._lock:
+            self._active[thread_id] = Counter()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+                self._thread.start()
+
+    def stop(self, thread_id: int) -> Counter:
+        with self._lock:
+            return self._active.pop(thread_id, Counter())
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, stacks in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[collapse_stack(frame)] += 1
+
+sampler = StackSampler(Config.PROFILE_SAMPLE_INTERVAL_MS / 1000.0)
+
+def should_profile(endpoint: Optional[str]) -> bool:
+    """Decide whether the current request is profiled"""
+    if endpoint in Config.PROFILE_ROUTES:
+        return True
+    token = Config.PROFILE_TOKEN
+    if token and request.headers.get('X-Profile-Token') == token:
+        return True
+    return random.random() < Config.PROFILE_SAMPLE_RATE
+
+def _output_path(endpoint: str, suffix: str) -> str:
+    directory = os.path.join(Config.PROFILE_DIR, endpoint or 'unknown')
+    os.makedirs(directory, exist_ok=True)
+    name = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{next(_sequence)}{suffix}"
+    return os.path.join(directory, name)
+
+def _rotate(directory: str):
+    """Keep only the newest PROFILE_MAX_FILES profiles in a route directory"""
+    entries = sorted(os.scandir(directory), key=lambda entry: entry.stat().st_mtime)
+    for entry in entries[:max(len(entries) - Config.PROFILE_MAX_FILES, 0)]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass  # removed by another worker
+
+def write_folded(path: str, stacks: Counter):
+    with open(path, 'w', encoding='utf-8') as handle:
+        for stack, samples in stacks.most_common():
+            handle.write(f"{stack} {samples}\n")
+
+def _mode() -> str:
+    if is_module_patched and is_module_patched('threading'):
+        return 'cprofile'
+    return Config.PROFILE_MODE
+
+def _release(thread_id: int):
+    with _profiled_threads_lock:
+        _profiled_threads.discard(thread_id)
+
+def _begin():
+    if not should_profile(request.endpoint):
+        return
+    thread_id = _os_thread_id()
+    with _profiled_threads_lock:
+        if thread_id in _profiled_threads:
+            return  # another request (greenlet) on this thread is being profiled
+        _profiled_threads.add(thread_id)
+    profile = None
+    if _mode() == 'cprofile':
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:  # another profiling tool holds this thread
+            _release(thread_id)
+            return
+    else:
+        sampler.start(thread_id)
+    g._profile = (request._get_current_object(), thread_id, profile)
+
+def _finish(exc=None):
+    entry = g.get('_profile')
+    if entry is None or entry[0] is not request._get_current_object():
+        return  # not profiled, or a batched sub-request sharing the batch's app context
+    del g._profile
+    _, thread_id, profile = entry
+    try:
+        if profile is not None:
+            profile.disable()
+            path = _output_path(request.endpoint, '.pstats')
+            profile.dump_stats(path)
+        else:
+            stacks = sampler.stop(thread_id)
+            if not stacks:
+                return  # finished before the first sample
+            path = _output_path(request.endpoint, '.folded')
+            write_folded(path, stacks)
+        _rotate(os.path.dirname(path))
+    finally:
+        _release(thread_id)
+
+def init_profiler(app):
+    """Install the profiling hooks if Config.PROFILE_ENABLED"""
+    if not Config.PROFILE_ENABLED:
+        return
+    app.before_request(_begin)
+    app.teardown_request(_finish)
+
+def profile_files(route: str = None, suffix: str = '.folded') -> List[str]:
+    """List stored profiles for one endpoint, or for all of them"""
+    if not os.path.isdir(Config.PROFILE_DIR):
+        return []
+    routes = [route] if route else sorted(entry.name for entry in os.scandir(Config.PROFILE_DIR) if entry.is_dir())
+    paths = []
+    for name in routes:
+        directory = os.path.join(Config.PROFILE_DIR, name)
+        if os.path.isdir(directory):
+            paths += sorted(entry.path for entry in os.scandir(directory) if entry.name.endswith(suffix))
+    return paths
+
+def merge_profiles(paths: Iterable[str], output: str, fmt: str = 'folded') -> Dict:
+    """Merge .folded files into one collapsed-stack file (flame-graph input), or .pstats files into one dump"""
+    paths = list(paths)
+    if not paths:
+        return {'output': None, 'files': 0}
+
+    if fmt == 'pstats':
+        import pstats
+
+        stats = pstats.Stats(*paths)
+        stats.dump_stats(output)
+        return {'output': output, 'files': len(paths), 'total_seconds': round(stats.total_tt, 3)}
+
+    stacks = Counter()
+    for path in paths:
+        with open(path, encoding='utf-8') as handle:
+            for line in handle:
+                stack, _, samples = line.rstrip('\n').rpartition(' ')
+                if stack:
+                    stacks[stack] += int(samples)
+    write_folded(output, stacks)
+    return {'output': output, 'files': len(paths), 'samples': sum(stacks.values())}
@@ -0,0 +1,164 @@
+"""
+Token-bucket rate limiting for Mukuru Loyalty Program
+
+Money-moving routes are limited per user (by tier) and per client IP. Buckets
+live in process memory by default, or in Redis so all workers share them.
+"""
+import logging
+import threading
+import time
+from functools import wraps
+from typing import Dict, Optional, Tuple
+
+from flask import jsonify, request
+
+from auth import current_identity
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class LocalBucketStore:
+    """In-process token buckets"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: int, rate: float, cost: int = 1) -> Tuple[bool, float]:
+        """Take `cost` tokens from a bucket, returning (allowed, retry_after_seconds)"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    self._prune(now)
+                bucket = self._buckets[key] = [float(capacity), now, capacity, rate]
+            tokens = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            if tokens >= cost:
+                bucket[0] = tokens - cost
+                return True, 0.0
+            bucket[0] = tokens
+            return False, (cost - tokens) / rate
+
+    def _prune(self, now: float):
+        # Buckets that have refilled completely carry no state worth keeping
+        idle = [key for key, (tokens, ts, capacity, rate) in self._buckets.items()
+                if tokens + (now - ts) * rate >= capacity]
+        for key in idle:
+            del self._buckets[key]
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+# Refill and take atomically on the Redis server, using its clock so workers agree
+_TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(retry_after)}
+"""
+
+class RedisBucketStore:
+    """Token buckets shared by all workers through Redis
+
+    While Redis is unreachable the local store stands in, so an outage
+    degrades to per-worker limits instead of failing requests.
+    """
+
+    def __init__(self, url: str, fallback: LocalBucketStore = None, retry_interval: float = 5.0):
+        import redis
+
+        self._errors = redis.RedisError
+        self._redis = redis.Redis.from_url(url, socket_timeout=0.05, socket_connect_timeout=0.05)
+        self._script = self._redis.register_script(_TAKE_SCRIPT)
+        self.fallback = fallback or LocalBucketStore()
+        self.retry_interval = retry_interval
+        self._down_until = 0.0
+
+    def take(self, key: str, capacity: int, rate: float, cost: int = 1) -> Tuple[bool, float]:
+        """Take `cost` tokens from a shared bucket, returning (allowed, retry_after_seconds)"""
+        if time.monotonic() >= self._down_until:
+            try:
+                allowed, retry_after = self._script(keys=[key], args=[capacity, rate, cost])
+                return bool(allowed), float(retry_after)
+            except self._errors:
+                logger.warning("Redis rate limit store unavailable, using local buckets")
+                self._down_until = time.monotonic() + self.retry_interval
+        return self.fallback.take(key, capacity, rate, cost)
+
+class RateLimiter:
+    """Applies per-route, per-tier user limits and per-IP limits
+
+    Limits are `(burst, per_minute)` pairs taken from Config.RATE_LIMITS.
+    """
+
+    def __init__(self, store, limits: Dict):
+        self.store = store
+        self.limits = limits
+
+    def check(self, route: str, user_id: Optional[int], tier: Optional[str], ip: Optional[str]) -> Tuple[bool, float]:
+        """Check a request against its buckets, returning (allowed, retry_after_seconds)"""
+        route_limits = self.limits.get(route)
+        if not route_limits:
+            return True, 0.0
+
+        if ip and 'per_ip' in route_limits:
+            allowed, retry_after = self._take(f'rl:{route}:ip:{ip}', route_limits['per_ip'])
+            if not allowed:
+                return False, retry_after
+
+        if user_id is not None and 'per_user' in route_limits:
+            per_user = route_limits['per_user']
+            limit = per_user.get(tier) or per_user['Bronze']
+            return self._take(f'rl:{route}:u:{user_id}', limit)
+
+        return True, 0.0
+
+    def _take(self, key: str, limit: Tuple[int, int]) -> Tuple[bool, float]:
+        burst, per_minute = limit
+        return self.store.take(key, burst, per_minute / 60.0)
+
+def create_store():
+    """Build the bucket store selected by Config.RATE_LIMIT_BACKEND"""
+    if Config.RATE_LIMIT_BACKEND == 'redis':
+        return RedisBucketStore(Config.REDIS_URL)
+    return LocalBucketStore()
+
+limiter = RateLimiter(create_store(), Config.RATE_LIMITS)
+
+def rate_limited(route: str):
+    """Reject requests over the route's limits with 429 Too Many Requests"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if Config.RATE_LIMIT_ENABLED:
+                identity = current_identity()
+                allowed, retry_after = limiter.check(route, identity and identity.user_id,
+                                                     identity and identity.tier, request.remote_addr)
+                if not allowed:
+                    response = jsonify({'error': 'Too many requests'})
+                    response.status_code = 429
+                    response.headers['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+                    return response
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,64 @@
+"""
+Frequent-recipient index rebuild for Mukuru Loyalty Program
+
+send_money keeps frequent_recipients current; this job (re)builds it from
+live and archived transfer history, e.g. after first deploying the index.
+Users are processed in id-range chunks, each rebuilt and committed in one
+transaction, so the job can be stopped and rerun at any time. Run it in a
+quiet period: a transfer committed while its sender's chunk is being rebuilt
+may be counted twice.
+"""
+import time
+from typing import Dict
+
+from models import db, User, Transaction, TransactionArchive, FrequentRecipient
+from phones import phone_digits
+from velocity import recipient_key
+
+def _rebuild_chunk(start_id: int, end_id: int) -> int:
+    index = {}
+    for source in (TransactionArchive, Transaction):
+        rows = db.session.query(source.user_id, source.recipient, source.recipient_phone,
+                                source.amount, source.created_at)\
+                         .filter(source.user_id > start_id, source.user_id <= end_id,
+                                 source.transaction_type == 'send',
+                                 source.status == 'completed',
+                                 source.recipient.isnot(None))\
+                         .order_by(source.created_at)\
+                         .yield_per(10000)
+        for user_id, name, phone, amount, created_at in rows:
+            key = recipient_key(name, phone)
+            entry = index.get((user_id, key))
+            if entry is None:
+                entry = index[(user_id, key)] = {
+                    'user_id': user_id, 'recipient_key': key,
+                    'transfer_count': 0, 'total_sent': 0.0, 'phone': None, 'phone_digits': None}
+            # Rows arrive oldest first, so the latest name and phone win
+            entry.update(name=name, name_lower=name.lower(), last_sent_at=created_at)
+            if phone:
+                entry.update(phone=phone, phone_digits=phone_digits(phone) or None)
+            entry['transfer_count'] += 1
+            entry['total_sent'] += amount
+
+    db.session.execute(db.delete(FrequentRecipient)
+                         .where(FrequentRecipient.user_id > start_id, FrequentRecipient.user_id <= end_id))
+    if index:
+        db.session.execute(db.insert(FrequentRecipient), list(index.values()))
+    db.session.commit()
+    return len(index)
+
+def rebuild_recipient_index(chunk_size: int = 1000) -> Dict:
+    """Rebuild every user's frequent-recipient index from transfer history"""
+    started = time.perf_counter()
+    max_id = db.session.query(db.func.max(User.id)).scalar() or 0
+    entries = chunks = 0
+    for start_id in range(0, max_id, chunk_size):
+        entries += _rebuild_chunk(start_id, start_id + chunk_size)
+        chunks += 1
+
+    return {
+        'users_scanned_to_id': max_id,
+        'recipients_indexed': entries,
+        'chunks': chunks,
+        'elapsed_seconds': round(time.perf_counter() - started, 3)
+    }
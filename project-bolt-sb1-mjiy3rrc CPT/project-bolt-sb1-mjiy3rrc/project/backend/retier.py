@@ -0,0 +1,99 @@
+"""
+Bulk re-tiering for Mukuru Loyalty Program
+
+Recomputes every user's stored tier after SILVER_THRESHOLD / GOLD_THRESHOLD
+change, using set-based SQL over id ranges so no User objects are loaded.
+"""
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict
+
+from models import db, User, UserTierHistory, JobCheckpoint
+
+CHECKPOINT_NAME = 'retier_users'
+
+def _changed_in_range(start_id: int, end_id: int):
+    return db.and_(User.id > start_id,
+                   User.id <= end_id,
+                   User.tier != User.computed_tier)
+
+def _count_transitions(start_id: int, end_id: int) -> Counter:
+    rows = db.session.query(User.tier, User.computed_tier, db.func.count(User.id))\
+                     .filter(_changed_in_range(start_id, end_id))\
+                     .group_by(User.tier, User.computed_tier)\
+                     .all()
+    return Counter({f'{old}->{new}': count for old, new, count in rows})
+
+def _apply_chunk(start_id: int, end_id: int, now: datetime):
+    changed = _changed_in_range(start_id, end_id)
+
+    # History first: it needs the old tier, which the UPDATE overwrites
+    db.session.execute(
+        db.insert(UserTierHistory).from_select(
+            ['user_id', 'old_tier', 'new_tier', 'total_sent_at_change', 'created_at'],
+            db.select(User.id, User.tier, User.computed_tier, User.total_sent, db.literal(now))
+              .where(changed)
+        )
+    )
+    db.session.execute(
+        db.update(User).where(changed)
+                       .values(tier=User.computed_tier)
+                       .execution_options(synchronize_session=False)
+    )
+
+def retier_users(chunk_size: int = 10000, dry_run: bool = False, restart: bool = False) -> Dict:
+    """Recompute stored tiers for all users in resumable id-range chunks
+
+    Each chunk writes UserTierHistory rows for changed users only, updates
+    their tier and advances the checkpoint in one transaction, so an
+    interrupted run resumes from the last committed chunk. A dry run only
+    counts transitions and leaves the data and checkpoint untouched.
+    """
+    checkpoint = db.session.get(JobCheckpoint, CHECKPOINT_NAME)
+    if checkpoint is None:
+        checkpoint = JobCheckpoint(name=CHECKPOINT_NAME, position=0)
+    elif restart:
+        checkpoint.position = 0
+
+    start_id = 0 if dry_run else checkpoint.position
+    resumed_from = start_id
+    max_id = db.session.query(db.func.max(User.id)).scalar() or 0
+
+    transitions = Counter()
+    scanned = 0
+    started = time.perf_counter()
+    now = datetime.utcnow()
+
+    while start_id < max_id:
+        end_id = min(start_id + chunk_size, max_id)
+        chunk_transitions = _count_transitions(start_id, end_id)
+        transitions.update(chunk_transitions)
+
+        if not dry_run:
+            if chunk_transitions:
+                _apply_chunk(start_id, end_id, now)
+            checkpoint.position = end_id
+            db.session.add(checkpoint)
+            db.session.commit()
+
+        scanned += end_id - start_id
+        start_id = end_id
+
+    if not dry_run and checkpoint in db.session:
+        # Finished: the next run (e.g. after another threshold change) starts over
+        db.session.delete(checkpoint)
+        db.session.commit()
+
+    elapsed = time.perf_counter() - started
+    changed = sum(transitions.values())
+    return {
+        'dry_run': dry_run,
+        'resumed_from_id': resumed_from,
+        'id_range_scanned': scanned,
+        'changed': changed,
+        'transitions': dict(transitions),
+        'elapsed_seconds': round(elapsed, 3),
+        'ids_per_second': round(scanned / elapsed) if elapsed else None,
+        'changes_per_second': round(changed / elapsed) if elapsed else None
+    }
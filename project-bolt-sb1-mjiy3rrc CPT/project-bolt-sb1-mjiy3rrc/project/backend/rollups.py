@@ -0,0 +1,122 @@
+"""
+Incremental daily analytics rollups for Mukuru Loyalty Program
+
+New transactions and redemptions are folded into daily aggregate tables from
+id high-water marks (kept as JobCheckpoints), so reporting reads small rollup
+tables instead of scanning the OLTP tables. Rows that arrive late for an older
+day still carry a new id and are added to that day; `reprocess_days` rebuilds
+a date range from source after corrections.
+"""
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict
+
+from config import Config
+from models import (db, Transaction, TransactionArchive, Reward, Redemption, JobCheckpoint,
+                    DailyPointsRollup, DailyCategoryRedemptionRollup, DailyTierTransferRollup)
+
+TRANSACTIONS_CHECKPOINT = 'rollup_transactions'
+REDEMPTIONS_CHECKPOINT = 'rollup_redemptions'
+
+def as_date(value) -> date:
+    # SQLite's date() returns text, other backends return a date
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+def _checkpoint(name: str) -> JobCheckpoint:
+    return db.session.get(JobCheckpoint, name) or JobCheckpoint(name=name, position=0)
+
+def _settled_max_id(model) -> int:
+    """Highest id old enough that no lower id can still be uncommitted"""
+    settled_before = datetime.utcnow() - timedelta(seconds=Config.ROLLUP_SETTLE_SECONDS)
+    return db.session.query(db.func.max(model.id))\
+                     .filter(model.created_at <= settled_before)\
+                     .scalar() or 0
+
+def _add(model, keys: Dict, values: Dict):
+    """Add deltas to a rollup row, creating it if needed"""
+    updated = db.session.query(model).filter_by(**keys)\
+                        .update({getattr(model, column): getattr(model, column) + delta
+                                 for column, delta in values.items()},
+                                synchronize_session=False)
+    if not updated:
+        db.session.add(model(**keys, **values))
+        db.session.flush()
+
+def _fold_transactions(source, id_filter):
+    day = db.func.date(source.created_at)
+    points = db.session.query(
+        day,
+        db.func.sum(db.case((source.points_earned > 0, source.points_earned), else_=0)),
+        db.func.sum(db.case((db.and_(source.transaction_type == 'reward', source.points_earned < 0),
+                             -source.points_earned), else_=0)),
+        db.func.count(source.id)
+    ).filter(id_filter).group_by(day)
+    for row_day, issued, redeemed, count in points:
+        _add(DailyPointsRollup, {'day': as_date(row_day)},
+             {'points_issued': issued or 0, 'points_redeemed': redeemed or 0, 'transactions': count})
+
+    # Transfers are attributed to the tier the sender had when they were made
+    transfers = db.session.query(day, source.tier, db.func.count(source.id), db.func.sum(source.amount))\
+                          .filter(id_filter, source.transaction_type == 'send')\
+                          .group_by(day, source.tier)
+    for row_day, tier, count, amount in transfers:
+        _add(DailyTierTransferRollup, {'day': as_date(row_day), 'tier': tier},
+             {'transfers': count, 'amount': amount or 0.0})
+
+def _fold_redemptions(id_filter):
+    day = db.func.date(Redemption.created_at)
+    rows = db.session.query(day, Reward.category, db.func.count(Redemption.id), db.func.sum(Redemption.points_spent))\
+                     .join(Reward, Reward.id == Redemption.reward_id)\
+                     .filter(id_filter)\
+                     .group_by(day, Reward.category)
+    for row_day, category, count, points in rows:
+        _add(DailyCategoryRedemptionRollup, {'day': as_date(row_day), 'category': category},
+             {'redemptions': count, 'points_spent': points or 0})
+
+def refresh_rollups(chunk_size: int = 50000) -> Dict:
+    """Fold rows past the high-water marks into the rollups, one committed chunk at a time"""
+    started = time.perf_counter()
+    folded = {}
+
+    for name, model, fold in ((TRANSACTIONS_CHECKPOINT, Transaction,
+                               lambda low, high: _fold_transactions(Transaction, Transaction.id.between(low + 1, high))),
+                              (REDEMPTIONS_CHECKPOINT, Redemption,
+                               lambda low, high: _fold_redemptions(Redemption.id.between(low + 1, high)))):
+        checkpoint = _checkpoint(name)
+        start = checkpoint.position
+        target = _settled_max_id(model)
+        while checkpoint.position < target:
+            high = min(checkpoint.position + chunk_size, target)
+            fold(checkpoint.position, high)
+            # Deltas and the new high-water mark commit together: each row is counted once
+            checkpoint.position = high
+            db.session.add(checkpoint)
+            db.session.commit()
+        folded[model.__tablename__] = checkpoint.position - start
+
+    return {'id_range_folded': folded, 'elapsed_seconds': round(time.perf_counter() - started, 3)}
+
+def reprocess_days(start_day: date, end_day: date) -> Dict:
+    """Rebuild rollups for [start_day, end_day] from live and archived source rows
+
+    Only rows at or below the high-water marks are counted, so later
+    refreshes do not add them a second time.
+    """
+    start = datetime.combine(start_day, datetime.min.time())
+    end = datetime.combine(end_day + timedelta(days=1), datetime.min.time())
+
+    for model in (DailyPointsRollup, DailyCategoryRedemptionRollup, DailyTierTransferRollup):
+        db.session.query(model).filter(model.day >= start_day, model.day <= end_day)\
+                  .delete(synchronize_session=False)
+
+    transactions_hwm = _checkpoint(TRANSACTIONS_CHECKPOINT).position
+    for source in (Transaction, TransactionArchive):
+        _fold_transactions(source, db.and_(source.id <= transactions_hwm,
+                                           source.created_at >= start, source.created_at < end))
+
+    redemptions_hwm = _checkpoint(REDEMPTIONS_CHECKPOINT).position
+    _fold_redemptions(db.and_(Redemption.id <= redemptions_hwm,
+                              Redemption.created_at >= start, Redemption.created_at < end))
+    db.session.commit()
+
+    return {'start_day': start_day.isoformat(), 'end_day': end_day.isoformat()}
@@ -0,0 +1,147 @@
+"""
+Reward catalogue search for Mukuru Loyalty Program
+
+Available rewards are held in an in-memory inverted index (token -> reward
+positions) with category and price-band facets. The index is rebuilt lazily
+the first time it is searched after the catalogue changes, tracked with the
+same catalogue version/TTL state as the rewards ETag, so searches never
+query the rewards table. This works the same on SQLite and PostgreSQL,
+unlike an FTS5 virtual table.
+"""
+import bisect
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Set
+
+from cache import catalogue_state
+from config import Config
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lowercase alphanumeric tokens of a text"""
+    return TOKEN_RE.findall((text or '').lower())
+
+def band_label(lower: int, upper: Optional[int]) -> str:
+    return f'{lower}+' if upper is None else f'{lower}-{upper - 1}'
+
+class RewardSearchIndex:
+    """Immutable search structures over a snapshot of the catalogue"""
+
+    def __init__(self, rewards: List[Dict]):
+        # Positions follow the catalogue's default order (cheapest first)
+        self.rewards = sorted(rewards, key=lambda reward: (reward['pointsCost'], reward['id']))
+        self.costs = [reward['pointsCost'] for reward in self.rewards]
+        self.postings: Dict[str, Set[int]] = {}
+        self.name_postings: Dict[str, Set[int]] = {}
+        self.categories: Dict[str, Set[int]] = {}
+        for position, reward in enumerate(self.rewards):
+            for token in set(tokenize(reward['name'])):
+                self.name_postings.setdefault(token, set()).add(position)
+                self.postings.setdefault(token, set()).add(position)
+            for token in set(tokenize(reward['description'])) | set(tokenize(reward['category'])):
+                self.postings.setdefault(token, set()).add(position)
+            self.categories.setdefault(reward['category'], set()).add(position)
+        self.vocabulary = sorted(self.postings)
+        self.bounds = list(Config.REWARD_PRICE_BANDS)
+
+    def _term_matches(self, term: str, prefix: bool) -> Set[int]:
+        if not prefix:
+            return self.postings.get(term, set())
+        # The term being typed matches every token it prefixes
+        matches = set()
+        for index in range(bisect.bisect_left(self.vocabulary, term), len(self.vocabulary)):
+            token = self.vocabulary[index]
+            if not token.startswith(term):
+                break
+            matches |= self.postings[token]
+        return matches
+
+    def _text_matches(self, query: str) -> Optional[Set[int]]:
+        terms = tokenize(query)
+        if not terms:
+            return None
+        prefix = query[-1:].isalnum()  # still typing the last word
+        matches = None
+        for number, term in enumerate(terms):
+            found = self._term_matches(term, prefix and number == len(terms) - 1)
+            matches = found if matches is None else matches & found
+            if not matches:
+                return set()
+        return matches
+
+    def _band(self, cost: int) -> str:
+        index = max(bisect.bisect_right(self.bounds, cost) - 1, 0)
+        upper = self.bounds[index + 1] if index + 1 < len(self.bounds) else None
+        return band_label(self.bounds[index], upper)
+
+    def search(self, query: str = None, category: str = None, min_points: int = None,
+               max_points: int = None, page: int = 1, per_page: int = 20) -> Dict:
+        """Filter, facet and page the catalogue
+
+        Category counts ignore the category filter and price-band counts
+        ignore the points filters, so each facet shows what selecting another
+        value would return.
+        """
+        matched = self._text_matches(query or '')
+        candidates = set(range(len(self.rewards))) if matched is None else matched
+
+        low = bisect.bisect_left(self.costs, min_points) if min_points is not None else 0
+        high = bisect.bisect_right(self.costs, max_points) if max_points is not None else len(self.costs)
+        in_price = {position for position in candidates if low <= position < high}
+        in_category = candidates & self.categories.get(category, set()) \
+            if category and category != 'All' else candidates
+
+        results = sorted(in_price & in_category)
+        if matched is not None:
+            # Name matches first, cheapest first within each group
+            name_hits = set()
+            for term in tokenize(query):
+                name_hits |= self.name_postings.get(term, set())
+            results.sort(key=lambda position: position not in name_hits)
+
+        page = max(page, 1)
+        start = (page - 1) * per_page
+        return {
+            'rewards': [self.rewards[position] for position in results[start:start + per_page]],
+            'total': len(results),
+            'page': page,
+            'pages': (len(results) + per_page - 1) // per_page,
+            'facets': {
+                'categories': dict(Counter(self.rewards[position]['category'] for position in in_price)),
+                'price_bands': dict(Counter(self._band(self.costs[position]) for position in in_category))
+            }
+        }
+
+class RewardSearch:
+    """Holds the index for the current catalogue state, rebuilding it on change"""
+
+    def __init__(self):
+        self._state = None
+        self._index = None
+        self._lock = threading.Lock()
+
+    def index(self) -> RewardSearchIndex:
+        state = catalogue_state()
+        if self._state == state:
+            return self._index
+        with self._lock:
+            if self._state != state:
+                self._index = RewardSearchIndex(_load_rewards())
+                self._state = state
+            return self._index
+
+    def invalidate(self):
+        """Force a rebuild before the next search"""
+        self._state = None
+
+def _load_rewards() -> List[Dict]:
+    from models import db, Reward, Redemption
+
+    counts = dict(db.session.query(Redemption.reward_id, db.func.count(Redemption.id))
+                            .group_by(Redemption.reward_id))
+    rewards = Reward.query.filter_by(is_available=True).all()
+    return [reward.to_dict(counts.get(reward.id, 0)) for reward in rewards]
+
+reward_search = RewardSearch()
@@ -1,9 +1,146 @@
 """
 Business logic services for Mukuru Loyalty Program
 """
+import math
 from datetime import datetime, timedelta
-from models import db, User, Transaction, Reward, Redemption, UserTierHistory
-from typing import Dict, List, Optional, Tuple
+from models import (db, User, Transaction, TransactionArchive, Reward, Redemption, UserTierHistory, PointsLot, Campaign,
+                    FrequentRecipient, TIERS,
+                    DailyPointsRollup, DailyCategoryRedemptionRollup, DailyTierTransferRollup)
+from archive import archive_boundary
+from cache import user_versions, profile_cache, dashboard_cache
+from events import event_broker, user_delta_event
+from velocity import velocity_tracker, recipient_key
+from campaigns import campaign_engine
+from fx import fx_rates
+from phones import phone_digits
+from search import reward_search
+from timeseries import get_activity_series, record_transaction_activity
+from config import Config
+from typing import Dict, Iterator, List, Optional, Tuple
+from sqlalchemy.exc import IntegrityError
+
+# Queries and response shapes shared with the async read tier (async_services.py)
+
+def history_statements(user_id: int, boundary: Optional[datetime], transaction_type: str = None,
+                       start_date: datetime = None, end_date: datetime = None) -> List:
+    """Select a user's history newest first: live rows, then archived ones if the range starts before `boundary`"""
+    models = [Transaction]
+    if boundary and (start_date is None or start_date < boundary):
+        models.append(TransactionArchive)
+    
+    statements = []
+    for model in models:
+        statement = db.select(model).where(model.user_id == user_id)
+        if transaction_type:
+            statement = statement.where(model.transaction_type == transaction_type)
+        if start_date:
+            statement = statement.where(model.created_at >= start_date)
+        if end_date:
+            statement = statement.where(model.created_at < end_date)
+        statements.append(statement.order_by(model.created_at.desc(), model.id.desc()))
+    return statements
+
+def count_statement(statement):
+    """Count the rows a history statement selects"""
+    return statement.with_only_columns(db.func.count(), maintain_column_froms=True).order_by(None)
+
+def page_window(offset: int, per_page: int, fetched: int, total: int, count: int) -> Optional[Tuple[int, int]]:
+    """Offset and limit to read from the next history statement, or None to skip it
+
+    Archived rows are all older than live ones, so pages continue from the
+    live table straight into the archive. `fetched` rows of the page and
+    `total` rows of earlier statements have been seen; this one has `count`.
+    """
+    if fetched < per_page and offset < total + count:
+        return max(offset - total, 0), per_page - fetched
+    return None
+
+def available_rewards_statement(category: str = None):
+    """Select available rewards, cheapest first, optionally in one category"""
+    statement = db.select(Reward).where(Reward.is_available.is_(True))
+    if category and category != 'All':
+        statement = statement.where(Reward.category == category)
+    return statement.order_by(Reward.points_cost.asc())
+
+def redemption_counts_statement(reward_ids: List[int]):
+    """Select (reward_id, redemption count) for the given rewards"""
+    return db.select(Redemption.reward_id, db.func.count(Redemption.id))\
+             .where(Redemption.reward_id.in_(reward_ids))\
+             .group_by(Redemption.reward_id)
+
+def redeemed_reward_ids_statement(user_id: int):
+    """Select the reward id of each of a user's redemptions"""
+    return db.select(Redemption.reward_id).where(Redemption.user_id == user_id)
+
+def leaderboard_statement(limit: int):
+    """Select the top active users by points"""
+    return db.select(User).where(User.is_active.is_(True)).order_by(User.points.desc()).limit(limit)
+
+def rewards_payload(rewards: List[Reward], counts: Dict[int, int]) -> List[Dict]:
+    """Shape catalogue entries from rewards and their redemption counts"""
+    return [reward.to_dict(counts.get(reward.id, 0)) for reward in rewards]
+
+
+def profile_payload(user: User, transactions: List, redeemed_reward_ids: List[int]) -> Dict:
+    """Shape a profile response"""
+    return {
+        'user': user.to_dict(),
+        'transactions': [t.to_dict() for t in transactions],
+        'rewardsPurchased': redeemed_reward_ids
+    }
+
+def transactions_page(items: List, total: int, page: int, per_page: int) -> Dict:
+    """Shape one page of transaction history"""
+    pages = (total + per_page - 1) // per_page if per_page else 0
+    return {
+        'transactions': [t.to_dict() for t in items],
+        'total': total,
+        'pages': pages,
+        'current_page': page,
+        'has_next': page < pages,
+        'has_prev': page > 1
+    }
+
+def leaderboard_rows(users: List[User]) -> List[Dict]:
+    """Shape ranked leaderboard entries"""
+    return [{'rank': i, 'name': user.name, 'points': user.points, 'tier': user.tier}
+            for i, user in enumerate(users, 1)]
+
+def _locked(model, row_id: int):
+    """Load a row for update, re-reading it even if the session already holds it
+
+    Points and balances are written back as absolute values, so the row must
+    be locked before they are read; otherwise a concurrent write (e.g. point
+    expiry's bulk UPDATE) committed in between would be overwritten.
+    """
+    return db.session.get(model, row_id, with_for_update=True, populate_existing=True)
+
+def _add_points_lot(user_id: int, points: int, transaction: Transaction):
+    """Track newly earned points as a lot so they can expire on their own schedule"""
+    if points > 0:
+        db.session.add(PointsLot(user_id=user_id, points_earned=points,
+                                 source_reference=transaction.reference))
+
+def _consume_points_lots(user_id: int, points: int):
+    """Spend points from the oldest open lots first
+
+    Points earned before lots were tracked have no lot; they never expire and
+    cover whatever the lots cannot.
+    """
+    lots = PointsLot.query.filter(PointsLot.user_id == user_id, PointsLot.points_remaining > 0)\
+                          .order_by(PointsLot.earned_at, PointsLot.id)\
+                          .with_for_update()
+    for lot in lots:
+        if points <= 0:
+            break
+        taken = min(lot.points_remaining, points)
+        lot.points_remaining -= taken
+        points -= taken
+
+def _user_changed(user: User, transaction: Transaction = None):
+    """Invalidate cached views of a user and push a delta to live subscribers"""
+    user_versions.bump(user.id)
+    event_broker.publish(user.id, user_delta_event(user, transaction))
 
 class UserService:
     """Service class for user-related operations"""
@@ -21,17 +158,49 @@ class UserService:
         db.session.commit()
         return user
     
+    @staticmethod
+    def replace_password_hash(user_id: int, old_hash: str, new_hash: str) -> bool:
+        """Store a re-hashed password, unless the password was changed in the meantime"""
+        updated = User.query.filter_by(id=user_id, password_hash=old_hash)\
+                            .update({User.password_hash: new_hash}, synchronize_session=False)
+        db.session.commit()
+        return bool(updated)
+    
+    @staticmethod
+    def get_user_profile_data(user_id: int, state=None) -> Dict:
+        """Get user profile with recent transactions, served from the per-user cache
+
+        Pass the user's `profile_state` to skip entries built before another worker's write.
+        """
+        return profile_cache.get_or_build(user_id, UserService._build_profile_data, state)
+    
+    @staticmethod
+    def _build_profile_data(user_id: int) -> Dict:
+        user = User.query.get(user_id)
+        if not user:
+            return None
+        
+        # Get recent transactions
+        transactions = TransactionService.get_recent_transactions(user_id, 10)
+        
+        # Get redeemed rewards
+        redeemed_reward_ids = list(db.session.scalars(redeemed_reward_ids_statement(user_id)))
+        
+        return profile_payload(user, transactions, redeemed_reward_ids)
+    
     @staticmethod
     def get_user_dashboard_data(user_id: int) -> Dict:
-        """Get comprehensive dashboard data for user"""
+        """Get comprehensive dashboard data for user, served from the per-user cache"""
+        return dashboard_cache.get_or_build(user_id, UserService._build_dashboard_data)
+    
+    @staticmethod
+    def _build_dashboard_data(user_id: int) -> Dict:
         user = User.query.get(user_id)
         if not user:
             return None
         
         # Get recent transactions
-        recent_transactions = Transaction.query.filter_by(user_id=user_id)\
-                                             .order_by(Transaction.created_at.desc())\
-                                             .limit(5).all()
+        recent_transactions = TransactionService.get_recent_transactions(user_id, 5)
         
         # Get monthly points
         current_month = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
@@ -46,6 +215,11 @@ class UserService:
                                 .filter(Transaction.user_id == user_id,
                                        Transaction.points_earned > 0)\
                                 .scalar() or 0
+        if archive_boundary():
+            total_earned += db.session.query(db.func.sum(TransactionArchive.points_earned))\
+                                      .filter(TransactionArchive.user_id == user_id,
+                                              TransactionArchive.points_earned > 0)\
+                                      .scalar() or 0
         
         return {
             'user': user.to_dict(),
@@ -59,12 +233,34 @@ class TransactionService:
     """Service class for transaction-related operations"""
     
     @staticmethod
-    def send_money(user_id: int, amount: float, recipient: str, recipient_phone: str = None) -> Tuple[bool, str, Optional[Transaction]]:
-        """Process money transfer and award points"""
-        user = User.query.get(user_id)
+    def calculate_transfer_points(user: User, amount: float, recipient_phone: str = None) -> int:
+        """Base points scaled by the user's tier multiplier and any matching campaigns"""
+        tier_multiplier = LoyaltyService.calculate_tier_benefits(user.tier)['point_multiplier']
+        campaign = campaign_engine.match(user.tier, amount, recipient_phone)
+        # Rounded before flooring so 1.2 * 5 doesn't land on 5.999...
+        points = math.floor(round(user.calculate_points(amount) * tier_multiplier * campaign.multiplier, 6))
+        return points + campaign.bonus_points
+    
+    @staticmethod
+    def send_money(user_id: int, amount: float, recipient: str, recipient_phone: str = None,
+                   currency: str = None) -> Tuple[bool, str, Optional[Transaction]]:
+        """Process money transfer and award points
+
+        `amount` is in `currency` (default Config.BASE_CURRENCY); balances,
+        points, tiers and limits use its base currency value.
+        """
+        # Any stale rate or campaign reload happens before the sender's row is locked
+        rates = fx_rates.snapshot()
+        campaign_engine.index()
+        user = _locked(User, user_id)
         if not user:
             return False, "User not found", None
         
+        converted = rates.convert(amount, currency)
+        if converted is None:
+            return False, "Unsupported currency", None
+        source_amount, amount = amount, converted[0]
+        
         # Validate transaction
         if not user.can_send(amount):
             return False, "Insufficient balance or invalid amount", None
@@ -72,9 +268,15 @@ class TransactionService:
         if not recipient:
             return False, "Recipient name is required", None
         
+        recipient_id = recipient_key(recipient, recipient_phone)
+        if Config.VELOCITY_ENABLED:
+            reason = velocity_tracker.check(user_id, recipient_id, amount)
+            if reason:
+                return False, reason, None
+        
         # Calculate points
-        points_earned = user.calculate_points(amount)
         old_tier = user.tier
+        points_earned = TransactionService.calculate_transfer_points(user, amount, recipient_phone)
         
         # Create transaction
         transaction = Transaction(
@@ -84,6 +286,11 @@ class TransactionService:
             points_earned=points_earned,
             recipient=recipient,
             recipient_phone=recipient_phone,
+            currency=(currency or Config.BASE_CURRENCY).upper(),
+            source_amount=source_amount,
+            fx_rate=converted[1],
+            fx_version=rates.version,
+            tier=old_tier,
             status='completed',
             description=f"Money sent to {recipient}"
         )
@@ -106,29 +313,101 @@ class TransactionService:
         
         transaction.complete_transaction()
         db.session.add(transaction)
+        _add_points_lot(user_id, points_earned, transaction)
+        RecipientService.record_transfer(user_id, recipient_id, recipient, recipient_phone,
+                                         amount, transaction.completed_at)
+        record_transaction_activity(transaction)
         db.session.commit()
+        if Config.VELOCITY_ENABLED:
+            velocity_tracker.record(user_id, recipient_id, amount)
+        _user_changed(user, transaction)
         
         return True, "Transaction completed successfully", transaction
     
     @staticmethod
-    def get_user_transactions(user_id: int, page: int = 1, per_page: int = 20, transaction_type: str = None) -> Dict:
-        """Get paginated user transactions"""
-        query = Transaction.query.filter_by(user_id=user_id)
-        
-        if transaction_type:
-            query = query.filter_by(transaction_type=transaction_type)
-        
-        transactions = query.order_by(Transaction.created_at.desc())\
-                           .paginate(page=page, per_page=per_page, error_out=False)
-        
-        return {
-            'transactions': [t.to_dict() for t in transactions.items],
-            'total': transactions.total,
-            'pages': transactions.pages,
-            'current_page': page,
-            'has_next': transactions.has_next,
-            'has_prev': transactions.has_prev
+    def _history_queries(user_id: int, transaction_type: str = None,
+                         start_date: datetime = None, end_date: datetime = None) -> List:
+        """Build live and (when the range reaches it) archive statements for a user's history"""
+        return history_statements(user_id, archive_boundary(), transaction_type, start_date, end_date)
+    
+    @staticmethod
+    def get_recent_transactions(user_id: int, limit: int) -> List:
+        """Get a user's newest transactions, reaching into the archive only if live rows run out"""
+        transactions = []
+        for statement in TransactionService._history_queries(user_id):
+            if len(transactions) >= limit:
+                break
+            transactions += db.session.scalars(statement.limit(limit - len(transactions)))
+        return transactions
+    
+    @staticmethod
+    def get_user_transactions(user_id: int, page: int = 1, per_page: int = 20, transaction_type: str = None,
+                              start_date: datetime = None, end_date: datetime = None) -> Dict:
+        """Get paginated user transactions across live and archived months"""
+        offset = max(page - 1, 0) * per_page
+        items = []
+        total = 0
+        for statement in TransactionService._history_queries(user_id, transaction_type, start_date, end_date):
+            count = db.session.scalar(count_statement(statement))
+            window = page_window(offset, per_page, len(items), total, count)
+            if window:
+                items += db.session.scalars(statement.offset(window[0]).limit(window[1]))
+            total += count
+        
+        return transactions_page(items, total, page, per_page)
+    
+    @staticmethod
+    def export_user_transactions(user_id: int, start_date: datetime = None, end_date: datetime = None,
+                                 chunk_size: int = 1000) -> Iterator[Dict]:
+        """Stream a user's transactions, newest first, across live and archived months"""
+        for statement in TransactionService._history_queries(user_id, None, start_date, end_date):
+            for transaction in db.session.scalars(statement.execution_options(yield_per=chunk_size)):
+                yield transaction.to_dict()
+
+class RecipientService:
+    """Service class for the per-user frequent recipient index"""
+    
+    @staticmethod
+    def record_transfer(user_id: int, key: str, name: str, phone: Optional[str], amount: float, sent_at: datetime):
+        """Fold a transfer into the sender's recipient index (committed with the transfer)"""
+        changes = {
+            FrequentRecipient.transfer_count: FrequentRecipient.transfer_count + 1,
+            FrequentRecipient.total_sent: FrequentRecipient.total_sent + amount,
+            FrequentRecipient.last_sent_at: sent_at,
+            FrequentRecipient.name: name,
+            FrequentRecipient.name_lower: name.lower()
         }
+        if phone:
+            changes.update({FrequentRecipient.phone: phone, FrequentRecipient.phone_digits: phone_digits(phone) or None})
+        existing = FrequentRecipient.query.filter_by(user_id=user_id, recipient_key=key)
+        if existing.update(changes, synchronize_session=False):
+            return
+        try:
+            with db.session.begin_nested():
+                db.session.add(FrequentRecipient(user_id=user_id, recipient_key=key, name=name,
+                                                 name_lower=name.lower(), phone=phone,
+                                                 phone_digits=phone_digits(phone) or None,
+                                                 transfer_count=1, total_sent=amount, last_sent_at=sent_at))
+        except IntegrityError:
+            # A concurrent first transfer to this recipient created the row
+            existing.update(changes, synchronize_session=False)
+    
+    @staticmethod
+    def suggest(user_id: int, prefix: str, limit: int = 5) -> List[Dict]:
+        """Get the user's most frequent recipients whose name or phone starts with `prefix`"""
+        query = FrequentRecipient.query.filter(FrequentRecipient.user_id == user_id)
+        prefix = (prefix or '').strip()
+        digits = phone_digits(prefix)
+        if digits and not any(ch.isalpha() for ch in prefix):
+            query = query.filter(FrequentRecipient.phone_digits.like(digits + '%'))
+        elif prefix:
+            escaped = prefix.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            query = query.filter(FrequentRecipient.name_lower.like(escaped + '%', escape='\\'))
+        recipients = query.order_by(FrequentRecipient.transfer_count.desc(),
+                                    FrequentRecipient.last_sent_at.desc())\
+                          .limit(limit)\
+                          .all()
+        return [recipient.to_dict() for recipient in recipients]
 
 class RewardService:
     """Service class for reward-related operations"""
@@ -136,13 +415,15 @@ class RewardService:
     @staticmethod
     def get_available_rewards(category: str = None) -> List[Dict]:
         """Get all available rewards, optionally filtered by category"""
-        query = Reward.query.filter_by(is_available=True)
-        
-        if category and category != 'All':
-            query = query.filter_by(category=category)
-        
-        rewards = query.order_by(Reward.points_cost.asc()).all()
-        return [reward.to_dict() for reward in rewards]
+        rewards = list(db.session.scalars(available_rewards_statement(category)))
+        counts = dict(db.session.execute(redemption_counts_statement([reward.id for reward in rewards])).all())
+        return rewards_payload(rewards, counts)
+    
+    @staticmethod
+    def search_rewards(query: str = None, category: str = None, min_points: int = None,
+                       max_points: int = None, page: int = 1, per_page: int = 20) -> Dict:
+        """Search available rewards by text, category and points cost, with facet counts"""
+        return reward_search.index().search(query, category, min_points, max_points, page, per_page)
     
     @staticmethod
     def get_reward_categories() -> List[str]:
@@ -155,8 +436,8 @@ class RewardService:
     @staticmethod
     def redeem_reward(user_id: int, reward_id: int) -> Tuple[bool, str, Optional[Redemption]]:
         """Redeem a reward using user points"""
-        user = User.query.get(user_id)
-        reward = Reward.query.get(reward_id)
+        user = _locked(User, user_id)
+        reward = _locked(Reward, reward_id)
         
         if not user:
             return False, "User not found", None
@@ -192,17 +473,21 @@ class RewardService:
         
         # Update user points
         user.points -= reward.points_cost
+        _consume_points_lots(user_id, reward.points_cost)
         
-        # Update stock if limited
+        # Update stock if limited; the new updated_at moves the catalogue ETag
         if reward.stock_quantity > 0:
             reward.stock_quantity -= 1
+            reward.updated_at = datetime.utcnow()
         
         redemption.complete_redemption()
         transaction.complete_transaction()
         
         db.session.add(redemption)
         db.session.add(transaction)
+        record_transaction_activity(transaction)
         db.session.commit()
+        _user_changed(user, transaction)
         
         return True, "Reward redeemed successfully", redemption
     
@@ -254,7 +539,7 @@ class LoyaltyService:
     @staticmethod
     def award_bonus_points(user_id: int, points: int, reason: str) -> Transaction:
         """Award bonus points to user"""
-        user = User.query.get(user_id)
+        user = _locked(User, user_id)
         if not user:
             return None
         
@@ -271,25 +556,126 @@ class LoyaltyService:
         transaction.complete_transaction()
         
         db.session.add(transaction)
+        _add_points_lot(user_id, points, transaction)
+        record_transaction_activity(transaction)
         db.session.commit()
+        _user_changed(user, transaction)
         
         return transaction
     
     @staticmethod
     def get_leaderboard(limit: int = 10) -> List[Dict]:
         """Get top users by points for leaderboard"""
-        users = User.query.filter_by(is_active=True)\
-                         .order_by(User.points.desc())\
-                         .limit(limit)\
+        return leaderboard_rows(list(db.session.scalars(leaderboard_statement(limit))))
+    
+    @staticmethod
+    def get_tier_counts() -> Dict[str, int]:
+        """Count active users per tier"""
+        counts = dict.fromkeys(TIERS, 0)
+        rows = db.session.query(User.tier, db.func.count(User.id))\
+                         .filter(User.is_active.is_(True))\
+                         .group_by(User.tier)\
                          .all()
+        counts.update(rows)
+        return counts
+    
+    @staticmethod
+    def get_users_by_tier(tier: str, page: int = 1, per_page: int = 50) -> Dict:
+        """Get paginated active users in a tier"""
+        users = User.query.filter_by(tier=tier, is_active=True)\
+                          .order_by(User.total_sent.desc())\
+                          .paginate(page=page, per_page=per_page, error_out=False)
         
-        leaderboard = []
-        for i, user in enumerate(users, 1):
-            leaderboard.append({
-                'rank': i,
-                'name': user.name,
-                'points': user.points,
-                'tier': user.tier
-            })
-        
-        return leaderboard
\ No newline at end of file
+        return {
+            'users': [user.to_dict() for user in users.items],
+            'total': users.total,
+            'pages': users.pages,
+            'current_page': page
+        }
+
+class CampaignService:
+    """Service class for bonus points campaigns"""
+    
+    @staticmethod
+    def create_campaign(name: str, starts_at: datetime, ends_at: datetime, multiplier: float = 1.0,
+                        bonus_points: int = 0, tiers: List[str] = None, recipient_prefix: str = None,
+                        min_amount: float = None, max_amount: float = None) -> Campaign:
+        """Create a campaign and make it live in this worker immediately"""
+        campaign = Campaign(
+            name=name,
+            starts_at=starts_at,
+            ends_at=ends_at,
+            multiplier=multiplier,
+            bonus_points=bonus_points,
+            tiers=','.join(tiers) if tiers else None,
+            recipient_prefix=recipient_prefix,
+            min_amount=min_amount,
+            max_amount=max_amount
+        )
+        db.session.add(campaign)
+        db.session.commit()
+        campaign_engine.reload()
+        return campaign
+    
+    @staticmethod
+    def deactivate_campaign(campaign_id: int) -> bool:
+        """Stop a campaign before its end date"""
+        campaign = db.session.get(Campaign, campaign_id)
+        if not campaign:
+            return False
+        campaign.is_active = False
+        db.session.commit()
+        campaign_engine.reload()
+        return True
+    
+    @staticmethod
+    def get_active_campaigns() -> List[Dict]:
+        """Get campaigns that are running or scheduled"""
+        campaigns = Campaign.query.filter(Campaign.is_active.is_(True),
+                                          Campaign.ends_at > datetime.utcnow())\
+                                  .order_by(Campaign.starts_at)\
+                                  .all()
+        return [campaign.to_dict() for campaign in campaigns]
+
+class AnalyticsService:
+    """Service class for loyalty reporting, served only from the daily rollup and activity tables"""
+    
+    @staticmethod
+    def get_points_by_day(start_day, end_day) -> List[Dict]:
+        """Get points issued versus redeemed per day"""
+        rows = DailyPointsRollup.query.filter(DailyPointsRollup.day.between(start_day, end_day))\
+                                      .order_by(DailyPointsRollup.day)\
+                                      .all()
+        return [row.to_dict() for row in rows]
+    
+    @staticmethod
+    def get_redemptions_by_category(start_day, end_day) -> List[Dict]:
+        """Get redemption totals per reward category over a date range"""
+        rows = db.session.query(DailyCategoryRedemptionRollup.category,
+                                db.func.sum(DailyCategoryRedemptionRollup.redemptions),
+                                db.func.sum(DailyCategoryRedemptionRollup.points_spent))\
+                         .filter(DailyCategoryRedemptionRollup.day.between(start_day, end_day))\
+                         .group_by(DailyCategoryRedemptionRollup.category)\
+                         .order_by(db.func.sum(DailyCategoryRedemptionRollup.redemptions).desc())\
+                         .all()
+        return [{'category': category, 'redemptions': count, 'points_spent': points}
+                for category, count, points in rows]
+    
+    @staticmethod
+    def get_transfers_by_tier(start_day, end_day) -> List[Dict]:
+        """Get transfer counts and amounts per tier over a date range"""
+        rows = db.session.query(DailyTierTransferRollup.tier,
+                                db.func.sum(DailyTierTransferRollup.transfers),
+                                db.func.sum(DailyTierTransferRollup.amount))\
+                         .filter(DailyTierTransferRollup.day.between(start_day, end_day))\
+                         .group_by(DailyTierTransferRollup.tier)\
+                         .all()
+        totals = {tier: {'tier': tier, 'transfers': 0, 'amount': 0.0} for tier in TIERS}
+        for tier, count, amount in rows:
+            totals[tier] = {'tier': tier, 'transfers': count, 'amount': amount}
+        return list(totals.values())
+    
+    @staticmethod
+    def get_user_activity(user_id: int, start_day, end_day, bucket: str = None) -> Dict:
+        """Get a user's points and spend per day, week or month, served from daily activity rows"""
+        return get_activity_series(user_id, start_day, end_day, bucket)
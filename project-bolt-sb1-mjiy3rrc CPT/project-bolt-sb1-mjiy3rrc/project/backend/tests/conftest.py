@@ -0,0 +1,69 @@
+"""
+Shared pytest configuration
+"""
+import os
+import sys
+
+import pytest
+
+# Bind the app to an in-memory database before it is imported by any test module
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import user_versions, profile_cache, dashboard_cache
+from ratelimit import limiter, LocalBucketStore
+from idempotency import idempotency_cache
+from velocity import velocity_tracker
+from campaigns import campaign_engine
+from fx import fx_rates
+from search import reward_search
+from auth import identity_cache
+from app import app, db
+from models import User
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'user(**fields): override sample_user fields, e.g. the balance')
+
+@pytest.fixture
+def client():
+    """Create test client"""
+    app.config['TESTING'] = True
+    
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            yield client
+            db.drop_all()
+
+@pytest.fixture
+def make_user(client):
+    """Factory for committed users; fields default to the sample user's"""
+    def make(**fields):
+        fields = {'name': 'Test User', 'email': 'test@example.com', 'balance': 5000.0, 'points': 100, **fields}
+        user = User(**fields)
+        db.session.add(user)
+        db.session.commit()
+        return user
+    return make
+
+@pytest.fixture
+def sample_user(request, make_user):
+    """Create a sample user, with fields from the closest @pytest.mark.user(...)"""
+    marker = request.node.get_closest_marker('user')
+    return make_user(**(marker.kwargs if marker else {}))
+
+@pytest.fixture(autouse=True)
+def reset_caches():
+    """Start every test with empty in-process caches"""
+    user_versions.clear()
+    profile_cache.clear()
+    dashboard_cache.clear()
+    limiter.store = LocalBucketStore()
+    idempotency_cache.clear()
+    velocity_tracker.store.clear()
+    velocity_tracker.warm = True  # warm start runs on a background thread; tests call it directly
+    campaign_engine.invalidate()
+    fx_rates.invalidate()
+    reward_search.invalidate()
+    identity_cache.clear()
+    yield
@@ -0,0 +1,94 @@
+"""
+Unit tests for transaction archiving
+"""
+from datetime import datetime
+import pytest
+from app import db
+from models import User, Transaction, TransactionArchive
+from archive import archive_transactions, archive_boundary, default_cutoff
+from services import TransactionService, UserService
+
+@pytest.fixture
+def history(client):
+    """Create a user with one transaction per month from Jan to Jun 2024"""
+    user = User(name='Test User', email='test@example.com')
+    db.session.add(user)
+    db.session.commit()
+    for month in range(1, 7):
+        db.session.add(Transaction(user_id=user.id, transaction_type='send', amount=100 * month,
+                                   points_earned=month, status='completed',
+                                   created_at=datetime(2024, month, 15)))
+    db.session.commit()
+    return user
+
+class TestArchiveJob:
+    """Test moving closed months into the archive"""
+    
+    def test_moves_months_before_boundary(self, history):
+        """Test rows before the boundary move, keeping their ids"""
+        live_ids = sorted(t.id for t in Transaction.query.all())
+        
+        report = archive_transactions(datetime(2024, 4, 1), chunk_size=2)
+        
+        assert report['moved'] == 3
+        assert report['chunks'] == 2
+        assert Transaction.query.count() == 3
+        assert sorted(t.id for t in TransactionArchive.query.all()) == live_ids[:3]
+        assert archive_boundary() == datetime(2024, 4, 1)
+    
+    def test_dry_run_and_boundary_never_moves_back(self, history):
+        """Test dry runs move nothing and older boundaries are ignored"""
+        assert archive_transactions(datetime(2024, 4, 1), dry_run=True)['to_move'] == 3
+        assert TransactionArchive.query.count() == 0
+        
+        archive_transactions(datetime(2024, 4, 1))
+        report = archive_transactions(datetime(2024, 2, 1))
+        
+        assert report['boundary'] == '2024-04-01T00:00:00'
+        assert report['moved'] == 0
+    
+    def test_default_cutoff(self):
+        """Test the default cutoff keeps whole months live"""
+        assert default_cutoff(datetime(2025, 3, 10)) == datetime(2024, 3, 1)
+
+class TestArchiveReads:
+    """Test history reads span live and archived data"""
+    
+    def test_pagination_spans_archive(self, history):
+        """Test pages continue from live rows into archived rows"""
+        archive_transactions(datetime(2024, 4, 1))
+        
+        result = TransactionService.get_user_transactions(history.id, page=2, per_page=4)
+        
+        assert result['total'] == 6
+        assert result['pages'] == 2
+        assert [t['amount'] for t in result['transactions']] == [200, 100]
+    
+    def test_recent_range_skips_archive(self, history):
+        """Test ranges after the boundary never query the archive"""
+        archive_transactions(datetime(2024, 4, 1))
+        queries = TransactionService._history_queries(history.id, start_date=datetime(2024, 5, 1))
+        
+        assert len(queries) == 1
+        result = TransactionService.get_user_transactions(history.id, start_date=datetime(2024, 5, 1))
+        assert [t['amount'] for t in result['transactions']] == [600, 500]
+    
+    def test_export_and_dashboard_include_archive(self, history):
+        """Test export streams both tables and dashboard totals include archived points"""
+        archive_transactions(datetime(2024, 4, 1))
+        
+        exported = list(TransactionService.export_user_transactions(history.id))
+        
+        assert [t['amount'] for t in exported] == [600, 500, 400, 300, 200, 100]
+        assert UserService.get_user_dashboard_data(history.id)['total_earned'] == 21
+    
+    def test_export_endpoint(self, client, history):
+        """Test CSV export endpoint"""
+        archive_transactions(datetime(2024, 4, 1))
+        with client.session_transaction() as sess:
+            sess['user_id'] = history.id
+        
+        lines = client.get('/api/transactions/export').get_data(as_text=True).strip().splitlines()
+        
+        assert lines[0].startswith('id,date,type')
+        assert len(lines) == 7
@@ -0,0 +1,111 @@
+"""
+Unit tests for the ASGI read tier
+"""
+import asyncio
+import threading
+from datetime import datetime
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from starlette.testclient import TestClient
+from app import app as flask_app
+from models import db, User, Transaction, Reward
+from asgi import create_application
+from events import AsyncSubscription, event_broker
+from auth import Identity, issue_access_token
+
+@pytest.fixture
+def seeded(tmp_path):
+    """A file database with one user, two transactions and a reward, plus its async URL"""
+    path = tmp_path / 'asgi.db'
+    engine = create_engine(f'sqlite:///{path}')
+    db.metadata.create_all(engine)
+    with Session(engine) as session:
+        user = User(name='Test User', email='test@example.com', points=120)
+        session.add(user)
+        session.flush()
+        for day in (1, 2):
+            session.add(Transaction(user_id=user.id, transaction_type='send', amount=100.0 * day,
+                                    points_earned=day, status='completed', created_at=datetime(2024, 6, day)))
+        session.add(Reward(name='Airtime Voucher', points_cost=200, category='Airtime'))
+        session.commit()
+        user_id = user.id
+    engine.dispose()
+    return f'sqlite+aiosqlite:///{path}', user_id
+
+@pytest.fixture
+def client(seeded):
+    """ASGI test client logged in as the seeded user"""
+    url, user_id = seeded
+    with TestClient(create_application(url)) as client:
+        cookie = flask_app.session_interface.get_signing_serializer(flask_app).dumps({'user_id': user_id})
+        client.cookies.set(flask_app.config['SESSION_COOKIE_NAME'], cookie)
+        yield client
+
+class TestAsgiReads:
+    """Test async endpoints return the sync tier's payloads"""
+    
+    def test_profile_with_etag(self, client):
+        """Test the profile is served and revalidated"""
+        response = client.get('/api/user/profile')
+        
+        assert response.status_code == 200
+        body = response.json()
+        assert body['user']['points'] == 120
+        assert [t['amount'] for t in body['transactions']] == [200.0, 100.0]
+        
+        revalidated = client.get('/api/user/profile', headers={'If-None-Match': response.headers['ETag']})
+        assert revalidated.status_code == 304
+    
+    def test_requires_flask_session(self, client):
+        """Test a missing or forged session cookie is rejected"""
+        client.cookies.set(flask_app.config['SESSION_COOKIE_NAME'], 'forged')
+        
+        assert client.get('/api/transactions').status_code == 401
+    
+    def test_transactions_rewards_and_leaderboard(self, client):
+        """Test the remaining async read endpoints"""
+        page = client.get('/api/transactions?per_page=1&page=2').json()
+        assert (page['total'], page['pages'], page['transactions'][0]['amount']) == (2, 2, 100.0)
+        
+        rewards = client.get('/api/rewards').json()
+        assert rewards[0]['name'] == 'Airtime Voucher' and rewards[0]['redemptionCount'] == 0
+        
+        assert client.get('/api/leaderboard').json() == [
+            {'rank': 1, 'name': 'Test User', 'points': 120, 'tier': 'Bronze'}]
+    
+    def test_bearer_token(self, client, seeded):
+        """Test access tokens work, and only at the user's current token version"""
+        client.cookies.clear()
+        with flask_app.app_context():
+            current = issue_access_token(Identity(seeded[1], 'Bronze', True, 0))
+            revoked = issue_access_token(Identity(seeded[1], 'Bronze', True, -1))
+        
+        assert client.get('/api/transactions', headers={'Authorization': 'Bearer ' + current}).status_code == 200
+        assert client.get('/api/transactions', headers={'Authorization': 'Bearer ' + revoked}).status_code == 401
+        assert client.get('/api/transactions', headers={'Authorization': 'Bearer junk'}).status_code == 401
+    
+    def test_other_routes_fall_through_to_flask(self, client):
+        """Test routes without an async handler are served by the Flask app"""
+        client.cookies.clear()
+        response = client.get('/api/recipients/suggest?q=jo')
+        
+        assert response.status_code == 401
+        assert response.json() == {'error': 'Not authenticated'}
+
+class TestAsyncSubscription:
+    """Test event delivery into an event loop"""
+    
+    def test_event_published_from_thread_wakes_loop(self):
+        """Test a publish from a worker thread reaches an awaiting subscription"""
+        async def scenario():
+            subscription = event_broker.subscribe(42, AsyncSubscription)
+            try:
+                threading.Timer(0.05, event_broker.deliver, args=(42, {'points': 7})).start()
+                first = await subscription.aget(2)
+                second = await subscription.aget(0.05)
+                return first, second
+            finally:
+                event_broker.unsubscribe(subscription)
+        
+        assert asyncio.run(scenario()) == ({'points': 7}, None)
@@ -0,0 +1,119 @@
+"""
+Unit tests for token authentication and the identity cache
+"""
+from datetime import timedelta
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+import auth
+from app import app, db
+from auth import identity_cache
+from models import User
+
+@pytest.fixture
+def user(client):
+    """Create a user with a password"""
+    user = User(name='Test User', email='test@example.com', password_hash=generate_password_hash('secret'))
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+@pytest.fixture
+def tokens(client, user):
+    """Log in from another client (so `client` holds no session cookie) and return the issued tokens"""
+    response = app.test_client().post('/api/auth/login', json={'email': 'test@example.com', 'password': 'secret'})
+    return response.get_json()
+
+def bearer(token):
+    return {'Authorization': 'Bearer ' + token}
+
+class TestTokens:
+    """Test issuing, using and refreshing tokens"""
+    
+    def test_login_issues_tokens(self, client, tokens):
+        """Test the access token authenticates without the session cookie"""
+        assert client.get('/api/transactions').status_code == 401
+        assert client.get('/api/transactions', headers=bearer(tokens['access_token'])).status_code == 200
+    
+    def test_wrong_password(self, client, user):
+        """Test bad credentials get no tokens"""
+        response = client.post('/api/auth/login', json={'email': 'test@example.com', 'password': 'nope'})
+        
+        assert response.status_code == 401
+        assert 'access_token' not in response.get_json()
+    
+    def test_refresh(self, client, tokens):
+        """Test a refresh token buys a new access token, and only a refresh token does"""
+        response = client.post('/api/auth/refresh', headers=bearer(tokens['refresh_token']))
+        
+        assert response.status_code == 200
+        assert client.get('/api/transactions', headers=bearer(response.get_json()['access_token'])).status_code == 200
+        assert client.post('/api/auth/refresh', headers=bearer(tokens['access_token'])).status_code == 422
+        assert client.get('/api/transactions', headers=bearer(tokens['refresh_token'])).status_code == 422
+    
+    def test_expired_token(self, client, user):
+        """Test expired tokens are rejected so the client refreshes"""
+        token = create_access_token(identity=str(user.id), additional_claims={'ver': 0},
+                                    expires_delta=timedelta(seconds=-1))
+        
+        assert client.get('/api/transactions', headers=bearer(token)).status_code == 401
+
+class TestIdentityCache:
+    """Test identity lookups are cached and revocation is bounded"""
+    
+    def test_reads_skip_user_lookup(self, client, tokens):
+        """Test authenticated reads don't query users once the identity is cached"""
+        statements = []
+        
+        def before_execute(conn, cursor, statement, parameters, context, executemany):
+            if 'FROM users' in statement:
+                statements.append(statement)
+        
+        identity_cache.clear()
+        event.listen(db.engine, 'before_cursor_execute', before_execute)
+        try:
+            for _ in range(3):
+                assert client.get('/api/transactions', headers=bearer(tokens['access_token'])).status_code == 200
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_execute)
+        
+        assert len(statements) == 1
+        assert 'users.password_hash' not in statements[0]
+    
+    def test_revoke_is_immediate_in_this_worker(self, client, tokens):
+        """Test revoking invalidates every token issued so far"""
+        headers = bearer(tokens['access_token'])
+        
+        assert client.post('/api/auth/revoke', headers=headers).status_code == 200
+        assert client.get('/api/transactions', headers=headers).status_code == 401
+        assert client.post('/api/auth/refresh', headers=bearer(tokens['refresh_token'])).status_code == 401
+    
+    def test_revocation_elsewhere_within_ttl(self, client, user, tokens, monkeypatch):
+        """Test a revocation by another worker is honoured once the cached identity expires"""
+        headers = bearer(tokens['access_token'])
+        User.query.filter_by(id=user.id).update({'token_version': 1})
+        db.session.commit()
+        
+        assert client.get('/api/transactions', headers=headers).status_code == 200
+        
+        now = auth.time.monotonic()
+        monkeypatch.setattr(auth.time, 'monotonic', lambda: now + identity_cache.ttl + 1)
+        assert client.get('/api/transactions', headers=headers).status_code == 401
+    
+    def test_deactivated_user(self, client, user, tokens):
+        """Test tokens of deactivated users stop working"""
+        user.is_active = False
+        db.session.commit()
+        identity_cache.invalidate(user.id)
+        
+        assert client.get('/api/transactions', headers=bearer(tokens['access_token'])).status_code == 401
+    
+    def test_session_cookie_checked_against_version(self, client, user):
+        """Test login sessions are revoked along with tokens"""
+        client.post('/api/auth/login', json={'email': 'test@example.com', 'password': 'secret'})
+        assert client.get('/api/transactions').status_code == 200
+        
+        auth.revoke_tokens(user.id)
+        
+        assert client.get('/api/transactions').status_code == 401
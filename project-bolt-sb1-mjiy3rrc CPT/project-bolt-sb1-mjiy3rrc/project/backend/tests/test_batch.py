@@ -0,0 +1,115 @@
+"""
+Unit tests for batched requests
+"""
+from datetime import timedelta
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from app import db
+from models import User, Reward, Transaction
+
+@pytest.fixture
+def user(client):
+    """Create a logged-in user with some history"""
+    user = User(name='Test User', email='test@example.com', balance=5000.0, points=300)
+    db.session.add(user)
+    db.session.add(Reward(name='Airtime Voucher', description='Prepaid airtime', points_cost=200,
+                          category='Airtime'))
+    db.session.commit()
+    db.session.add(Transaction(user_id=user.id, transaction_type='send', amount=500.0, points_earned=5))
+    db.session.commit()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user.id
+    return user
+
+def count_user_selects():
+    statements = []
+    
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        # Full User rows; the identity check reads only its own columns
+        if statement.lstrip().upper().startswith('SELECT') and 'users.email' in statement:
+            statements.append(statement)
+    return statements, before_execute
+
+class TestBatch:
+    """Test the batch endpoint"""
+    
+    def test_combines_responses_in_order(self, client, user):
+        """Test each sub-request gets the same body as the standalone endpoint"""
+        response = client.post('/api/batch', json={'requests': [
+            {'id': 'profile', 'path': '/api/user/profile'},
+            {'id': 'transactions', 'path': '/api/transactions?per_page=5'},
+            {'id': 'rewards', 'path': '/api/rewards?category=Airtime'}
+        ]})
+        
+        assert response.status_code == 200
+        profile, transactions, rewards = response.get_json()['responses']
+        assert [profile['id'], profile['status']] == ['profile', 200]
+        assert profile['body'] == client.get('/api/user/profile').get_json()
+        assert transactions['body']['total'] == 1
+        assert rewards['body'][0]['name'] == 'Airtime Voucher'
+        assert rewards['headers']['ETag'] == client.get('/api/rewards?category=Airtime').headers['ETag']
+    
+    def test_user_loaded_once(self, client, user):
+        """Test sub-requests share the identity map"""
+        db.session.expunge_all()
+        statements, listener = count_user_selects()
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            client.post('/api/batch', json={'requests': [
+                {'path': '/api/user/profile'},
+                {'path': '/api/rewards/search?affordable=true'}
+            ]})
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        
+        assert len(statements) == 1
+    
+    def test_sub_request_validators(self, client, user):
+        """Test If-None-Match is honoured per sub-request"""
+        etag = client.get('/api/user/profile').headers['ETag']
+        
+        result = client.post('/api/batch', json={'requests': [
+            {'path': '/api/user/profile', 'headers': {'If-None-Match': etag}}
+        ]}).get_json()['responses'][0]
+        
+        assert result['status'] == 304 and result['body'] is None
+    
+    def test_unauthenticated_sub_requests(self, client):
+        """Test each sub-request applies its own authentication check"""
+        responses = client.post('/api/batch', json={'requests': [
+            {'path': '/api/user/profile'}, {'path': '/api/leaderboard'}
+        ]}).get_json()['responses']
+        
+        assert [r['status'] for r in responses] == [401, 200]
+    
+    def test_bad_sub_request_tokens(self, client, user):
+        """Test a sub-request's expired or malformed token gets the same 401/422 as a direct request"""
+        expired = create_access_token(identity=str(user.id), additional_claims={'ver': 0},
+                                      expires_delta=timedelta(seconds=-1))
+        
+        responses = client.post('/api/batch', json={'requests': [
+            {'path': '/api/transactions', 'headers': {'Authorization': f'Bearer {expired}'}},
+            {'path': '/api/transactions', 'headers': {'Authorization': 'Bearer not-a-token'}},
+            {'path': '/api/transactions'}
+        ]}).get_json()['responses']
+        
+        assert [r['status'] for r in responses] == [401, 422, 200]
+        assert 'msg' in responses[0]['body']
+    
+    def test_rejects_writes_and_unknown_paths(self, client, user):
+        """Test only batchable reads are run"""
+        responses = client.post('/api/batch', json={'requests': [
+            {'method': 'POST', 'path': '/api/send-money'},
+            {'path': '/api/user/events'},
+            {'path': '/api/nope'},
+            {'path': 'api/rewards'}
+        ]}).get_json()['responses']
+        
+        assert [r['status'] for r in responses] == [405, 400, 404, 400]
+        assert Transaction.query.count() == 1
+    
+    def test_batch_size_limit(self, client, user):
+        """Test empty and oversized batches are rejected"""
+        assert client.post('/api/batch', json={'requests': []}).status_code == 400
+        assert client.post('/api/batch', json={'requests': [{'path': '/api/rewards'}] * 11}).status_code == 400
@@ -0,0 +1,65 @@
+"""
+Unit tests for ORM-free bulk reads
+"""
+from array import array
+import pytest
+from app import db
+from models import User, Transaction
+from bulkread import iter_columns, iter_records, iter_transactions, iter_users, record_type
+
+@pytest.fixture
+def users(client):
+    """Create five users with two transactions each"""
+    for i in range(5):
+        user = User(name=f'User {i}', email=f'user{i}@example.com', total_sent=25000.0 * i)
+        db.session.add(user)
+        db.session.flush()
+        for amount in (100.0, 200.0):
+            db.session.add(Transaction(user_id=user.id, transaction_type='send', amount=amount,
+                                       points_earned=int(amount // 100), status='completed'))
+    db.session.commit()
+    return User.query.order_by(User.id).all()
+
+class TestBulkRead:
+    """Test record and columnar streaming"""
+    
+    def test_records_are_slotted_and_complete(self, users):
+        """Test every row is returned once across chunk boundaries"""
+        records = list(iter_users(chunk_size=2))
+        
+        assert [r.id for r in records] == [u.id for u in users]
+        assert [r.tier for r in records] == ['Bronze', 'Silver', 'Gold', 'Gold', 'Gold']
+        assert not hasattr(records[0], '__dict__')
+        assert record_type('users', ('id', 'tier', 'points', 'balance', 'total_sent', 'is_active',
+                                     'created_at')) is type(records[0])
+    
+    def test_where_filter(self, users):
+        """Test a Core filter narrows the stream"""
+        records = list(iter_transactions(Transaction.user_id == users[0].id, chunk_size=1))
+        
+        assert sorted(r.amount for r in records) == [100.0, 200.0]
+    
+    def test_columnar_chunks(self, users):
+        """Test numeric columns come back array-backed"""
+        chunks = list(iter_columns(Transaction, ('id', 'user_id', 'amount', 'status'), chunk_size=4))
+        
+        assert [len(chunk['id']) for chunk in chunks] == [4, 4, 2]
+        assert isinstance(chunks[0]['amount'], array) and chunks[0]['amount'].typecode == 'd'
+        assert chunks[0]['status'] == ['completed'] * 4
+        assert sum(sum(chunk['amount']) for chunk in chunks) == 1500.0
+    
+    def test_nulls_fall_back_to_lists(self, users):
+        """Test numeric columns containing NULLs stay lists"""
+        db.session.add(Transaction(user_id=users[0].id, transaction_type='send', amount=185.0, source_amount=10.0))
+        db.session.commit()
+        
+        chunk = next(iter_columns(Transaction, ('id', 'source_amount')))
+        
+        assert isinstance(chunk['source_amount'], list)
+        assert chunk['source_amount'][-1] == 10.0
+        assert isinstance(chunk['id'], array)
+    
+    def test_records_require_id(self, users):
+        """Test id paging needs the id column"""
+        with pytest.raises(ValueError):
+            list(iter_records(User, ('email',)))
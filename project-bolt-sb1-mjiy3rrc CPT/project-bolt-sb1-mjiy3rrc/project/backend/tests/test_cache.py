@@ -0,0 +1,174 @@
+"""
+Unit tests for the per-user response cache
+"""
+from app import db
+from models import User, Reward
+from services import UserService, TransactionService, LoyaltyService, RewardService
+from cache import UserVersions, UserResponseCache, dashboard_cache, profile_cache, user_versions
+
+class TestUserResponseCache:
+    """Test cache bookkeeping independent of the database"""
+    
+    def test_hit_until_version_bump(self):
+        """Test entries are served until the user's version changes"""
+        versions = UserVersions()
+        cache = UserResponseCache(versions, max_entries=10, ttl=60)
+        calls = []
+        builder = lambda user_id: calls.append(user_id) or {'id': user_id}
+        
+        cache.get_or_build(1, builder)
+        cache.get_or_build(1, builder)
+        assert calls == [1]
+        
+        versions.bump(1)
+        cache.get_or_build(1, builder)
+        assert calls == [1, 1]
+        assert cache.stats()['hits'] == 1
+        assert cache.stats()['misses'] == 2
+    
+    def test_max_entries_evicts_least_recent(self):
+        """Test LRU eviction once max_entries is exceeded"""
+        cache = UserResponseCache(UserVersions(), max_entries=2, ttl=60)
+        builder = lambda user_id: {'id': user_id}
+        
+        for user_id in (1, 2, 1, 3):
+            cache.get_or_build(user_id, builder)
+        
+        stats = cache.stats()
+        assert stats['size'] == 2
+        assert stats['evictions'] == 1
+        cache.get_or_build(1, builder)
+        assert cache.stats()['hits'] == 2  # user 1 survived, user 2 was evicted
+    
+    def test_ttl_expiry(self):
+        """Test expired entries are rebuilt"""
+        cache = UserResponseCache(UserVersions(), max_entries=10, ttl=0)
+        calls = []
+        builder = lambda user_id: calls.append(user_id) or {'id': user_id}
+        
+        cache.get_or_build(1, builder)
+        cache.get_or_build(1, builder)
+        assert calls == [1, 1]
+    
+    def test_versions_evict_without_reusing_old_versions(self):
+        """Test bounded versions forget old users but never serve responses from before a bump"""
+        versions = UserVersions(max_entries=2)
+        cache = UserResponseCache(versions, max_entries=10, ttl=60)
+        calls = []
+        builder = lambda user_id: calls.append(user_id) or {'id': user_id}
+        
+        cache.get_or_build(1, builder)
+        versions.bump(1)
+        versions.bump(2)
+        versions.bump(3)
+        
+        assert len(versions._versions) == 2
+        cache.get_or_build(1, builder)
+        assert calls == [1, 1]
+    
+    def test_none_not_cached(self):
+        """Test unknown users are not cached"""
+        cache = UserResponseCache(UserVersions(), max_entries=10, ttl=60)
+        assert cache.get_or_build(1, lambda user_id: None) is None
+        assert cache.stats()['size'] == 0
+
+class TestServiceCaching:
+    """Test write paths invalidate cached user responses"""
+    
+    def test_dashboard_invalidated_by_send_money(self, client, sample_user):
+        """Test dashboard is rebuilt after a transfer"""
+        first = UserService.get_user_dashboard_data(sample_user.id)
+        assert UserService.get_user_dashboard_data(sample_user.id) is first
+        
+        TransactionService.send_money(sample_user.id, 500, 'Test Recipient')
+        
+        second = UserService.get_user_dashboard_data(sample_user.id)
+        assert second is not first
+        assert len(second['recent_transactions']) == 1
+        assert dashboard_cache.stats()['hits'] == 1
+    
+    def test_profile_invalidated_by_bonus_points(self, client, sample_user):
+        """Test profile is rebuilt after bonus points are awarded"""
+        assert UserService.get_user_profile_data(sample_user.id)['user']['points'] == 100
+        
+        LoyaltyService.award_bonus_points(sample_user.id, 50, 'Test bonus')
+        
+        assert UserService.get_user_profile_data(sample_user.id)['user']['points'] == 150
+        assert profile_cache.stats()['misses'] == 2
+    
+    def test_profile_endpoint(self, client, sample_user):
+        """Test profile endpoint serves repeat polls from cache"""
+        with client.session_transaction() as sess:
+            sess['user_id'] = sample_user.id
+        
+        assert client.get('/api/user/profile').status_code == 200
+        response = client.get('/api/user/profile')
+        
+        assert response.get_json()['user']['email'] == 'test@example.com'
+        assert profile_cache.stats()['hits'] == 1
+
+class TestConditionalGet:
+    """Test ETag / If-None-Match handling"""
+    
+    def test_profile_not_modified_until_write(self, client, sample_user):
+        """Test profile returns 304 for a current ETag and 200 after a write"""
+        with client.session_transaction() as sess:
+            sess['user_id'] = sample_user.id
+        
+        etag = client.get('/api/user/profile').headers['ETag']
+        response = client.get('/api/user/profile', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.data == b''
+        
+        TransactionService.send_money(sample_user.id, 500, 'Test Recipient')
+        
+        response = client.get('/api/user/profile', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+    
+    def test_profile_etag_shared_across_workers(self, client, sample_user):
+        """Test validators come from the database, not from process-local counters"""
+        with client.session_transaction() as sess:
+            sess['user_id'] = sample_user.id
+        etag = client.get('/api/user/profile').headers['ETag']
+        
+        user_versions.clear()  # what a different worker process sees
+        profile_cache.clear()
+        assert client.get('/api/user/profile', headers={'If-None-Match': etag}).status_code == 304
+        
+        # A write made by another worker: no local version bump
+        db.session.execute(db.update(User).where(User.id == sample_user.id).values(points=777))
+        db.session.commit()
+        response = client.get('/api/user/profile', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.get_json()['user']['points'] == 777
+    
+    def test_rewards_etag_and_cache_control(self, client):
+        """Test rewards catalogue carries validators and caching headers"""
+        response = client.get('/api/rewards')
+        assert response.status_code == 200
+        assert 'max-age' in response.headers['Cache-Control']
+        
+        etag = response.headers['ETag']
+        assert client.get('/api/rewards', headers={'If-None-Match': etag}).status_code == 304
+        assert client.get('/api/rewards?category=Airtime', headers={'If-None-Match': etag}).status_code == 200
+        
+        db.session.add(Reward(name='Airtime', points_cost=50, category='Airtime'))
+        db.session.commit()
+        assert client.get('/api/rewards', headers={'If-None-Match': etag}).status_code == 200
+    
+    def test_rewards_etag_ignores_redemptions_but_follows_stock(self, client, sample_user):
+        """Test redeeming unlimited rewards keeps the catalogue ETag; a stock change moves it"""
+        unlimited = Reward(name='Airtime', points_cost=10, category='Airtime')
+        limited = Reward(name='Voucher', points_cost=10, category='Shopping', stock_quantity=5)
+        db.session.add_all([unlimited, limited])
+        db.session.commit()
+        etag = client.get('/api/rewards').headers['ETag']
+        
+        RewardService.redeem_reward(sample_user.id, unlimited.id)
+        assert client.get('/api/rewards', headers={'If-None-Match': etag}).status_code == 304
+        
+        RewardService.redeem_reward(sample_user.id, limited.id)
+        response = client.get('/api/rewards', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.get_json()[1]['stockQuantity'] == 4
@@ -0,0 +1,106 @@
+"""
+Unit tests for the bonus points campaign engine
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+import pytest
+from app import db
+from models import Campaign
+from campaigns import CampaignEngine, CampaignIndex, campaign_engine
+from services import TransactionService, CampaignService
+
+pytestmark = pytest.mark.user(balance=100000.0, points=0)
+
+def make_campaign(**fields):
+    fields.setdefault('name', 'Test Campaign')
+    fields.setdefault('starts_at', datetime(2024, 6, 1))
+    fields.setdefault('ends_at', datetime(2024, 6, 3))
+    return Campaign(**fields)
+
+class TestCampaignIndex:
+    """Test rule matching on a compiled index"""
+    
+    def test_matches_tier_window_amount_and_corridor(self):
+        """Test each rule dimension narrows the match"""
+        index = CampaignIndex([
+            make_campaign(id=1, multiplier=2.0, recipient_prefix='+263'),
+            make_campaign(id=2, multiplier=1.5, tiers='Gold'),
+            make_campaign(id=3, bonus_points=10, min_amount=1000, max_amount=5000),
+        ])
+        during = datetime(2024, 6, 2)
+        
+        assert index.match('Bronze', 500, '+263 77 123 4567', during).campaign_ids == (1,)
+        assert index.match('Bronze', 500, '+27 82 123 4567', during).campaign_ids == ()
+        assert index.match('Gold', 2000, '0027821234567', during).campaign_ids == (2, 3)
+        assert index.match('Gold', 2000, None, datetime(2024, 6, 3)).campaign_ids == ()
+        assert index.match('Gold', 2000, None, datetime(2024, 5, 31)).campaign_ids == ()
+    
+    def test_highest_multiplier_wins_and_bonuses_add(self):
+        """Test overlapping campaigns do not compound multipliers"""
+        index = CampaignIndex([
+            make_campaign(id=1, multiplier=2.0, bonus_points=5),
+            make_campaign(id=2, multiplier=3.0, bonus_points=7, tiers='Silver,Gold'),
+        ])
+        match = index.match('Silver', 100, None, datetime(2024, 6, 2))
+        
+        assert match.multiplier == 3.0
+        assert match.bonus_points == 12
+
+class TestCampaignPoints:
+    """Test campaign and tier multipliers in send_money"""
+    
+    def test_tier_multiplier_applied(self, sample_user):
+        """Test Gold users earn 1.5x points"""
+        sample_user.total_sent = 60000.0
+        db.session.commit()
+        
+        _, _, transaction = TransactionService.send_money(sample_user.id, 1000.0, 'John Doe')
+        
+        assert transaction.points_earned == 15
+    
+    def test_campaign_applied_until_deactivated(self, sample_user):
+        """Test a live campaign doubles points and stops when deactivated"""
+        now = datetime.utcnow()
+        campaign = CampaignService.create_campaign('Double corridor', now - timedelta(hours=1),
+                                                   now + timedelta(days=2), multiplier=2.0,
+                                                   recipient_prefix='263')
+        
+        _, _, doubled = TransactionService.send_money(sample_user.id, 1000.0, 'John Doe', '+263771234567')
+        _, _, other = TransactionService.send_money(sample_user.id, 1000.0, 'Jane Doe', '+27821234567')
+        assert doubled.points_earned == 20
+        assert other.points_earned == 10
+        
+        CampaignService.deactivate_campaign(campaign.id)
+        _, _, after = TransactionService.send_money(sample_user.id, 1000.0, 'John Doe', '+263771234567')
+        assert after.points_earned == 10
+        assert CampaignService.get_active_campaigns() == []
+    
+    def test_reload_picks_up_rules_written_elsewhere(self, sample_user):
+        """Test rules inserted by another worker are seen after a reload"""
+        now = datetime.utcnow()
+        campaign_engine.reload()
+        db.session.add(make_campaign(bonus_points=50, starts_at=now - timedelta(hours=1),
+                                     ends_at=now + timedelta(hours=1)))
+        db.session.commit()
+        
+        assert campaign_engine.match('Bronze', 100).bonus_points == 0
+        campaign_engine.invalidate()
+        assert campaign_engine.match('Bronze', 100).bonus_points == 50
+    
+    def test_queued_reload_reuses_fresh_index(self, monkeypatch):
+        """Test a request waiting on an in-progress reload does not reload again"""
+        engine = CampaignEngine(30)
+        loads = []
+        monkeypatch.setattr(engine, '_load', lambda: loads.append(1))
+        
+        engine._lock.acquire()
+        waiter = threading.Thread(target=engine.index)
+        waiter.start()
+        waiter.join(0.1)
+        engine._index = CampaignIndex(())
+        engine._loaded_at = time.monotonic()
+        engine._lock.release()
+        waiter.join()
+        
+        assert loads == []
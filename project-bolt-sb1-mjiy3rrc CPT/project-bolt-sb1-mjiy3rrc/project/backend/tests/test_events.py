@@ -0,0 +1,117 @@
+"""
+Unit tests for live user update events
+"""
+import json
+import threading
+import redis
+from config import Config
+from services import TransactionService, LoyaltyService
+from events import EventBroker, RedisEventBridge, event_broker, stream_user_events
+
+def _parse(frame):
+    return json.loads(frame.split('data: ', 1)[1])
+
+class TestEventBroker:
+    """Test in-process fan-out"""
+    
+    def test_fan_out_to_user_subscriptions(self):
+        """Test events reach every subscription of the target user only"""
+        broker = EventBroker()
+        first, second, other = broker.subscribe(1), broker.subscribe(1), broker.subscribe(2)
+        
+        broker.publish(1, {'points': 10})
+        
+        assert first.get(0) == {'points': 10}
+        assert second.get(0) == {'points': 10}
+        assert other.get(0) is None
+    
+    def test_unsubscribe(self):
+        """Test disconnected clients are forgotten"""
+        broker = EventBroker()
+        subscription = broker.subscribe(1)
+        broker.unsubscribe(subscription)
+        
+        assert broker.subscriber_count() == 0
+    
+    def test_slow_client_keeps_newest_events(self):
+        """Test pending events are bounded per subscription"""
+        broker = EventBroker(max_pending=2)
+        subscription = broker.subscribe(1)
+        for points in range(5):
+            broker.publish(1, {'points': points})
+        
+        assert subscription.get(0) == {'points': 3}
+        assert subscription.get(0) == {'points': 4}
+
+class FlakyRedis:
+    """Redis stand-in whose first subscription drops after one message"""
+    
+    def __init__(self):
+        self.subscriptions = 0
+    
+    def pubsub(self, **kwargs):
+        return self
+    
+    def subscribe(self, channel):
+        self.subscriptions += 1
+    
+    def close(self):
+        pass
+    
+    def listen(self):
+        yield {'data': json.dumps({'user_id': 1, 'event': {'points': self.subscriptions}})}
+        if self.subscriptions == 1:
+            raise redis.ConnectionError('Connection reset by peer')
+        threading.Event().wait()  # then stays connected
+
+class TestRedisEventBridge:
+    """Test cross-worker relaying survives Redis outages"""
+    
+    def test_resubscribes_after_connection_error(self, monkeypatch):
+        """Test the listener logs, backs off and resubscribes instead of dying"""
+        fake = FlakyRedis()
+        monkeypatch.setattr(redis.Redis, 'from_url', lambda url: fake)
+        monkeypatch.setattr(Config, 'EVENTS_REDIS_RETRY_SECONDS', 0.01)
+        broker = EventBroker()
+        subscription = broker.subscribe(1)
+        
+        bridge = RedisEventBridge(broker, 'redis://localhost', 'events')
+        
+        assert subscription.get(1) == {'points': 1}
+        assert subscription.get(1) == {'points': 2}
+        assert bridge._thread.is_alive()
+        assert fake.subscriptions == 2
+
+class TestUserEventStream:
+    """Test write paths push deltas to the stream"""
+    
+    def test_send_money_pushes_delta(self, client, sample_user):
+        """Test a transfer is streamed with balance, points, tier and transaction"""
+        stream = stream_user_events(sample_user.id, heartbeat=0.01)
+        assert next(stream).startswith('retry:')
+        assert next(stream) == ': keep-alive\n\n'
+        
+        TransactionService.send_money(sample_user.id, 500, 'Test Recipient')
+        
+        event = _parse(next(stream))
+        assert event['balance'] == 4500
+        assert event['points'] == 105
+        assert event['tier'] == 'Bronze'
+        assert event['transaction']['recipient'] == 'Test Recipient'
+        
+        stream.close()
+        assert event_broker.subscriber_count() == 0
+    
+    def test_bonus_points_pushes_delta(self, client, sample_user):
+        """Test bonus points are streamed"""
+        stream = stream_user_events(sample_user.id, heartbeat=0.01)
+        next(stream)
+        
+        LoyaltyService.award_bonus_points(sample_user.id, 25, 'Test bonus')
+        
+        assert _parse(next(stream))['points'] == 125
+        stream.close()
+    
+    def test_events_endpoint_requires_auth(self, client):
+        """Test anonymous clients cannot subscribe"""
+        assert client.get('/api/user/events').status_code == 401
@@ -0,0 +1,127 @@
+"""
+Unit tests for lot-based points expiry
+"""
+from datetime import datetime
+import pytest
+from sqlalchemy import event
+from app import db
+from models import User, Transaction, Reward, PointsLot, add_months
+from expiry import expire_points
+from services import TransactionService, RewardService, LoyaltyService
+
+pytestmark = pytest.mark.user(balance=10000.0, points=0)
+
+@pytest.fixture
+def sample_reward(client):
+    """Create a sample reward"""
+    reward = Reward(name='Test Reward', description='A test reward', points_cost=50,
+                    category='Test', is_available=True)
+    db.session.add(reward)
+    db.session.commit()
+    return reward
+
+class TestPointsLots:
+    """Test lots created by earning and consumed by redemptions"""
+    
+    def test_add_months_clamps_day(self):
+        """Test month arithmetic clamps to the last day of short months"""
+        assert add_months(datetime(2024, 1, 31), 1) == datetime(2024, 2, 29)
+        assert add_months(datetime(2024, 11, 15), 24) == datetime(2026, 11, 15)
+    
+    def test_earning_creates_lots(self, sample_user):
+        """Test transfers and bonuses each create a lot"""
+        success, _, transaction = TransactionService.send_money(sample_user.id, 1000.0, 'John Doe')
+        assert success
+        LoyaltyService.award_bonus_points(sample_user.id, 25, 'Welcome bonus')
+        
+        lots = PointsLot.query.order_by(PointsLot.id).all()
+        assert [lot.points_remaining for lot in lots] == [10, 25]
+        assert lots[0].source_reference == transaction.reference
+        assert lots[0].expires_at == add_months(lots[0].earned_at, 24)
+    
+    def test_redemption_spends_oldest_lots_first(self, sample_user, sample_reward):
+        """Test redemptions consume lots FIFO"""
+        for points, month in ((30, 1), (40, 2)):
+            db.session.add(PointsLot(user_id=sample_user.id, points_earned=points,
+                                     earned_at=datetime(2024, month, 1)))
+        sample_user.points = 70
+        db.session.commit()
+        
+        success, _, _ = RewardService.redeem_reward(sample_user.id, sample_reward.id)
+        
+        assert success
+        lots = PointsLot.query.order_by(PointsLot.earned_at).all()
+        assert [lot.points_remaining for lot in lots] == [0, 20]
+
+class TestExpiryJob:
+    """Test the nightly expiry job"""
+    
+    def test_expires_due_lots(self, sample_user):
+        """Test due lots are zeroed, points debited and a transaction written"""
+        db.session.add(PointsLot(user_id=sample_user.id, points_earned=30, earned_at=datetime(2022, 1, 1)))
+        db.session.add(PointsLot(user_id=sample_user.id, points_earned=20, earned_at=datetime(2022, 6, 1)))
+        db.session.add(PointsLot(user_id=sample_user.id, points_earned=40, earned_at=datetime(2024, 6, 1)))
+        sample_user.points = 90
+        db.session.commit()
+        
+        report = expire_points(now=datetime(2024, 7, 1), chunk_size=1)
+        
+        assert report['lots_expired'] == 2
+        assert report['points_expired'] == 50
+        assert report['chunks'] == 2
+        db.session.expire_all()
+        assert db.session.get(User, sample_user.id).points == 40
+        expiries = Transaction.query.filter_by(transaction_type='expiry').all()
+        assert sorted(t.points_earned for t in expiries) == [-30, -20]
+        assert PointsLot.query.filter(PointsLot.points_remaining > 0).count() == 1
+        
+        assert expire_points(now=datetime(2024, 7, 1))['lots_expired'] == 0
+    
+    def test_balance_never_goes_negative(self, sample_user):
+        """Test expiry clamps at zero when points were spent outside lots"""
+        db.session.add(PointsLot(user_id=sample_user.id, points_earned=30, earned_at=datetime(2022, 1, 1)))
+        sample_user.points = 10
+        db.session.commit()
+        
+        expire_points(now=datetime(2024, 7, 1))
+        
+        db.session.expire_all()
+        assert db.session.get(User, sample_user.id).points == 0
+    
+    def test_points_writes_keep_concurrent_expiry(self, sample_user, sample_reward):
+        """Test earning and redeeming re-read points an expiry run debited after the user was loaded"""
+        sample_user.points = 90
+        db.session.commit()
+        assert sample_user.points == 90  # loaded, then debited behind the ORM's back as expiry does
+        users = User.__table__
+        db.session.execute(users.update().where(users.c.id == sample_user.id).values(points=users.c.points - 30))
+        
+        LoyaltyService.award_bonus_points(sample_user.id, 10, 'Bonus')
+        assert db.session.get(User, sample_user.id).points == 70
+        
+        db.session.execute(users.update().where(users.c.id == sample_user.id).values(points=users.c.points - 10))
+        success, _, _ = RewardService.redeem_reward(sample_user.id, sample_reward.id)
+        
+        assert success
+        db.session.expire_all()
+        assert db.session.get(User, sample_user.id).points == 10
+    
+    def test_locks_users_before_lots(self, sample_user):
+        """Test the sweep locks owners before their lots, in the same order redemptions do"""
+        db.session.add(PointsLot(user_id=sample_user.id, points_earned=30, earned_at=datetime(2022, 1, 1)))
+        sample_user.points = 30
+        db.session.commit()
+        statements = []
+        
+        def before_execute(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith('SELECT') and ('FROM users' in statement or 'FROM points_lots' in statement):
+                statements.append('users' if 'FROM users' in statement else 'points_lots')
+        
+        event.listen(db.engine, 'before_cursor_execute', before_execute)
+        try:
+            assert expire_points(now=datetime(2024, 7, 1))['lots_expired'] == 1
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_execute)
+        
+        # Unlocked scan for candidates, then the owners' rows, then the lots themselves
+        assert statements[:3] == ['points_lots', 'users', 'points_lots']
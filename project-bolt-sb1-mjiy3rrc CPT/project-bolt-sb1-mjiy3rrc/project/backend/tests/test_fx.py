@@ -0,0 +1,59 @@
+"""
+Unit tests for multi-currency sends
+"""
+import pytest
+from models import FxRate
+from fx import RateSnapshot, fx_rates
+from services import TransactionService
+
+pytestmark = pytest.mark.user(balance=10000.0, points=0)
+
+class TestRateSnapshot:
+    """Test snapshot conversion"""
+    
+    def test_convert(self):
+        """Test conversion, the implicit base rate and unknown currencies"""
+        snapshot = RateSnapshot(3, {'usd': 18.5})
+        
+        assert snapshot.convert(10, 'USD') == (185.0, 18.5)
+        assert snapshot.convert(10, None) == (10.0, 1.0)
+        assert snapshot.convert(10, 'EUR') is None
+        with pytest.raises(TypeError):
+            snapshot.rates['EUR'] = 20.0
+
+class TestMultiCurrencySend:
+    """Test FX conversion in send_money"""
+    
+    def test_send_converts_and_records_version(self, sample_user):
+        """Test balance, points and tier accounting use the converted amount"""
+        version = fx_rates.publish({'USD': 20.0})
+        
+        success, _, transaction = TransactionService.send_money(sample_user.id, 50, 'John Doe', currency='usd')
+        
+        assert success
+        assert transaction.amount == 1000.0
+        assert transaction.source_amount == 50
+        assert transaction.currency == 'USD'
+        assert (transaction.fx_rate, transaction.fx_version) == (20.0, version)
+        assert transaction.points_earned == 10
+        assert sample_user.balance == 9000.0
+        assert sample_user.total_sent == 1000.0
+    
+    def test_new_version_keeps_old_transactions_auditable(self, sample_user):
+        """Test a republished rate only affects later sends"""
+        first = fx_rates.publish({'USD': 20.0})
+        _, _, before = TransactionService.send_money(sample_user.id, 10, 'John Doe', currency='USD')
+        second = fx_rates.publish({'USD': 25.0})
+        _, _, after = TransactionService.send_money(sample_user.id, 10, 'John Doe', currency='USD')
+        
+        assert (before.amount, before.fx_version) == (200.0, first)
+        assert (after.amount, after.fx_version) == (250.0, second)
+        assert FxRate.query.count() == 2
+    
+    def test_unsupported_currency_rejected(self, sample_user):
+        """Test currencies without a published rate are rejected"""
+        success, message, _ = TransactionService.send_money(sample_user.id, 10, 'John Doe', currency='XYZ')
+        
+        assert not success
+        assert message == "Unsupported currency"
+        assert sample_user.balance == 10000.0
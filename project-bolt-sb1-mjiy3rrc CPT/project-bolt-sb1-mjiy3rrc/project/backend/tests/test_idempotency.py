@@ -0,0 +1,144 @@
+"""
+Unit tests for Idempotency-Key handling
+"""
+import warnings
+from datetime import datetime, timedelta
+import pytest
+from app import db
+from models import User, Transaction, IdempotencyRecord
+from services import TransactionService
+from idempotency import IdempotencyCache, idempotency_cache, purge_expired_keys
+
+@pytest.fixture
+def logged_in_user(client):
+    """Create a user with an authenticated session"""
+    user = User(name='Test User', email='test@example.com', balance=5000.0)
+    db.session.add(user)
+    db.session.commit()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user.id
+        sess['tier'] = 'Bronze'
+    return user
+
+def _send(client, key, amount=500):
+    return client.post('/api/send-money',
+                       json={'amount': amount, 'recipient': 'Test Recipient'},
+                       headers={'Idempotency-Key': key})
+
+class TestIdempotentSendMoney:
+    """Test retries of money-moving requests"""
+    
+    def test_retry_replays_stored_response(self, client, logged_in_user):
+        """Test a retried transfer is not executed twice"""
+        first = _send(client, 'key-1')
+        second = _send(client, 'key-1')
+        
+        assert first.status_code == second.status_code == 200
+        assert second.headers['Idempotent-Replayed'] == 'true'
+        assert second.get_json() == first.get_json()
+        assert Transaction.query.count() == 1
+        assert db.session.get(User, logged_in_user.id).balance == 4500
+    
+    def test_replay_from_table_after_cache_loss(self, client, logged_in_user):
+        """Test the stored outcome survives losing the in-memory front"""
+        first = _send(client, 'key-1')
+        idempotency_cache.clear()
+        
+        second = _send(client, 'key-1')
+        
+        assert second.headers['Idempotent-Replayed'] == 'true'
+        assert second.get_json()['transaction']['id'] == first.get_json()['transaction']['id']
+        assert IdempotencyRecord.query.one().status == 'completed'
+    
+    def test_key_reused_with_different_body(self, client, logged_in_user):
+        """Test a key cannot be reused for a different request"""
+        _send(client, 'key-1', amount=500)
+        assert _send(client, 'key-1', amount=900).status_code == 422
+    
+    def test_distinct_keys_execute(self, client, logged_in_user):
+        """Test different keys are separate transfers"""
+        _send(client, 'key-1')
+        _send(client, 'key-2')
+        assert Transaction.query.count() == 2
+    
+    def test_no_key_passes_through(self, client, logged_in_user):
+        """Test requests without a key behave as before"""
+        client.post('/api/send-money', json={'amount': 500, 'recipient': 'Test Recipient'})
+        client.post('/api/send-money', json={'amount': 500, 'recipient': 'Test Recipient'})
+        assert Transaction.query.count() == 2
+        assert IdempotencyRecord.query.count() == 0
+    
+    def test_stale_pending_claim_is_reclaimed(self, client, logged_in_user):
+        """Test a claim abandoned before anything committed lets the retry run"""
+        db.session.add(IdempotencyRecord(user_id=logged_in_user.id, route='send_money', key='key-1',
+                                         request_hash='x', created_at=datetime.utcnow() - timedelta(minutes=5)))
+        db.session.commit()
+        
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')  # e.g. SAWarning for a stale instance left in the identity map
+            assert _send(client, 'key-1').status_code == 200
+        assert Transaction.query.count() == 1
+        assert IdempotencyRecord.query.one().status == 'completed'
+    
+    def test_expired_key_not_replayed_from_memory(self, client, logged_in_user):
+        """Test an outcome cached in this worker stops being replayed once the key has expired"""
+        _send(client, 'key-1')
+        expired = datetime.utcnow() - timedelta(days=2)
+        IdempotencyRecord.query.update({'created_at': expired})
+        db.session.commit()
+        cache_key = (logged_in_user.id, 'send_money', 'key-1')
+        idempotency_cache.put(cache_key, idempotency_cache.get(cache_key)[:3] + (expired,))
+        
+        response = _send(client, 'key-1')
+        
+        assert response.status_code == 200
+        assert 'Idempotent-Replayed' not in response.headers
+        assert Transaction.query.count() == 2
+    
+    def test_applied_claim_is_never_rerun(self, client, logged_in_user):
+        """Test a transfer committed without its stored response is not executed again"""
+        db.session.add(IdempotencyRecord(user_id=logged_in_user.id, route='send_money', key='key-1',
+                                         request_hash='x', status='applied',
+                                         created_at=datetime.utcnow() - timedelta(minutes=5)))
+        db.session.commit()
+        
+        assert _send(client, 'key-1').status_code == 409
+        assert Transaction.query.count() == 0
+    
+    def test_reclaimed_holder_cannot_commit(self, client, logged_in_user, monkeypatch):
+        """Test a slow request whose claim was taken over rolls its transfer back"""
+        send_money = TransactionService.send_money
+        
+        def reclaimed_meanwhile(*args, **kwargs):
+            # What another worker's reclaim looks like from inside this transaction
+            db.session.execute(db.delete(IdempotencyRecord))
+            return send_money(*args, **kwargs)
+        monkeypatch.setattr(TransactionService, 'send_money', reclaimed_meanwhile)
+        
+        assert _send(client, 'key-1').status_code == 409
+        assert Transaction.query.count() == 0
+        assert db.session.get(User, logged_in_user.id).balance == 5000
+    
+    def test_purge_expired_keys(self, client, logged_in_user):
+        """Test old outcomes are purged"""
+        _send(client, 'key-1')
+        IdempotencyRecord.query.update({'created_at': datetime.utcnow() - timedelta(days=2)})
+        db.session.commit()
+        
+        assert purge_expired_keys(chunk_size=1) == 1
+        assert IdempotencyRecord.query.count() == 0
+
+class TestIdempotencyCache:
+    """Test in-flight tracking"""
+    
+    def test_duplicate_waits_on_owner(self):
+        """Test only the first request for a key owns it until finished"""
+        cache = IdempotencyCache()
+        owner, _ = cache.begin((1, 'send_money', 'k'))
+        duplicate, event = cache.begin((1, 'send_money', 'k'))
+        
+        assert owner and not duplicate
+        assert not event.is_set()
+        cache.finish((1, 'send_money', 'k'))
+        assert event.is_set()
+        assert cache.begin((1, 'send_money', 'k'))[0]
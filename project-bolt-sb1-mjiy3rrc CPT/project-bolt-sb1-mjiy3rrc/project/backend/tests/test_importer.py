@@ -0,0 +1,90 @@
+"""
+Unit tests for streaming bulk user import
+"""
+import json
+import pytest
+from app import db
+from models import User, JobCheckpoint
+from importer import UserImporter, validate_record, checkpoint_name
+
+@pytest.fixture
+def csv_file(tmp_path):
+    """Write a partner CSV with valid, invalid and duplicate rows"""
+    path = tmp_path / 'partner.csv'
+    path.write_text(
+        'name,email,phone,balance\n'
+        'Alice,alice@example.com,+27 123 456 789,100\n'
+        'Bob,not-an-email,,\n'
+        'Carol,carol@example.com,123,\n'
+        'Dave,existing@example.com,,\n'
+        'Erin,ERIN@example.com,0821234567,\n'
+        'Erin Again,erin@example.com,,\n'
+    )
+    return path
+
+class TestValidateRecord:
+    """Test record validation and normalisation"""
+    
+    def test_normalises_email_and_phone(self):
+        """Test emails are lower-cased and phones stripped of separators"""
+        row, reason = validate_record({'name': ' Alice ', 'email': 'Alice@Example.com', 'phone': '+27 (12) 345-6789'})
+        
+        assert reason is None
+        assert row == {'name': 'Alice', 'email': 'alice@example.com', 'phone': '+27123456789'}
+    
+    def test_rejects_bad_balance(self):
+        """Test non-numeric balances are rejected"""
+        assert validate_record({'name': 'A', 'email': 'a@example.com', 'balance': 'lots'})[1] == 'invalid balance'
+
+class TestUserImporter:
+    """Test batched import, dedupe, rejects and resume"""
+    
+    def test_import_csv(self, client, csv_file):
+        """Test valid rows are inserted and the rest written to the reject file"""
+        db.session.add(User(name='Existing', email='existing@example.com'))
+        db.session.commit()
+        
+        report = UserImporter(str(csv_file), batch_size=2, transaction_size=2).run()
+        
+        assert report['inserted'] == 2
+        assert report['duplicates'] == 2
+        assert report['rejected'] == 4
+        assert User.query.filter_by(email='alice@example.com').one().balance == 100
+        assert User.query.filter_by(email='erin@example.com').one().tier == 'Bronze'
+        
+        rejects = [json.loads(line) for line in open(report['reject_file'])]
+        assert [r['reason'] for r in rejects] == ['invalid email', 'invalid phone', 'duplicate email', 'duplicate email']
+        assert db.session.get(JobCheckpoint, checkpoint_name(str(csv_file))) is None
+    
+    def test_resume_skips_committed_records(self, client, csv_file):
+        """Test an interrupted import continues after its checkpoint"""
+        db.session.add(JobCheckpoint(name=checkpoint_name(str(csv_file)), position=4))
+        db.session.commit()
+        
+        report = UserImporter(str(csv_file)).run()
+        
+        assert report['resumed_from_record'] == 4
+        assert report['processed'] == 2
+        assert [u.email for u in User.query.all()] == ['erin@example.com']
+    
+    def test_import_ndjson(self, client, tmp_path):
+        """Test NDJSON input including a malformed line"""
+        path = tmp_path / 'partner.ndjson'
+        path.write_text('{"name": "Alice", "email": "alice@example.com"}\n{broken\n\n')
+        
+        report = UserImporter(str(path)).run()
+        
+        assert report['inserted'] == 1
+        assert report['rejected'] == 1
+    
+    def test_existing_email_in_other_case_is_duplicate(self, client, tmp_path):
+        """Test accounts stored with mixed-case emails are matched by the lower-cased import"""
+        db.session.add(User(name='Foo', email='Foo@Example.com'))
+        db.session.commit()
+        path = tmp_path / 'partner.ndjson'
+        path.write_text('{"name": "Foo", "email": "foo@example.com"}\n{"name": "Bar", "email": "BAR@example.com"}\n')
+        
+        report = UserImporter(str(path)).run()
+        
+        assert (report['inserted'], report['duplicates']) == (1, 1)
+        assert sorted(u.email for u in User.query.all()) == ['Foo@Example.com', 'bar@example.com']
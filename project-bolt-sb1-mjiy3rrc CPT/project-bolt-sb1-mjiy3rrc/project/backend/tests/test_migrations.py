@@ -0,0 +1,76 @@
+"""
+Migration tests: the revision chain must build the schema the models declare
+"""
+import os
+import subprocess
+import sys
+
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine, text
+
+from app import db
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def flask_db(path, *args):
+    """Run `flask db ...` against a SQLite file in a fresh process"""
+    env = dict(os.environ, DATABASE_URL='sqlite:///' + str(path))
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'db', *args],
+                   cwd=BACKEND, env=env, check=True, capture_output=True)
+
+def schema_diff(engine):
+    with engine.connect() as connection:
+        return compare_metadata(MigrationContext.configure(connection), db.metadata)
+
+def test_upgrade_matches_models(tmp_path):
+    """A fresh database upgraded to head has exactly the models' schema"""
+    path = tmp_path / 'fresh.db'
+    flask_db(path, 'upgrade')
+    engine = create_engine(f'sqlite:///{path}')
+    assert schema_diff(engine) == []
+    with engine.connect() as connection:
+        # Expression indexes are not reflected, so compare_metadata skips them
+        assert connection.execute(text("SELECT name FROM sqlite_master WHERE name = 'ix_users_email_lower'")).all()
+
+def test_upgrade_from_baseline_backfills_users(tmp_path):
+    """Existing users keep working after the upgrade and get their tier from total_sent"""
+    path = tmp_path / 'baseline.db'
+    flask_db(path, 'upgrade', '0001')
+    engine = create_engine(f'sqlite:///{path}')
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO users (name, email, password_hash, balance, points, total_sent, is_active) "
+            "VALUES ('Gold', 'gold@example.com', 'x', 0, 0, 60000, 1), "
+            "('Silver', 'silver@example.com', 'x', 0, 0, 25000, 1), "
+            "('Bronze', 'bronze@example.com', 'x', 0, 0, 10, 1)"))
+
+    flask_db(path, 'upgrade')
+
+    assert schema_diff(engine) == []
+    with engine.connect() as connection:
+        rows = connection.execute(text('SELECT name, tier, token_version FROM users ORDER BY id')).all()
+    assert [tuple(row) for row in rows] == [('Gold', 'Gold', 0), ('Silver', 'Silver', 0), ('Bronze', 'Bronze', 0)]
+
+def test_upgrade_backfills_transfer_tiers_from_history(tmp_path):
+    """Existing transfers get the tier their sender had at the time, not the current one"""
+    path = tmp_path / 'history.db'
+    flask_db(path, 'upgrade', '0004')
+    engine = create_engine(f'sqlite:///{path}')
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO users (id, name, email, password_hash, balance, points, total_sent, is_active, "
+            "tier, token_version, is_admin) VALUES (1, 'U', 'u@example.com', 'x', 0, 0, 60000, 1, 'Gold', 0, 0)"))
+        connection.execute(text(
+            "INSERT INTO user_tier_history (user_id, old_tier, new_tier, total_sent_at_change, created_at) "
+            "VALUES (1, 'Bronze', 'Silver', 20000, '2024-02-01'), (1, 'Silver', 'Gold', 50000, '2024-04-01')"))
+        connection.execute(text(
+            "INSERT INTO transactions (user_id, transaction_type, amount, reference, created_at) "
+            "VALUES (1, 'send', 10, 'A', '2024-01-15'), (1, 'send', 10, 'B', '2024-03-15'), "
+            "(1, 'send', 10, 'C', '2024-05-15'), (1, 'bonus', 0, 'D', '2024-05-15')"))
+
+    flask_db(path, 'upgrade')
+
+    with engine.connect() as connection:
+        tiers = connection.execute(text('SELECT reference, tier FROM transactions ORDER BY id')).all()
+    assert [tuple(row) for row in tiers] == [('A', 'Bronze'), ('B', 'Silver'), ('C', 'Gold'), ('D', None)]
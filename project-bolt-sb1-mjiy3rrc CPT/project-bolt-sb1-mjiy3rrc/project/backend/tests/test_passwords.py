@@ -0,0 +1,132 @@
+"""
+Unit tests for pooled password hashing
+"""
+import threading
+import pytest
+from werkzeug.security import generate_password_hash
+import passwords
+from app import db
+from models import User
+from passwords import HasherBusy, PasswordHasher, password_hasher
+from services import UserService
+
+@pytest.fixture
+def hasher():
+    """A cheap hasher for fast tests"""
+    return PasswordHasher('pbkdf2:sha256:2000', workers=1, max_pending=0, wait_seconds=0.05)
+
+def login(client, password='secret', email='test@example.com'):
+    return client.post('/api/auth/login', json={'email': email, 'password': password})
+
+class TestPasswordHasher:
+    """Test verification, dummy hashing and backpressure"""
+    
+    def test_verify(self, hasher):
+        """Test good and bad passwords"""
+        stored = generate_password_hash('secret', 'pbkdf2:sha256:2000')
+        
+        assert hasher.verify(stored, 'secret') is True
+        assert hasher.verify(stored, 'wrong') is False
+    
+    def test_missing_hash_checks_dummy(self, hasher, monkeypatch):
+        """Test unknown users still pay for one verification of the current method"""
+        checked = []
+        monkeypatch.setattr(passwords, 'check_password_hash', lambda stored, password: checked.append(stored))
+        
+        assert hasher.verify(None, 'secret') is False
+        assert checked[0].startswith('pbkdf2:sha256:2000$')
+    
+    def test_rehash_in_background(self, hasher):
+        """Test an outdated hash is re-hashed at the current cost and handed to the store callback"""
+        stored = generate_password_hash('secret', 'pbkdf2:sha256:1000')
+        assert hasher.needs_rehash(stored)
+        upgraded = []
+        
+        hasher.rehash_in_background('secret', upgraded.append).join()
+        
+        assert upgraded[0].startswith('pbkdf2:sha256:2000$')
+        assert not hasher.needs_rehash(upgraded[0])
+        assert hasher.verify(upgraded[0], 'secret') is True
+    
+    def test_rehash_skipped_when_busy(self, hasher):
+        """Test re-hashing never waits for a slot; the upgrade is left for the next login"""
+        release = threading.Event()
+        busy = threading.Thread(target=hasher._run, args=(release.wait,))
+        busy.start()
+        try:
+            assert hasher.rehash_in_background('secret', lambda new_hash: None) is None
+        finally:
+            release.set()
+            busy.join()
+    
+    def test_backpressure(self, hasher):
+        """Test work beyond the pool and queue bound fails fast"""
+        release = threading.Event()
+        busy = threading.Thread(target=hasher._run, args=(release.wait,))
+        busy.start()
+        try:
+            with pytest.raises(HasherBusy):
+                hasher.verify(None, 'secret')
+        finally:
+            release.set()
+            busy.join()
+        
+        assert hasher.verify(None, 'secret') is False
+
+class TestLogin:
+    """Test the login endpoint's use of the hasher"""
+    
+    @pytest.fixture(autouse=True)
+    def cheap_hashing(self, monkeypatch):
+        monkeypatch.setattr(password_hasher, 'method', 'pbkdf2:sha256:2000')
+        monkeypatch.setattr(password_hasher, '_dummy_hash', None)
+        monkeypatch.setattr(password_hasher, '_prefix', None)
+    
+    def test_login_upgrades_stored_hash(self, client, monkeypatch):
+        """Test a successful login rewrites an outdated hash in the background"""
+        rehashes = []
+        rehash_in_background = password_hasher.rehash_in_background
+        monkeypatch.setattr(password_hasher, 'rehash_in_background',
+                            lambda *args: rehashes.append(rehash_in_background(*args)))
+        user = User(name='Test User', email='test@example.com',
+                    password_hash=generate_password_hash('secret', 'pbkdf2:sha256:1000'))
+        db.session.add(user)
+        db.session.commit()
+        
+        assert login(client, 'wrong').status_code == 401
+        assert login(client).status_code == 200
+        
+        assert len(rehashes) == 1
+        rehashes[0].join()
+        db.session.refresh(user)
+        assert user.password_hash.startswith('pbkdf2:sha256:2000$')
+        assert login(client).status_code == 200
+        assert len(rehashes) == 1
+    
+    def test_rehash_keeps_newer_password(self, client):
+        """Test a re-hash finishing after a password change does not overwrite it"""
+        user = User(name='Test User', email='test@example.com', password_hash='pbkdf2:sha256:2000$new')
+        db.session.add(user)
+        db.session.commit()
+        
+        assert not UserService.replace_password_hash(user.id, 'pbkdf2:sha256:1000$old', 'pbkdf2:sha256:2000$re')
+        db.session.refresh(user)
+        assert user.password_hash == 'pbkdf2:sha256:2000$new'
+    
+    def test_unknown_email(self, client):
+        """Test unknown emails get the same answer as wrong passwords"""
+        response = login(client, email='nobody@example.com')
+        
+        assert response.status_code == 401
+        assert response.get_json()['message'] == 'Invalid credentials'
+    
+    def test_busy_returns_503(self, client, monkeypatch):
+        """Test a saturated pool sheds logins with Retry-After"""
+        def busy(stored_hash, password):
+            raise HasherBusy()
+        monkeypatch.setattr(password_hasher, 'verify', busy)
+        
+        response = login(client)
+        
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
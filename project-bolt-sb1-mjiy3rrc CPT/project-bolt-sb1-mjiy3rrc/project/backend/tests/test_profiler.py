@@ -0,0 +1,101 @@
+"""
+Unit tests for the sampled request profiler
+"""
+import os
+import sys
+import time
+from collections import Counter
+import pytest
+from flask import Flask
+from config import Config
+from profiler import collapse_stack, init_profiler, merge_profiles, profile_files, write_folded
+
+@pytest.fixture
+def profiled_app(tmp_path, monkeypatch):
+    """A minimal app with profiling enabled for every request"""
+    monkeypatch.setattr(Config, 'PROFILE_ENABLED', True)
+    monkeypatch.setattr(Config, 'PROFILE_SAMPLE_RATE', 1.0)
+    monkeypatch.setattr(Config, 'PROFILE_DIR', str(tmp_path))
+    monkeypatch.setattr(Config, 'PROFILE_MAX_FILES', 2)
+    
+    app = Flask(__name__)
+    
+    @app.route('/slow')
+    def slow():
+        deadline = time.perf_counter() + 0.05
+        while time.perf_counter() < deadline:
+            pass
+        return 'ok'
+    
+    @app.route('/outer')
+    def outer():
+        # A nested request on the same thread, as a second greenlet would be
+        assert app.test_client().get('/slow').status_code == 200
+        return 'ok'
+    
+    init_profiler(app)
+    return app
+
+class TestProfiler:
+    """Test profile capture, rotation and merging"""
+    
+    def test_disabled_installs_no_hooks(self, monkeypatch):
+        """Test a disabled profiler adds nothing to the request path"""
+        monkeypatch.setattr(Config, 'PROFILE_ENABLED', False)
+        app = Flask(__name__)
+        init_profiler(app)
+        
+        assert not app.before_request_funcs and not app.teardown_request_funcs
+    
+    def test_collapse_stack_is_root_first(self):
+        """Test stacks render outermost frame first"""
+        stack = collapse_stack(sys._getframe())
+        
+        assert stack.split(';')[-1].startswith('test_collapse_stack_is_root_first (test_profiler.py:')
+        assert stack.count(';') > 1
+    
+    def test_sampler_writes_rotated_folded_files(self, profiled_app):
+        """Test sampled requests write per-route collapsed stacks, keeping the newest files"""
+        client = profiled_app.test_client()
+        for _ in range(3):
+            assert client.get('/slow').status_code == 200
+        
+        files = profile_files('slow')
+        assert len(files) == 2
+        with open(files[0]) as handle:
+            assert 'slow (test_profiler.py' in handle.read()
+    
+    def test_cprofile_mode_writes_pstats(self, profiled_app, monkeypatch):
+        """Test cProfile mode writes loadable pstats dumps"""
+        monkeypatch.setattr(Config, 'PROFILE_MODE', 'cprofile')
+        profiled_app.test_client().get('/slow')
+        
+        report = merge_profiles(profile_files('slow', '.pstats'), os.path.join(Config.PROFILE_DIR, 'merged.pstats'),
+                                'pstats')
+        assert report['files'] == 1
+        assert report['total_seconds'] > 0
+    
+    @pytest.mark.parametrize('mode', ['sampler', 'cprofile'])
+    def test_one_profiled_request_per_thread(self, profiled_app, monkeypatch, mode):
+        """Test a request starting on a thread that is already being profiled is left unprofiled"""
+        monkeypatch.setattr(Config, 'PROFILE_MODE', mode)
+        
+        assert profiled_app.test_client().get('/outer').status_code == 200
+        
+        suffix = '.pstats' if mode == 'cprofile' else '.folded'
+        assert len(profile_files('outer', suffix)) == 1
+        assert profile_files('slow', suffix) == []
+        assert profiled_app.test_client().get('/slow').status_code == 200
+        assert len(profile_files('slow', suffix)) == 1
+    
+    def test_merge_folded(self, tmp_path):
+        """Test merging sums samples per stack"""
+        first, second = str(tmp_path / 'a.folded'), str(tmp_path / 'b.folded')
+        write_folded(first, Counter({'main;send': 3, 'main;commit': 1}))
+        write_folded(second, Counter({'main;send': 2}))
+        
+        report = merge_profiles([first, second], str(tmp_path / 'merged.folded'))
+        
+        assert report['samples'] == 6
+        with open(tmp_path / 'merged.folded') as handle:
+            assert handle.readline() == 'main;send 5\n'
@@ -0,0 +1,129 @@
+"""
+Unit tests for token-bucket rate limiting
+"""
+import time
+import pytest
+import redis
+from app import app, db
+from models import User
+from ratelimit import LocalBucketStore, RedisBucketStore, RateLimiter, limiter
+
+LIMITS = {
+    'send_money': {
+        'per_ip': (4, 60),
+        'per_user': {'Bronze': (2, 60), 'Gold': (3, 60)}
+    }
+}
+
+class TestTokenBuckets:
+    """Test bucket arithmetic and limiter policy"""
+    
+    def test_burst_then_reject_then_refill(self):
+        """Test a bucket allows its burst, rejects, then refills over time"""
+        store = LocalBucketStore()
+        
+        assert store.take('k', capacity=2, rate=1000)[0]
+        assert store.take('k', capacity=2, rate=1000)[0]
+        allowed, retry_after = store.take('k', capacity=2, rate=1000)
+        assert not allowed
+        assert 0 < retry_after <= 0.001
+        
+        time.sleep(0.002)
+        assert store.take('k', capacity=2, rate=1000)[0]
+    
+    def test_limits_per_tier(self):
+        """Test higher tiers get larger per-user buckets"""
+        rate_limiter = RateLimiter(LocalBucketStore(), LIMITS)
+        
+        bronze = [rate_limiter.check('send_money', 1, 'Bronze', None)[0] for _ in range(4)]
+        gold = [rate_limiter.check('send_money', 2, 'Gold', None)[0] for _ in range(4)]
+        
+        assert bronze == [True, True, False, False]
+        assert gold == [True, True, True, False]
+    
+    def test_limits_per_ip(self):
+        """Test one IP cannot exceed its bucket across many users"""
+        rate_limiter = RateLimiter(LocalBucketStore(), LIMITS)
+        
+        results = [rate_limiter.check('send_money', user_id, 'Bronze', '10.0.0.1')[0] for user_id in range(6)]
+        
+        assert results == [True] * 4 + [False] * 2
+    
+    def test_unlimited_route(self):
+        """Test routes without configured limits pass through"""
+        rate_limiter = RateLimiter(LocalBucketStore(), LIMITS)
+        assert rate_limiter.check('get_rewards', 1, 'Bronze', '10.0.0.1') == (True, 0.0)
+    
+    def test_redis_outage_falls_back_to_local(self):
+        """Test an unreachable Redis degrades to local buckets"""
+        store = RedisBucketStore('redis://127.0.0.1:1/0')
+        
+        assert store.take('k', capacity=1, rate=1)[0]
+        assert not store.take('k', capacity=1, rate=1)[0]
+    
+    def test_redis_buckets_shared_between_workers(self, monkeypatch):
+        """Test the Lua script refills, rejects and expires buckets shared by every worker"""
+        fakeredis = pytest.importorskip('fakeredis')
+        server = fakeredis.FakeServer()
+        monkeypatch.setattr(redis.Redis, 'from_url',
+                            lambda url, **kwargs: fakeredis.FakeRedis(server=server))
+        first, second = RedisBucketStore('redis://shared'), RedisBucketStore('redis://shared')
+        
+        assert first.take('rl:k', capacity=2, rate=1) == (True, 0.0)
+        assert second.take('rl:k', capacity=2, rate=1) == (True, 0.0)
+        allowed, retry_after = first.take('rl:k', capacity=2, rate=1)
+        
+        assert not allowed and 0 < retry_after <= 1
+        assert 0 < first._redis.ttl('rl:k') <= 3
+        assert first.fallback._buckets == {}  # never fell back
+        
+        time.sleep(0.2)
+        assert second.take('rl:k', capacity=2, rate=5)[0]  # refilled at the new rate
+    
+    def test_check_overhead(self):
+        """Test an in-process check stays far below a millisecond"""
+        rate_limiter = RateLimiter(LocalBucketStore(), LIMITS)
+        
+        started = time.perf_counter()
+        for i in range(10000):
+            rate_limiter.check('send_money', i % 500, 'Bronze', '10.0.%d.1' % (i % 200))
+        per_check = (time.perf_counter() - started) / 10000
+        
+        assert per_check < 0.0005
+
+class TestRateLimitedRoutes:
+    """Test the decorator on money-moving routes"""
+    
+    def test_send_money_returns_429(self, client, monkeypatch):
+        """Test bursts beyond the user's bucket are rejected with Retry-After"""
+        monkeypatch.setattr(limiter, 'limits', LIMITS)
+        user = User(name='Test User', email='test@example.com', balance=5000.0)
+        db.session.add(user)
+        db.session.commit()
+        with client.session_transaction() as sess:
+            sess['user_id'] = user.id
+            sess['tier'] = 'Bronze'
+        
+        payload = {'amount': 100, 'recipient': 'Test Recipient'}
+        statuses = [client.post('/api/send-money', json=payload).status_code for _ in range(3)]
+        
+        assert statuses == [200, 200, 429]
+        assert int(client.post('/api/send-money', json=payload).headers['Retry-After']) >= 1
+    
+    def test_per_ip_limit_uses_forwarded_client(self, client, monkeypatch):
+        """Test clients behind the trusted proxy get their own IP buckets"""
+        monkeypatch.setattr(limiter, 'limits', {'send_money': {'per_ip': (1, 1)}})
+        monkeypatch.setattr(app.wsgi_app, 'x_for', 1)
+        user = User(name='Test User', email='test@example.com', balance=5000.0)
+        db.session.add(user)
+        db.session.commit()
+        with client.session_transaction() as sess:
+            sess['user_id'] = user.id
+        
+        def send(client_ip):
+            return client.post('/api/send-money', json={'amount': 100, 'recipient': 'Test Recipient'},
+                               headers={'X-Forwarded-For': client_ip}).status_code
+        
+        assert send('203.0.113.1') == 200
+        assert send('203.0.113.1') == 429
+        assert send('203.0.113.2') == 200
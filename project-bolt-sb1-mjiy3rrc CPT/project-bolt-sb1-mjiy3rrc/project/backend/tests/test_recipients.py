@@ -0,0 +1,62 @@
+"""
+Unit tests for the frequent-recipient index
+"""
+from datetime import datetime
+import pytest
+from app import db
+from models import Transaction, FrequentRecipient
+from recipients import rebuild_recipient_index
+from services import TransactionService, RecipientService
+
+pytestmark = pytest.mark.user(balance=100000.0, points=0)
+
+class TestRecipientIndex:
+    """Test index maintenance and prefix search"""
+    
+    def test_send_money_updates_index(self, sample_user):
+        """Test repeat transfers fold into one entry per recipient"""
+        TransactionService.send_money(sample_user.id, 100.0, 'John Doe', '+27 82 123 4567')
+        TransactionService.send_money(sample_user.id, 200.0, 'Johnny Doe', '+27821234567')
+        TransactionService.send_money(sample_user.id, 50.0, 'Jane Smith')
+        
+        entries = {entry.name: entry for entry in FrequentRecipient.query.all()}
+        assert set(entries) == {'Johnny Doe', 'Jane Smith'}
+        assert entries['Johnny Doe'].transfer_count == 2
+        assert entries['Johnny Doe'].total_sent == 300.0
+    
+    def test_suggest_by_name_and_phone_prefix(self, sample_user):
+        """Test prefix search ranks by frequency"""
+        TransactionService.send_money(sample_user.id, 100.0, 'John Doe', '+27821234567')
+        for _ in range(2):
+            TransactionService.send_money(sample_user.id, 100.0, 'Joanna Banda', '+263771234567')
+        TransactionService.send_money(sample_user.id, 100.0, 'Peter Phiri')
+        
+        assert [r['name'] for r in RecipientService.suggest(sample_user.id, 'jo')] == ['Joanna Banda', 'John Doe']
+        assert [r['name'] for r in RecipientService.suggest(sample_user.id, '+263 77')] == ['Joanna Banda']
+        assert RecipientService.suggest(sample_user.id, 'j%') == []
+        assert len(RecipientService.suggest(sample_user.id, '', limit=2)) == 2
+    
+    def test_suggest_endpoint(self, client, sample_user):
+        """Test the autocomplete endpoint serves the logged-in user's index"""
+        TransactionService.send_money(sample_user.id, 100.0, 'John Doe')
+        assert client.get('/api/recipients/suggest?q=jo').status_code == 401
+        
+        with client.session_transaction() as sess:
+            sess['user_id'] = sample_user.id
+        response = client.get('/api/recipients/suggest?q=jo')
+        
+        assert response.status_code == 200
+        assert response.get_json()[0]['name'] == 'John Doe'
+    
+    def test_rebuild_from_history(self, sample_user):
+        """Test the rebuild job reproduces the index from transactions"""
+        for day, name in ((1, 'john doe'), (2, 'John  Doe'), (3, 'Jane Smith')):
+            db.session.add(Transaction(user_id=sample_user.id, transaction_type='send', amount=100.0,
+                                       recipient=name, status='completed', created_at=datetime(2024, 6, day)))
+        db.session.commit()
+        
+        report = rebuild_recipient_index(chunk_size=1)
+        
+        assert report['recipients_indexed'] == 2
+        john = FrequentRecipient.query.filter_by(recipient_key='john doe').one()
+        assert (john.name, john.transfer_count, john.last_sent_at) == ('John  Doe', 2, datetime(2024, 6, 2))
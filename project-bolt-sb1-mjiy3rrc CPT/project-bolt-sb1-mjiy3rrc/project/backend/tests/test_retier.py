@@ -0,0 +1,60 @@
+"""
+Unit tests for bulk re-tiering
+"""
+import pytest
+from app import db
+from config import Config
+from models import User, UserTierHistory, JobCheckpoint
+from retier import retier_users, CHECKPOINT_NAME
+
+@pytest.fixture
+def users(client):
+    """Create users spread across the default tiers"""
+    for i, total_sent in enumerate([1000, 18000, 22000, 30000, 45000, 60000]):
+        db.session.add(User(name=f'User {i}', email=f'user{i}@example.com', total_sent=total_sent))
+    db.session.commit()
+
+class TestRetier:
+    """Test set-based re-tiering after threshold changes"""
+    
+    def test_no_changes(self, users):
+        """Test unchanged thresholds write nothing"""
+        report = retier_users(chunk_size=2)
+        
+        assert report['changed'] == 0
+        assert UserTierHistory.query.count() == 0
+    
+    def test_dry_run_reports_transitions(self, users, monkeypatch):
+        """Test dry run counts transitions without writing"""
+        monkeypatch.setattr(Config, 'SILVER_THRESHOLD', 15000)
+        monkeypatch.setattr(Config, 'GOLD_THRESHOLD', 40000)
+        
+        report = retier_users(chunk_size=4, dry_run=True)
+        
+        assert report['transitions'] == {'Bronze->Silver': 1, 'Silver->Gold': 1}
+        assert UserTierHistory.query.count() == 0
+        assert User.query.filter_by(tier='Gold').count() == 1
+    
+    def test_retier_writes_history_for_changed_users(self, users, monkeypatch):
+        """Test tiers are updated and history written in bulk"""
+        monkeypatch.setattr(Config, 'SILVER_THRESHOLD', 25000)
+        
+        report = retier_users(chunk_size=4)
+        
+        assert report['changed'] == 1
+        history = UserTierHistory.query.one()
+        assert (history.old_tier, history.new_tier, history.total_sent_at_change) == ('Silver', 'Bronze', 22000)
+        assert User.query.filter(User.tier != User.computed_tier).count() == 0
+        assert db.session.get(JobCheckpoint, CHECKPOINT_NAME) is None
+    
+    def test_resume_from_checkpoint(self, users, monkeypatch):
+        """Test an interrupted run resumes after the last committed chunk"""
+        monkeypatch.setattr(Config, 'SILVER_THRESHOLD', 10000)
+        db.session.add(JobCheckpoint(name=CHECKPOINT_NAME, position=3))
+        db.session.commit()
+        
+        report = retier_users(chunk_size=2)
+        
+        assert report['resumed_from_id'] == 3
+        assert report['changed'] == 0  # user 2 (18000) sits before the checkpoint
+        assert retier_users(chunk_size=2, restart=True)['changed'] == 1
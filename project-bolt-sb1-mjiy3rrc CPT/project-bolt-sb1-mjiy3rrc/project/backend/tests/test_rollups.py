@@ -0,0 +1,114 @@
+"""
+Unit tests for daily analytics rollups
+"""
+from datetime import date, datetime
+import pytest
+from app import db
+from config import Config
+from models import User, Transaction, Reward, Redemption, DailyPointsRollup
+from rollups import refresh_rollups, reprocess_days
+from services import AnalyticsService, TransactionService
+
+@pytest.fixture(autouse=True)
+def settle_immediately(monkeypatch):
+    """Roll up transactions as soon as they are written"""
+    monkeypatch.setattr(Config, 'ROLLUP_SETTLE_SECONDS', 0)
+
+@pytest.fixture
+def activity(client):
+    """Create transfers, a bonus and a redemption over two days"""
+    user = User(name='Test User', email='test@example.com', total_sent=25000)
+    reward = Reward(name='Airtime', points_cost=50, category='Airtime')
+    db.session.add_all([user, reward])
+    db.session.commit()
+    
+    _tx(user, 'send', 500, 5, datetime(2024, 5, 1, 9))
+    _tx(user, 'send', 1500, 15, datetime(2024, 5, 1, 17))
+    _tx(user, 'bonus', 0, 20, datetime(2024, 5, 2, 8))
+    _tx(user, 'reward', 0, -50, datetime(2024, 5, 2, 9))
+    db.session.add(Redemption(user_id=user.id, reward_id=reward.id, points_spent=50,
+                              created_at=datetime(2024, 5, 2, 9)))
+    db.session.commit()
+    return user
+
+def _tx(user, kind, amount, points, created_at):
+    db.session.add(Transaction(user_id=user.id, transaction_type=kind, amount=amount, tier=user.tier,
+                               points_earned=points, status='completed', created_at=created_at))
+
+class TestRollups:
+    """Test incremental folding and reprocessing"""
+    
+    def test_refresh_builds_daily_aggregates(self, activity):
+        """Test rollups cover points, categories and tiers"""
+        refresh_rollups()
+        
+        points = AnalyticsService.get_points_by_day(date(2024, 5, 1), date(2024, 5, 2))
+        assert [(p['points_issued'], p['points_redeemed']) for p in points] == [(20, 0), (20, 50)]
+        assert AnalyticsService.get_redemptions_by_category(date(2024, 5, 1), date(2024, 5, 31)) == \
+            [{'category': 'Airtime', 'redemptions': 1, 'points_spent': 50}]
+        silver = AnalyticsService.get_transfers_by_tier(date(2024, 5, 1), date(2024, 5, 1))[1]
+        assert silver == {'tier': 'Silver', 'transfers': 2, 'amount': 2000}
+    
+    def test_transfers_keep_tier_at_transfer_time(self, client):
+        """Test a later tier upgrade does not move earlier transfers to the new tier"""
+        user = User(name='Test User', email='test@example.com', balance=50000, total_sent=19000)
+        db.session.add(user)
+        db.session.commit()
+        
+        TransactionService.send_money(user.id, 500, 'Friend')
+        TransactionService.send_money(user.id, 1000, 'Friend')
+        refresh_rollups()
+        
+        today = datetime.utcnow().date()
+        assert db.session.get(User, user.id).tier == 'Silver'
+        assert AnalyticsService.get_transfers_by_tier(today, today) == [
+            {'tier': 'Bronze', 'transfers': 2, 'amount': 1500},
+            {'tier': 'Silver', 'transfers': 0, 'amount': 0}, {'tier': 'Gold', 'transfers': 0, 'amount': 0}
+        ]
+    
+    def test_refresh_is_incremental_and_folds_late_rows(self, activity):
+        """Test a second refresh only adds new rows, including ones for older days"""
+        refresh_rollups()
+        _tx(activity, 'send', 300, 3, datetime(2024, 5, 1, 23))
+        db.session.commit()
+        
+        report = refresh_rollups()
+        
+        assert report['id_range_folded'] == {'transactions': 1, 'redemptions': 0}
+        assert db.session.get(DailyPointsRollup, date(2024, 5, 1)).points_issued == 23
+        assert db.session.get(DailyPointsRollup, date(2024, 5, 1)).transactions == 3
+    
+    def test_reprocess_rebuilds_range(self, activity):
+        """Test reprocessing matches the incremental result after a correction"""
+        refresh_rollups()
+        Transaction.query.filter_by(points_earned=15).update({'points_earned': 10})
+        db.session.commit()
+        
+        reprocess_days(date(2024, 5, 1), date(2024, 5, 1))
+        
+        assert db.session.get(DailyPointsRollup, date(2024, 5, 1)).points_issued == 15
+        assert db.session.get(DailyPointsRollup, date(2024, 5, 2)).points_issued == 20
+        refresh_rollups()
+        assert db.session.get(DailyPointsRollup, date(2024, 5, 1)).points_issued == 15
+    
+    def test_analytics_endpoint(self, client, activity):
+        """Test the analytics API serves from rollups"""
+        refresh_rollups()
+        activity.is_admin = True
+        db.session.commit()
+        with client.session_transaction() as sess:
+            sess['user_id'] = activity.id
+        
+        response = client.get('/api/analytics/points?start=2024-05-01&end=2024-05-02')
+        
+        assert [p['day'] for p in response.get_json()] == ['2024-05-01', '2024-05-02']
+    
+    def test_analytics_endpoints_require_admin(self, client, activity):
+        """Test program-wide analytics are refused to regular users and cannot be batched"""
+        with client.session_transaction() as sess:
+            sess['user_id'] = activity.id
+        
+        for path in ('/api/analytics/points', '/api/analytics/redemptions', '/api/analytics/transfers'):
+            assert client.get(path).status_code == 403
+        response = client.post('/api/batch', json={'requests': [{'path': '/api/analytics/points'}]})
+        assert response.get_json()['responses'][0]['status'] == 400
@@ -0,0 +1,95 @@
+"""
+Unit tests for reward search
+"""
+import pytest
+from app import db
+from models import User, Reward
+from services import RewardService
+
+@pytest.fixture
+def catalogue(client):
+    """Create a small catalogue"""
+    for name, description, cost, category in (
+            ('Airtime Voucher', 'Prepaid airtime for any network', 200, 'Airtime'),
+            ('Data Bundle 1GB', 'Mobile data valid for 30 days', 450, 'Airtime'),
+            ('Grocery Voucher', 'Spend at partner supermarkets', 800, 'Groceries'),
+            ('Premium Grocery Hamper', 'A hamper of pantry staples', 3000, 'Groceries'),
+            ('Movie Tickets', 'Two tickets, airtime not included', 600, 'Entertainment')):
+        db.session.add(Reward(name=name, description=description, points_cost=cost, category=category))
+    db.session.add(Reward(name='Retired Voucher', description='Gone', points_cost=100, category='Airtime',
+                          is_available=False))
+    db.session.commit()
+
+class TestRewardSearch:
+    """Test text search, filters, facets and index rebuilds"""
+    
+    def test_text_search_ranks_name_matches_first(self, catalogue):
+        """Test tokens match name, description or category; name hits rank first"""
+        result = RewardService.search_rewards('airtime ')
+        
+        assert [r['name'] for r in result['rewards']] == ['Airtime Voucher', 'Data Bundle 1GB', 'Movie Tickets']
+        assert result['total'] == 3
+    
+    def test_prefix_matches_last_term(self, catalogue):
+        """Test the word being typed matches by prefix"""
+        assert [r['name'] for r in RewardService.search_rewards('groc')['rewards']] == \
+            ['Grocery Voucher', 'Premium Grocery Hamper']
+        assert RewardService.search_rewards('groc ')['total'] == 0
+    
+    def test_filters_and_facets(self, catalogue):
+        """Test facets ignore their own filter"""
+        result = RewardService.search_rewards(category='Groceries', max_points=1000)
+        
+        assert [r['name'] for r in result['rewards']] == ['Grocery Voucher']
+        assert result['facets']['categories'] == {'Airtime': 2, 'Entertainment': 1, 'Groceries': 1}
+        assert result['facets']['price_bands'] == {'500-999': 1, '2500-4999': 1}
+    
+    def test_paging(self, catalogue):
+        """Test results are paged cheapest first"""
+        result = RewardService.search_rewards(page=2, per_page=2)
+        
+        assert [r['pointsCost'] for r in result['rewards']] == [600, 800]
+        assert (result['total'], result['pages']) == (5, 3)
+    
+    def test_rebuilds_on_catalogue_change(self, catalogue):
+        """Test a catalogue change makes new rewards searchable"""
+        assert RewardService.search_rewards('spa')['total'] == 0
+        db.session.add(Reward(name='Spa Day', points_cost=5000, category='Lifestyle'))
+        db.session.commit()
+        
+        assert RewardService.search_rewards('spa')['total'] == 1
+    
+    def test_affordable_endpoint(self, client, catalogue):
+        """Test affordable filtering uses the logged-in user's points"""
+        user = User(name='Test User', email='test@example.com', points=500)
+        db.session.add(user)
+        db.session.commit()
+        assert client.get('/api/rewards/search?affordable=true').status_code == 401
+        
+        with client.session_transaction() as sess:
+            sess['user_id'] = user.id
+        response = client.get('/api/rewards/search?affordable=true')
+        
+        assert [r['pointsCost'] for r in response.get_json()['rewards']] == [200, 450]
+    
+    def test_endpoint_clamps_paging(self, client, catalogue):
+        """Test zero or negative page sizes and pages fall back to the first page of one"""
+        response = client.get('/api/rewards/search?per_page=0&page=-3')
+        
+        assert response.status_code == 200
+        result = response.get_json()
+        assert (len(result['rewards']), result['page'], result['pages']) == (1, 1, 5)
+    
+    def test_affordable_endpoint_deleted_user(self, client, catalogue):
+        """Test a user deleted while their identity is still cached gets 404"""
+        user = User(name='Test User', email='test@example.com', points=500)
+        db.session.add(user)
+        db.session.commit()
+        with client.session_transaction() as sess:
+            sess['user_id'] = user.id
+        assert client.get('/api/rewards/search?affordable=true').status_code == 200
+        
+        db.session.delete(user)
+        db.session.commit()
+        
+        assert client.get('/api/rewards/search?affordable=true').status_code == 404
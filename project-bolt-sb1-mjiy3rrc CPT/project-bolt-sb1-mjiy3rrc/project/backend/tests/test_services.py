@@ -3,35 +3,11 @@ Unit tests for service layer
 """
 import pytest
 from datetime import datetime, timedelta
-from app import app, db
+from app import db
 from models import User, Transaction, Reward, Redemption
+from config import Config
 from services import UserService, TransactionService, RewardService, LoyaltyService
 
-@pytest.fixture
-def client():
-    """Create test client"""
-    app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-    
-    with app.test_client() as client:
-        with app.app_context():
-            db.create_all()
-            yield client
-            db.drop_all()
-
-@pytest.fixture
-def sample_user():
-    """Create sample user for testing"""
-    user = User(
-        name='Test User',
-        email='test@example.com',
-        balance=5000.0,
-        points=100
-    )
-    db.session.add(user)
-    db.session.commit()
-    return user
-
 @pytest.fixture
 def sample_reward():
     """Create sample reward for testing"""
@@ -273,6 +249,27 @@ class TestLoyaltyService:
         assert leaderboard[0]['rank'] == 1
         assert leaderboard[1]['points'] == 400
         assert leaderboard[2]['points'] == 300
+    
+    def test_tier_counts_and_filter(self, client):
+        """Test tier counts and filters are answered from the stored tier column"""
+        for i, total_sent in enumerate([0, 25000, 60000, 70000]):
+            db.session.add(User(name=f'User {i}', email=f'user{i}@example.com', total_sent=total_sent))
+        db.session.commit()
+        
+        assert LoyaltyService.get_tier_counts() == {'Bronze': 1, 'Silver': 1, 'Gold': 2}
+        gold = LoyaltyService.get_users_by_tier('Gold')
+        assert gold['total'] == 2
+        assert gold['users'][0]['total_sent'] == 70000
+    
+    def test_computed_tier_follows_config(self, client, monkeypatch):
+        """Test SQL tier expression uses the configured thresholds"""
+        db.session.add(User(name='Test User', email='test@example.com', total_sent=30000))
+        db.session.commit()
+        
+        assert db.session.query(User.computed_tier).scalar() == 'Silver'
+        monkeypatch.setattr(Config, 'GOLD_THRESHOLD', 25000)
+        assert db.session.query(User.computed_tier).scalar() == 'Gold'
+        assert User.query.filter(User.tier != User.computed_tier).count() == 1
 
 if __name__ == '__main__':
     pytest.main([__file__])
\ No newline at end of file
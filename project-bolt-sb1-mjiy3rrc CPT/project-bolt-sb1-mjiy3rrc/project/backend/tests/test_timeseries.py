@@ -0,0 +1,136 @@
+"""
+Unit tests for per-user activity time series
+"""
+from array import array
+from datetime import date, datetime
+import pytest
+import timeseries
+from app import db
+from expiry import expire_points
+from models import Reward, Transaction, UserDailyActivity
+from services import TransactionService, RewardService, LoyaltyService, AnalyticsService
+from timeseries import bucket_starts, downsample, get_activity_series, rebuild_activity
+
+pytestmark = pytest.mark.user(balance=100000.0, points=0)
+
+def add_history(user_id, rows):
+    """Insert completed transactions and rebuild the activity table from them"""
+    for created_at, transaction_type, amount, points in rows:
+        db.session.add(Transaction(user_id=user_id, transaction_type=transaction_type, amount=amount,
+                                   points_earned=points, status='completed', created_at=created_at,
+                                   completed_at=created_at))
+    db.session.commit()
+    rebuild_activity()
+
+class TestActivityMaintenance:
+    """Test the write paths keep daily activity current"""
+    
+    def test_write_paths_fold_into_today(self, sample_user):
+        """Test sends, bonuses and redemptions land in one row for the day"""
+        reward = Reward(name='Voucher', points_cost=5, category='Shopping')
+        db.session.add(reward)
+        db.session.commit()
+        
+        TransactionService.send_money(sample_user.id, 1000.0, 'John Doe')
+        TransactionService.send_money(sample_user.id, 500.0, 'Jane Smith')
+        LoyaltyService.award_bonus_points(sample_user.id, 20, 'Welcome')
+        RewardService.redeem_reward(sample_user.id, reward.id)
+        
+        row = UserDailyActivity.query.one()
+        assert row.day == datetime.utcnow().date()
+        assert (row.points_earned, row.points_spent, row.amount_sent, row.transfers) == (35, 5, 1500.0, 2)
+    
+    def test_expiry_counts_expired_points(self, sample_user):
+        """Test the expiry job records expired points separately from spending"""
+        LoyaltyService.award_bonus_points(sample_user.id, 40, 'Welcome')
+        now = datetime(2100, 1, 1)
+        
+        expire_points(now)
+        
+        expired = UserDailyActivity.query.filter_by(day=now.date()).one()
+        assert (expired.points_expired, expired.points_spent) == (40, 0)
+    
+    def test_rebuild_matches_incremental(self, sample_user):
+        """Test rebuilding from history reproduces the incrementally maintained rows"""
+        TransactionService.send_money(sample_user.id, 1000.0, 'John Doe')
+        LoyaltyService.award_bonus_points(sample_user.id, 20, 'Welcome')
+        incremental = [(r.day, r.points_earned, r.amount_sent, r.transfers) for r in UserDailyActivity.query]
+        
+        rebuild_activity(chunk_size=1)
+        
+        assert [(r.day, r.points_earned, r.amount_sent, r.transfers) for r in UserDailyActivity.query] == incremental
+
+class TestActivitySeries:
+    """Test bucketing and downsampling"""
+    
+    def test_week_buckets_are_dense_and_clipped(self, sample_user):
+        """Test every bucket is returned and only in-range days are counted"""
+        add_history(sample_user.id, [
+            (datetime(2024, 6, 2, 12), 'send', 900.0, 9),    # Sunday before the range
+            (datetime(2024, 6, 3, 9), 'send', 100.0, 1),     # Monday
+            (datetime(2024, 6, 9, 18), 'reward', 0.0, -50),  # Sunday, same week
+            (datetime(2024, 6, 20, 8), 'send', 300.0, 3),
+        ])
+        
+        result = get_activity_series(sample_user.id, date(2024, 6, 3), date(2024, 6, 23), 'week')
+        
+        assert [point['start'] for point in result['series']] == ['2024-06-03', '2024-06-10', '2024-06-17']
+        assert [(p['points_earned'], p['points_spent'], p['amount_sent']) for p in result['series']] == \
+            [(1, 50, 100.0), (0, 0, 0.0), (3, 0, 300.0)]
+        assert result['totals']['transfers'] == 2
+    
+    def test_auto_bucket_downsamples_long_ranges(self, sample_user):
+        """Test long ranges fall back to coarser buckets"""
+        add_history(sample_user.id, [(datetime(2020, 3, 15), 'send', 100.0, 1),
+                                     (datetime(2024, 3, 1), 'send', 200.0, 2)])
+        
+        result = AnalyticsService.get_user_activity(sample_user.id, date(2020, 1, 1), date(2024, 12, 31))
+        
+        assert result['bucket'] == 'week'
+        assert result['totals']['amount_sent'] == 300.0
+        assert AnalyticsService.get_user_activity(sample_user.id, date(2000, 1, 1), date(2024, 12, 31))['bucket'] \
+            == 'month'
+        with pytest.raises(ValueError):
+            get_activity_series(sample_user.id, date(2020, 1, 1), date(2024, 12, 31), 'day')
+    
+    def test_month_buckets(self):
+        """Test month starts step correctly across year ends"""
+        assert bucket_starts(date(2023, 11, 15), date(2024, 2, 1), 'month') == \
+            [date(2023, 11, 1), date(2023, 12, 1), date(2024, 1, 1), date(2024, 2, 1)]
+    
+    def test_extreme_ranges_are_rejected_cheaply(self, client, sample_user):
+        """Test ranges spanning the whole calendar are refused before any bucket dates are built"""
+        with client.session_transaction() as sess:
+            sess['user_id'] = sample_user.id
+        
+        for bucket in ('day', 'week', 'month', 'auto'):
+            response = client.get(f'/api/user/activity?start=0001-01-01&end=9999-12-31&bucket={bucket}')
+            assert response.status_code == 400
+        assert client.get('/api/user/activity?end=0001-01-05').status_code == 400
+        response = client.get('/api/user/activity?start=9999-12-01&end=9999-12-31&bucket=month')
+        assert response.status_code == 200 and len(response.get_json()['series']) == 1
+        assert bucket_starts(date(9999, 12, 20), date(9999, 12, 31), 'week') == \
+            [date(9999, 12, 20), date(9999, 12, 27)]
+    
+    def test_python_fallback_matches(self, monkeypatch):
+        """Test the pure Python downsampling path bins like the vectorized one"""
+        monkeypatch.setattr(timeseries, 'numpy', None)
+        ordinals = array('q', [10, 11, 17, 30])
+        sums = downsample(ordinals, {'x': array('d', [1, 2, 3, 4])}, [10, 17, 24])
+        
+        assert sums['x'] == [3.0, 3.0, 4.0]
+    
+    def test_endpoint(self, client, sample_user):
+        """Test the activity endpoint serves the logged-in user's series"""
+        assert client.get('/api/user/activity').status_code == 401
+        with client.session_transaction() as sess:
+            sess['user_id'] = sample_user.id
+        TransactionService.send_money(sample_user.id, 1000.0, 'John Doe')
+        
+        response = client.get('/api/user/activity?bucket=day')
+        
+        assert response.status_code == 200
+        body = response.get_json()
+        assert len(body['series']) == 30 and body['series'][-1]['amount_sent'] == 1000.0
+        assert client.get('/api/user/activity?bucket=year').status_code == 400
+        assert client.get('/api/user/activity?start=2024-02-01&end=2024-01-01').status_code == 400
@@ -0,0 +1,148 @@
+"""
+Unit tests for sliding-window velocity limits
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+import pytest
+from app import db
+from models import Transaction
+from services import TransactionService
+from velocity import LocalWindowStore, VelocityTracker, velocity_tracker, recipient_key
+
+LIMITS = {
+    'per_user': [{'window': 3600, 'max_count': 3, 'max_amount': 1000}],
+    'per_recipient': [{'window': 3600, 'max_count': 2, 'max_amount': 1000}]
+}
+
+pytestmark = pytest.mark.user(balance=50000.0, points=0)
+
+class TestLocalWindowStore:
+    """Test bucketed sliding windows"""
+    
+    def test_totals_slide_out(self):
+        """Test transfers leave the window once it has moved past them"""
+        store = LocalWindowStore(buckets_per_window=60)
+        store.add('u:1', 3600, 100, ts=0)
+        store.add('u:1', 3600, 200, ts=1800)
+        
+        assert store.totals('u:1', 3600, now=1800) == (2, 300)
+        assert store.totals('u:1', 3600, now=3700) == (1, 200)
+        assert store.totals('u:1', 3600, now=9000) == (0, 0)
+    
+    def test_expired_windows_swept(self):
+        """Test windows that are never queried again are dropped once expired"""
+        store = LocalWindowStore(buckets_per_window=60, sweep_every=100)
+        for recipient in range(99):
+            store.add(f'r:1:{recipient}', 3600, 10, ts=0)
+        assert store.size() == 99
+        
+        store.add('r:1:new', 3600, 10, ts=7200)
+        
+        assert store.size() == 1
+        assert store.totals('r:1:new', 3600, now=7200) == (1, 10)
+    
+    def test_max_windows_evicts_least_recent_batch(self):
+        """Test the window cap drops the least recently used tenth instead of rescanning every add"""
+        store = LocalWindowStore(buckets_per_window=60, max_windows=20)
+        for recipient in range(20):
+            store.add(f'r:1:{recipient}', 3600, 10, ts=100)
+        store.totals('r:1:0', 3600, now=100)  # recently used, so kept
+        
+        store.add('r:1:new', 3600, 10, ts=100)
+        
+        assert store.size() == 19
+        assert store.totals('r:1:0', 3600, now=100) == (1, 10)
+        assert store.totals('r:1:1', 3600, now=100) == (0, 0)
+        assert store.totals('r:1:2', 3600, now=100) == (0, 0)
+        store.add('r:1:newer', 3600, 10, ts=100)
+        assert store.size() == 20
+
+class TestVelocityTracker:
+    """Test per-user and per-recipient limits"""
+    
+    def test_per_recipient_count(self):
+        """Test the per-recipient cap applies before the per-user cap"""
+        tracker = VelocityTracker(LocalWindowStore(), LIMITS)
+        tracker.warm = True
+        for _ in range(2):
+            tracker.record(1, 'alice', 10, ts=100)
+        
+        assert 'recipient' in tracker.check(1, 'alice', 10, now=200)
+        assert tracker.check(1, 'bob', 10, now=200) is None
+    
+    def test_per_user_amount(self):
+        """Test the amount cap counts the pending transfer"""
+        tracker = VelocityTracker(LocalWindowStore(), LIMITS)
+        tracker.warm = True
+        tracker.record(1, 'alice', 600, ts=100)
+        
+        assert 'R1000' in tracker.check(1, 'bob', 500, now=200)
+        assert tracker.check(1, 'bob', 400, now=200) is None
+    
+    def test_recipient_key_normalisation(self):
+        """Test recipient spellings collapse to one key"""
+        assert recipient_key('  Jane  DOE ') == recipient_key('jane doe')
+        assert recipient_key('Jane', '+27 12 345') == '2712345'
+
+class TestSendMoneyVelocity:
+    """Test velocity checks in the send_money write path"""
+    
+    def test_send_money_blocked_after_limit(self, client, sample_user, monkeypatch):
+        """Test committed transfers feed the limit"""
+        monkeypatch.setattr(velocity_tracker, 'limits', LIMITS)
+        
+        for _ in range(2):
+            assert TransactionService.send_money(sample_user.id, 100, 'Alice')[0]
+        success, message, transaction = TransactionService.send_money(sample_user.id, 100, 'alice')
+        
+        assert success is False
+        assert 'Velocity limit' in message
+        assert transaction is None
+        assert TransactionService.send_money(sample_user.id, 100, 'Bob')[0]
+    
+    def test_warm_start_runs_in_background(self, client, monkeypatch):
+        """Test the first check starts the warm start without waiting for it"""
+        calls = []
+        started = threading.Event()
+        release = threading.Event()
+        monkeypatch.setattr(velocity_tracker, 'warm', False)
+        monkeypatch.setattr(velocity_tracker, 'warm_start',
+                            lambda until: calls.append(until) or started.set() or release.wait(5))
+        
+        try:
+            assert velocity_tracker.check(1, 'alice', 10) is None  # while the load is still running
+            assert started.wait(5)
+            velocity_tracker.check(1, 'alice', 10)
+        finally:
+            release.set()
+        assert len(calls) == 1
+    
+    def test_warm_start_from_database(self, client, sample_user, monkeypatch):
+        """Test recent transfers are loaded from the database"""
+        monkeypatch.setattr(velocity_tracker, 'limits', LIMITS)
+        for minutes_ago in (5, 10, 120):
+            db.session.add(Transaction(user_id=sample_user.id, transaction_type='send', amount=100,
+                                       recipient='Alice', status='completed',
+                                       created_at=datetime.utcnow() - timedelta(minutes=minutes_ago)))
+        db.session.commit()
+        velocity_tracker.warm_start()
+        
+        success, message, _ = TransactionService.send_money(sample_user.id, 100, 'Alice')
+        
+        assert success is False
+        assert 'recipient' in message
+    
+    def test_warm_start_stops_where_live_records_begin(self, client, sample_user, monkeypatch):
+        """Test transfers made after warming began are left to live records, not replayed as well"""
+        monkeypatch.setattr(velocity_tracker, 'limits', LIMITS)
+        until = datetime.utcnow() - timedelta(minutes=1)
+        for minutes_ago in (5, 0):
+            db.session.add(Transaction(user_id=sample_user.id, transaction_type='send', amount=100,
+                                       recipient='Alice', status='completed',
+                                       created_at=datetime.utcnow() - timedelta(minutes=minutes_ago)))
+        db.session.commit()
+        
+        velocity_tracker.warm_start(until)
+        
+        assert velocity_tracker.store.totals(f'r:{sample_user.id}:alice', 3600, time.time())[0] == 1
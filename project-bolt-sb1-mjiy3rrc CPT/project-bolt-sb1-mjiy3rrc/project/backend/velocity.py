@@ -0,0 +1,254 @@
+"""
+Sliding-window velocity limits for Mukuru Loyalty Program
+
+Transfer counts and amounts per user and per (user, recipient) are kept in
+bucketed sliding windows fed by committed transactions, so limit checks in
+send_money never run COUNT/SUM queries over the transactions table.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from flask import current_app
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class LocalWindowStore:
+    """In-process bucketed sliding windows
+
+    Every `sweep_every` adds, windows whose transfers have all slid out are
+    dropped, so keys that are never queried again (one-off recipients) do not
+    accumulate. Windows are kept in least-recently-used order; if `max_windows`
+    are still live, the least recently used tenth is dropped in one go, so the
+    cap costs one batch per max_windows / 10 new windows rather than a full
+    scan per add.
+    """
+
+    def __init__(self, buckets_per_window: int = 60, sweep_every: int = 10000, max_windows: int = 100000):
+        self.buckets_per_window = buckets_per_window
+        self.sweep_every = sweep_every
+        self.max_windows = max_windows
+        # (key, window) -> [deque of [bucket, count, amount], total_count, total_amount], oldest use first
+        self._windows: 'OrderedDict[tuple, list]' = OrderedDict()
+        self._adds = 0
+        self._lock = threading.Lock()
+
+    def _evict(self, state: list, oldest_bucket: int):
+        buckets = state[0]
+        while buckets and buckets[0][0] < oldest_bucket:
+            _, count, amount = buckets.popleft()
+            state[1] -= count
+            state[2] -= amount
+
+    def add(self, key: str, window: int, amount: float, ts: float):
+        """Record one transfer at unix time `ts`"""
+        width = window / self.buckets_per_window
+        bucket = int(ts // width)
+        with self._lock:
+            self._adds += 1
+            if self._adds >= self.sweep_every:
+                self._sweep(ts)
+            state = self._windows.get((key, window))
+            if state is None:
+                if len(self._windows) >= self.max_windows:
+                    self._evict_least_recent(max(1, self.max_windows // 10))
+                state = self._windows[(key, window)] = [deque(), 0, 0.0]
+            else:
+                self._windows.move_to_end((key, window))
+            self._evict(state, bucket - self.buckets_per_window + 1)
+            buckets = state[0]
+            if buckets and buckets[-1][0] == bucket:
+                buckets[-1][1] += 1
+                buckets[-1][2] += amount
+            elif not buckets or buckets[-1][0] < bucket:
+                buckets.append([bucket, 1, amount])
+            else:
+                # Out-of-order (warm start): insert in place to keep buckets sorted
+                for entry in buckets:
+                    if entry[0] == bucket:
+                        entry[1] += 1
+                        entry[2] += amount
+                        break
+                else:
+                    buckets.append([bucket, 1, amount])
+                    state[0] = deque(sorted(buckets))
+            state[1] += 1
+            state[2] += amount
+
+    def totals(self, key: str, window: int, now: float) -> Tuple[int, float]:
+        """Get (count, amount) within the window ending at `now`"""
+        width = window / self.buckets_per_window
+        with self._lock:
+            state = self._windows.get((key, window))
+            if state is None:
+                return 0, 0.0
+            self._evict(state, int(now // width) - self.buckets_per_window + 1)
+            if not state[0]:
+                del self._windows[(key, window)]
+                return 0, 0.0
+            self._windows.move_to_end((key, window))
+            return state[1], state[2]
+
+    def _sweep(self, now: float):
+        self._adds = 0
+        for (key, window), state in list(self._windows.items()):
+            self._evict(state, int(now // (window / self.buckets_per_window)) - self.buckets_per_window + 1)
+            if not state[0]:
+                del self._windows[(key, window)]
+
+    def _evict_least_recent(self, count: int):
+        for _ in range(min(count, len(self._windows))):
+            self._windows.popitem(last=False)
+
+    def size(self) -> int:
+        """Number of windows held"""
+        with self._lock:
+            return len(self._windows)
+
+    def clear(self):
+        with self._lock:
+            self._windows.clear()
+            self._adds = 0
+
+class RedisWindowStore:
+    """Bucketed sliding windows shared by all workers through Redis"""
+
+    def __init__(self, url: str, buckets_per_window: int = 60):
+        import redis
+
+        self.buckets_per_window = buckets_per_window
+        self._redis = redis.Redis.from_url(url, socket_timeout=0.1)
+
+    def _bucket_key(self, key: str, window: int, bucket: int) -> str:
+        return f'vel:{key}:{window}:{bucket}'
+
+    def add(self, key: str, window: int, amount: float, ts: float):
+        width = window / self.buckets_per_window
+        bucket_key = self._bucket_key(key, window, int(ts // width))
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.hincrby(bucket_key, 'count', 1)
+        pipe.hincrbyfloat(bucket_key, 'amount', amount)
+        pipe.expire(bucket_key, int(window + width) + 1)
+        pipe.execute()
+
+    def totals(self, key: str, window: int, now: float) -> Tuple[int, float]:
+        width = window / self.buckets_per_window
+        newest = int(now // width)
+        pipe = self._redis.pipeline(transaction=False)
+        for bucket in range(newest - self.buckets_per_window + 1, newest + 1):
+            pipe.hmget(self._bucket_key(key, window, bucket), 'count', 'amount')
+        count, amount = 0, 0.0
+        for bucket_count, bucket_amount in pipe.execute():
+            if bucket_count is not None:
+                count += int(bucket_count)
+                amount += float(bucket_amount or 0)
+        return count, amount
+
+    def clear(self):
+        pass
+
+def recipient_key(recipient: str, recipient_phone: str = None) -> str:
+    """Normalise a recipient so repeat transfers to them share a window"""
+    if recipient_phone:
+        return ''.join(ch for ch in recipient_phone if ch.isdigit())
+    return ' '.join((recipient or '').lower().split())
+
+def _describe(window: int) -> str:
+    return f'{window // 3600}h' if window % 3600 == 0 else f'{window // 60}m'
+
+class VelocityTracker:
+    """Applies Config.VELOCITY_LIMITS using a window store"""
+
+    def __init__(self, store, limits: Dict):
+        self.store = store
+        self.limits = limits
+        self.warm = False
+        self._warm_lock = threading.Lock()
+
+    def _windows(self, user_id: int, recipient: str) -> List[Tuple[str, Dict]]:
+        windows = [(f'u:{user_id}', limit) for limit in self.limits.get('per_user', [])]
+        windows += [(f'r:{user_id}:{recipient}', limit) for limit in self.limits.get('per_recipient', [])]
+        return windows
+
+    def check(self, user_id: int, recipient: str, amount: float, now: float = None) -> Optional[str]:
+        """Return why a transfer would exceed a velocity limit, or None if allowed"""
+        self.ensure_warm()
+        now = now or time.time()
+        for key, limit in self._windows(user_id, recipient):
+            count, total = self.store.totals(key, limit['window'], now)
+            scope = 'to this recipient ' if key.startswith('r:') else ''
+            if count + 1 > limit['max_count']:
+                return f"Velocity limit exceeded: max {limit['max_count']} transfers {scope}per {_describe(limit['window'])}"
+            if total + amount > limit['max_amount']:
+                return f"Velocity limit exceeded: max R{limit['max_amount']} {scope}per {_describe(limit['window'])}"
+        return None
+
+    def record(self, user_id: int, recipient: str, amount: float, ts: float = None):
+        """Feed a committed transfer into every window it counts towards"""
+        ts = ts or time.time()
+        for key, limit in self._windows(user_id, recipient):
+            self.store.add(key, limit['window'], amount, ts)
+
+    def ensure_warm(self):
+        """Start loading recent transfers from the database, once per process
+
+        The load runs on a background thread so no request waits for the scan;
+        until it finishes, limits only see transfers made by this process. It
+        replays transfers created before this call only: every transfer this
+        process makes afterwards is recorded live, so none is counted twice.
+        """
+        if self.warm:
+            return
+        with self._warm_lock:
+            if self.warm:
+                return
+            until = datetime.utcnow()
+            self.warm = True
+            if isinstance(self.store, LocalWindowStore):
+                threading.Thread(target=self._warm_in_background, args=(current_app._get_current_object(), until),
+                                 name='velocity-warm-start', daemon=True).start()
+
+    def _warm_in_background(self, app, until: datetime):
+        with app.app_context():
+            try:
+                self.warm_start(until)
+            except Exception:
+                logger.exception("Velocity warm start failed; limits cover new transfers only")
+
+    def warm_start(self, until: datetime = None):
+        """Replay completed transfers inside the longest window, created before `until`, into the store"""
+        from models import db, Transaction
+
+        longest = max([limit['window'] for limits in self.limits.values() for limit in limits] or [0])
+        if not longest:
+            return
+        until = until or datetime.utcnow()
+        since = until - timedelta(seconds=longest)
+        rows = db.session.query(Transaction.user_id, Transaction.recipient, Transaction.recipient_phone,
+                                Transaction.amount, Transaction.created_at)\
+                         .filter(Transaction.transaction_type == 'send',
+                                 Transaction.status == 'completed',
+                                 Transaction.created_at >= since,
+                                 Transaction.created_at < until)\
+                         .order_by(Transaction.created_at)\
+                         .yield_per(10000)
+        loaded = 0
+        for user_id, recipient, recipient_phone, amount, created_at in rows:
+            # created_at is naive UTC
+            ts = (created_at - datetime(1970, 1, 1)).total_seconds()
+            self.record(user_id, recipient_key(recipient, recipient_phone), amount, ts)
+            loaded += 1
+        logger.info("Velocity windows warm-started from %d transfers", loaded)
+
+def create_store():
+    """Build the window store selected by Config.VELOCITY_BACKEND"""
+    if Config.VELOCITY_BACKEND == 'redis':
+        return RedisWindowStore(Config.REDIS_URL, Config.VELOCITY_BUCKETS)
+    return LocalWindowStore(Config.VELOCITY_BUCKETS, max_windows=Config.VELOCITY_MAX_WINDOWS)
+
+velocity_tracker = VelocityTracker(create_store(), Config.VELOCITY_LIMITS)